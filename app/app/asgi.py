@@ -0,0 +1,19 @@
+"""
+ASGI config for app project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Django 2.1 only speaks WSGI, the WSGI application runs in a thread pool
+behind asgiref's adapter.
+
+For more information on this file, see
+https://asgiref.readthedocs.io/en/latest/#wsgi-to-asgi-adapter
+"""
+
+import os
+
+from asgiref.wsgi import WsgiToAsgi
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+
+application = WsgiToAsgi(get_wsgi_application())
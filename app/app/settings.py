@@ -23,9 +23,14 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SECRET_KEY = "m$a(*2vjovpob2z=w3)p&ao&o1n(g70*$g71h0gjg*$s1+w=gl"
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# DEBUG=1 turns it on, docker-compose.yml does for the development server
+DEBUG = bool(int(os.environ.get("DEBUG", 0)))
 
-ALLOWED_HOSTS = []
+# Host names served, e.g. ALLOWED_HOSTS=api.example.com,www.example.com.
+# Without DEBUG the server rejects every request until it's set
+ALLOWED_HOSTS = list(
+    filter(None, os.environ.get("ALLOWED_HOSTS", "").split(","))
+)
 
 
 # Application definition
@@ -45,6 +50,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so the other middleware are timed and their queries counted
+    "core.middleware.MetricsMiddleware",
+    "core.middleware.ProfilingMiddleware",
+    "core.middleware.QueryCountMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -78,16 +87,87 @@ WSGI_APPLICATION = "app.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
 
+# Persistent connections are checked before their first use in a request.
+# With DB_POOL_SIZE threads share a bounded pool of connections instead, see
+# core.db.postgresql.base
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": "core.db.postgresql",
         "HOST": os.environ.get("DB_HOST"),
         "NAME": os.environ.get("DB_NAME"),
         "USER": os.environ.get("DB_USER"),
         "PASSWORD": os.environ.get("DB_PASS"),
+        "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": bool(
+            int(os.environ.get("DB_CONN_HEALTH_CHECKS", 1))
+        ),
+        "POOL_SIZE": int(os.environ.get("DB_POOL_SIZE", 0)),
+        "POOL_TIMEOUT": float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+        "POOL_CHECK_AFTER": float(os.environ.get("DB_POOL_CHECK_AFTER", 30)),
     }
 }
 
+# Read replicas, e.g. DB_REPLICA_HOSTS=replica1,replica2, with the primary's
+# other settings. Safe requests of the recipe views read from a random one,
+# see core.routers. Test databases mirror the primary
+DATABASE_REPLICAS = []
+for host in filter(None, os.environ.get("DB_REPLICA_HOSTS", "").split(",")):
+    alias = f"replica{len(DATABASE_REPLICAS) + 1}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": host.strip(),
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ["core.routers.ReplicaRouter"]
+# Users read from the primary this long after they write, more than the
+# replication lag. Use a cache shared by the workers
+REPLICA_PIN_CACHE_ALIAS = "default"
+REPLICA_PIN_SECONDS = int(os.environ.get("REPLICA_PIN_SECONDS", 5))
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.1/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", "recipe-api"),
+    }
+}
+if CACHES["default"]["BACKEND"].endswith(("LocMemCache", "FileBasedCache")):
+    # Bounded, entries are culled once full. LocMemCache is only valid for
+    # a single process, gunicorn.conf.py refuses more workers with it
+    CACHES["default"]["OPTIONS"] = {
+        "MAX_ENTRIES": int(os.environ.get("CACHE_MAX_ENTRIES", 10000)),
+    }
+
+RESPONSE_CACHE_ALIAS = "default"
+# Seconds to keep a cached list response, 0 disables the response cache.
+# Off by default over a process-local cache, a worker would keep serving
+# responses after the data changed through another one
+RESPONSE_CACHE_TIMEOUT = int(
+    os.environ.get(
+        "RESPONSE_CACHE_TIMEOUT",
+        0 if CACHES["default"]["BACKEND"].endswith("LocMemCache") else 300,
+    )
+)
+
+
+# Token authentication cache, see user.authentication
+TOKEN_AUTH_CACHE_MAX_ENTRIES = int(
+    os.environ.get("TOKEN_AUTH_CACHE_MAX_ENTRIES", 10000)
+)
+TOKEN_AUTH_CACHE_TTL = int(os.environ.get("TOKEN_AUTH_CACHE_TTL", 60))
+# Cache alias shared by all workers, "default" unless it's process-local.
+# Several workers need it, see core.checks
+TOKEN_AUTH_SHARED_CACHE_ALIAS = os.environ.get(
+    "TOKEN_AUTH_SHARED_CACHE_ALIAS",
+    None if CACHES["default"]["BACKEND"].endswith("LocMemCache") else "default",
+)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -134,3 +214,78 @@ STATIC_ROOT = "/vol/web/static"
 MEDIA_ROOT = "/vol/web/media"
 
 AUTH_USER_MODEL = "core.User"
+
+REST_FRAMEWORK = {
+    "PAGE_SIZE": int(os.environ.get("API_PAGE_SIZE", 100)),
+    # Encode and decode with orjson when it is installed, see core.renderers
+    "DEFAULT_RENDERER_CLASSES": (
+        "core.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "core.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
+}
+# Pagination classes are set on the viewsets
+SILENCED_SYSTEM_CHECKS = ["rest_framework.W001"]
+
+# Upper bound for the `page_size` query parameter of paginated endpoints
+API_MAX_PAGE_SIZE = int(os.environ.get("API_MAX_PAGE_SIZE", 1000))
+
+# Text search configuration of the recipe search vectors
+RECIPE_SEARCH_CONFIG = os.environ.get("RECIPE_SEARCH_CONFIG", "english")
+
+# Maximum number of recipes accepted by a single bulk request
+RECIPE_BULK_MAX_ITEMS = int(os.environ.get("RECIPE_BULK_MAX_ITEMS", 1000))
+
+# Recipes read per server-side cursor fetch when streaming an export
+RECIPE_EXPORT_CHUNK_SIZE = int(
+    os.environ.get("RECIPE_EXPORT_CHUNK_SIZE", 2000)
+)
+
+# Chunked image uploads, see recipe.uploads
+IMAGE_UPLOAD_MAX_SIZE = int(
+    os.environ.get("IMAGE_UPLOAD_MAX_SIZE", 20 * 1024 * 1024)
+)
+IMAGE_UPLOAD_MAX_DIMENSION = int(
+    os.environ.get("IMAGE_UPLOAD_MAX_DIMENSION", 10000)
+)
+
+# Media files are sent by the front server when set to "x-accel-redirect"
+# (nginx, internal location at MEDIA_SENDFILE_PREFIX mapped to MEDIA_ROOT)
+# or "x-sendfile" (Apache, lighttpd), and by Django otherwise
+MEDIA_SENDFILE = os.environ.get("MEDIA_SENDFILE", "")
+MEDIA_SENDFILE_PREFIX = os.environ.get(
+    "MEDIA_SENDFILE_PREFIX", "/protected-media/"
+)
+# Stored media names never change their content
+MEDIA_CACHE_MAX_AGE = int(
+    os.environ.get("MEDIA_CACHE_MAX_AGE", 365 * 24 * 60 * 60)
+)
+
+# SQL queries per request, see core.middleware.QueryCountMiddleware.
+# Views declare their own budgets, QUERY_BUDGET is used for the others
+QUERY_COUNT_HEADERS = bool(int(os.environ.get("QUERY_COUNT_HEADERS", 0)))
+QUERY_BUDGET = int(os.environ.get("QUERY_BUDGET", 20))
+# Fail over-budget requests instead of logging them, set by the tests
+QUERY_BUDGET_STRICT = False
+
+# Phases of requests in the Server-Timing header and sampled cProfile dumps,
+# see core.middleware.ProfilingMiddleware
+SERVER_TIMING = bool(int(os.environ.get("SERVER_TIMING", 0)))
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "/tmp/profiles")
+
+# Request counts and latencies, see core.metrics. Each process maps a file of
+# METRICS_MAX_SAMPLES samples in METRICS_DIR, emptied by gunicorn.conf.py
+METRICS_DIR = os.environ.get("METRICS_DIR", "/tmp/metrics")
+METRICS_MAX_SAMPLES = int(os.environ.get("METRICS_MAX_SAMPLES", 4096))
+METRICS_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0,
+    7.5, 10.0,
+)
+# Scrapers send it as "Authorization: Bearer <token>", /metrics refuses every
+# request while it's empty
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
@@ -0,0 +1,48 @@
+from django.conf import settings
+
+# Backends keeping their entries in the memory of each process
+PROCESS_LOCAL_CACHES = ("django.core.cache.backends.locmem.LocMemCache",)
+
+# Caches holding state every worker must see: the data versions behind the
+# cached responses and list ETags, and the replica pins of the users
+SHARED_STATE_CACHES = ("RESPONSE_CACHE_ALIAS", "REPLICA_PIN_CACHE_ALIAS")
+
+
+def is_process_local(alias: str) -> bool:
+    """Tell whether the cache's entries are only seen by their process
+
+    Args:
+        alias (str): Alias of the cache in CACHES
+    """
+    return settings.CACHES[alias]["BACKEND"] in PROCESS_LOCAL_CACHES
+
+
+def check_worker_processes(workers: int) -> list:
+    """Return why the settings can't be served by `workers` processes
+
+    A change made through one worker is otherwise missed by the others.
+
+    Args:
+        workers (int): Number of server processes
+
+    Returns:
+        list: Problems found, empty when the settings are fine
+    """
+    if workers <= 1:
+        return []
+    problems = [
+        f"{name} uses the process-local cache {getattr(settings, name)!r}"
+        for name in SHARED_STATE_CACHES
+        if is_process_local(getattr(settings, name))
+    ]
+    # The other workers would accept revoked tokens until their entries
+    # expire, see user.authentication
+    alias = settings.TOKEN_AUTH_SHARED_CACHE_ALIAS
+    if settings.TOKEN_AUTH_CACHE_TTL > 0 and (
+        not alias or is_process_local(alias)
+    ):
+        problems.append(
+            "the token authentication cache has no shared tier, set "
+            "TOKEN_AUTH_SHARED_CACHE_ALIAS or TOKEN_AUTH_CACHE_TTL=0"
+        )
+    return problems
@@ -0,0 +1,86 @@
+import time
+
+from core.db.postgresql.creation import DatabaseCreation
+from core.db.postgresql.pool import get_pool
+from django.db.backends.postgresql import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL backend with connection health checks and pooling
+
+    With CONN_HEALTH_CHECKS a persistent connection, see CONN_MAX_AGE, is
+    checked with `SELECT 1` the first time it is used in a request, and
+    reopened when the server dropped it.
+
+    With POOL_SIZE the connections are taken from a bounded pool shared by
+    the threads of the process, see `core.db.postgresql.pool`, and given
+    back at the end of every request instead of being closed. POOL_TIMEOUT
+    is how long a request waits for one, POOL_CHECK_AFTER how long one may
+    stay idle before it's checked on reuse.
+
+    Args:
+        base.DatabaseWrapper (DatabaseWrapper):
+        https://docs.djangoproject.com/en/2.1/ref/databases/#postgresql-notes
+    """
+
+    creation_class = DatabaseCreation
+    health_check_done = True
+    pool = None
+
+    def get_new_connection(self, conn_params):
+        size = self.settings_dict.get("POOL_SIZE")
+        if not size:
+            return super().get_new_connection(conn_params)
+
+        pool = get_pool(
+            conn_params,
+            size,
+            self.settings_dict.get("POOL_TIMEOUT", 10),
+            self.settings_dict.get("POOL_CHECK_AFTER", 30),
+        )
+        connection = pool.acquire(
+            lambda: super(DatabaseWrapper, self).get_new_connection(
+                conn_params
+            )
+        )
+        self.pool = pool
+        # Same as the parent does for new connections
+        options = self.settings_dict["OPTIONS"]
+        self.isolation_level = options.get(
+            "isolation_level", connection.isolation_level
+        )
+        return connection
+
+    def connect(self):
+        # Set first, connect() calls ensure_connection() before autocommit
+        self.health_check_done = True
+        super().connect()
+        if self.pool is not None:
+            # Back to the pool when the request finishes
+            self.close_at = time.time()
+
+    def _close(self):
+        pool, self.pool = self.pool, None
+        if pool is None or self.connection is None:
+            return super()._close()
+        if self.in_atomic_block:
+            # The wrapper keeps the connection until the next connect()
+            return pool.discard(self.connection)
+        return pool.release(self.connection)
+
+    def ensure_connection(self):
+        if (
+            self.connection is not None
+            and not self.health_check_done
+            and not self.in_atomic_block
+        ):
+            self.health_check_done = True
+            if not self.is_usable():
+                self.close()
+        super().ensure_connection()
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        # The server may drop the connection before the next request
+        if self.settings_dict.get("CONN_HEALTH_CHECKS"):
+            self.health_check_done = False
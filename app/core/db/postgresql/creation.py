@@ -0,0 +1,9 @@
+from core.db.postgresql.pool import close_pools
+from django.db.backends.postgresql import creation
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Idle pooled connections would keep the database from being dropped
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
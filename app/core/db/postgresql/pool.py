@@ -0,0 +1,152 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """Bounded pool of psycopg2 connections shared by the threads of a process
+
+    At most `size` connections are checked out at once, further checkouts
+    wait up to `timeout` seconds for one to be returned. Idle connections
+    are reused most recently returned first, so the extra ones age out, and
+    pinged before reuse when they've been idle longer than `check_after`.
+
+    Args:
+        size (int): Maximum number of open connections
+        timeout (float): Seconds to wait for a connection
+        check_after (float): Idle seconds after which a connection is
+            checked with `SELECT 1` before being reused
+    """
+
+    def __init__(self, size: int, timeout: float, check_after: float):
+        self.size = size
+        self.timeout = timeout
+        self.check_after = check_after
+        self.slots = threading.BoundedSemaphore(size)
+        self.idle = deque()
+        self.lock = threading.Lock()
+
+    def acquire(self, connect):
+        """Return an idle connection, or a new one from `connect`
+
+        Args:
+            connect (callable): Opens a new connection
+
+        Raises:
+            psycopg2.OperationalError: No connection was returned in time
+        """
+        if not self.slots.acquire(timeout=self.timeout):
+            raise psycopg2.OperationalError(
+                f"No database connection available within {self.timeout}s, "
+                f"all {self.size} are in use"
+            )
+        try:
+            while True:
+                with self.lock:
+                    connection, returned_at = (
+                        self.idle.pop() if self.idle else (None, None)
+                    )
+                if connection is None:
+                    return connect()
+                idle_for = time.monotonic() - returned_at
+                if connection.closed or (
+                    idle_for > self.check_after and not ping(connection)
+                ):
+                    close_quietly(connection)
+                    continue
+                return connection
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def release(self, connection):
+        """Give a checked out connection back, rolling back its transaction
+
+        Args:
+            connection ([type]): Connection returned by `acquire`
+        """
+        try:
+            if not connection.closed:
+                if connection.get_transaction_status() != (
+                    TRANSACTION_STATUS_IDLE
+                ):
+                    connection.rollback()
+                with self.lock:
+                    self.idle.append((connection, time.monotonic()))
+        except psycopg2.Error:
+            close_quietly(connection)
+        finally:
+            self.slots.release()
+
+    def discard(self, connection):
+        """Close a checked out connection instead of giving it back
+
+        Args:
+            connection ([type]): Connection returned by `acquire`
+        """
+        close_quietly(connection)
+        self.slots.release()
+
+    def close(self):
+        """Close the idle connections"""
+        with self.lock:
+            idle, self.idle = self.idle, deque()
+        for connection, returned_at in idle:
+            close_quietly(connection)
+
+
+def ping(connection) -> bool:
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        if connection.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            connection.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def close_quietly(connection):
+    try:
+        connection.close()
+    except psycopg2.Error:
+        logger.debug("Failed to close a pooled connection", exc_info=True)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(conn_params: dict, size: int, timeout: float, check_after):
+    """Return the pool of this process for the connection parameters
+
+    Args:
+        conn_params (dict): Arguments of `psycopg2.connect`
+        size (int): Maximum number of open connections
+        timeout (float): Seconds to wait for a connection
+        check_after (float): Idle seconds before checking a connection
+    """
+    # Forked workers must not share the sockets of their parent
+    key = (os.getpid(), tuple(sorted(conn_params.items())))
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = ConnectionPool(size, timeout, check_after)
+    return pool
+
+
+def close_pools():
+    """Close the idle connections of every pool of this process"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,21 @@
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import IntegerField, Subquery
+
+
+class ArraySubquery(Subquery):
+    """Collect a single column subquery into a Postgres array
+
+    Rows without any match produce an empty array instead of NULL, so the
+    value can be used as-is in place of a related manager.
+
+    Args:
+        Subquery (Subquery):
+        https://docs.djangoproject.com/en/2.1/ref/models/expressions/#subquery-expressions
+    """
+
+    template = "ARRAY(%(subquery)s)"
+
+    def __init__(self, queryset, output_field=None, **extra):
+        if output_field is None:
+            output_field = ArrayField(IntegerField())
+        super().__init__(queryset, output_field=output_field, **extra)
@@ -0,0 +1,490 @@
+import io
+import json
+import math
+import random
+import shutil
+import tempfile
+import time
+import uuid
+from collections import Counter, namedtuple
+from decimal import Decimal
+
+from core.models import ImageBlob, Ingredient, Recipe, Tag
+from core.queries import track_queries
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.test.utils import override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+PASSWORD = "benchmark-password"
+# Latency percentiles reported for every endpoint
+PERCENTILES = (50, 95, 99)
+
+# Data is a dict, or a callable taking the request number and returning one
+Endpoint = namedtuple("Endpoint", "name method path data format")
+
+
+def percentile(values, percent: float) -> float:
+    """Return the nearest-rank percentile of sorted values
+
+    Args:
+        values (list): Values sorted in ascending order
+        percent (float): Percentile between 0 and 100
+    """
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+class Command(BaseCommand):
+    """Measure the latency of every API endpoint on generated data
+
+    Users, tags, ingredients, recipes and their relations are created and
+    committed up front. Each endpoint of `recipe.urls` and `user.urls` is
+    then called through the test client as the first user, authenticated
+    by token, committing like in production, and the report is written as
+    JSON. Every row created by the run is deleted at the end, run it
+    against a database of its own, not the production one.
+
+    Args:
+        BaseCommand (class):
+        https://docs.djangoproject.com/en/3.1/howto/custom-management-commands/#django.core.management.BaseCommand
+    """
+
+    help = "Benchmark the API endpoints and report latency percentiles"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--recipes", type=int, default=1000)
+        parser.add_argument("--tags", type=int, default=50)
+        parser.add_argument("--ingredients", type=int, default=200)
+        parser.add_argument("--tags-per-recipe", type=int, default=5)
+        parser.add_argument("--ingredients-per-recipe", type=int, default=8)
+        parser.add_argument("--requests", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--endpoint",
+            action="append",
+            dest="endpoints",
+            help="Only run this endpoint, can be repeated",
+        )
+        parser.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="Disable the response cache of the list endpoints",
+        )
+        parser.add_argument(
+            "--output", help="Write the report to this file, not stdout"
+        )
+
+    def handle(self, *args, **options):
+        if min(options["users"], options["recipes"], options["requests"]) < 1:
+            raise CommandError(
+                "At least one user, recipe and request per endpoint is needed"
+            )
+
+        media_root = tempfile.mkdtemp()
+        overrides = {
+            "ALLOWED_HOSTS": [*settings.ALLOWED_HOSTS, "testserver"],
+            "MEDIA_ROOT": media_root,
+        }
+        if options["no_cache"]:
+            overrides["RESPONSE_CACHE_TIMEOUT"] = 0
+        # Every user of the run, seeded or signed up, is named after it
+        self.prefix = f"benchmark-{uuid.uuid4().hex[:8]}-"
+        last_blob = ImageBlob.objects.aggregate(last=Max("pk"))["last"] or 0
+        try:
+            with override_settings(**overrides):
+                report = self.run(**options)
+        finally:
+            self.clean_up(last_blob)
+            shutil.rmtree(media_root)
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        else:
+            self.stdout.write(output)
+
+    def run(self, **options):
+        rng = random.Random(options["seed"])
+        dataset = self.seed(rng, options)
+        user = dataset.pop("user")
+
+        client = APIClient()
+        token = Token.objects.create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+        endpoints = self.get_endpoints(rng, user)
+        if options["endpoints"]:
+            unknown = set(options["endpoints"]).difference(
+                endpoint.name for endpoint in endpoints
+            )
+            if unknown:
+                raise CommandError(
+                    f"Unknown endpoints: {', '.join(sorted(unknown))}"
+                )
+            endpoints = [
+                endpoint
+                for endpoint in endpoints
+                if endpoint.name in options["endpoints"]
+            ]
+
+        return {
+            "options": {
+                name: options[name]
+                for name in (
+                    "users",
+                    "recipes",
+                    "tags",
+                    "ingredients",
+                    "tags_per_recipe",
+                    "ingredients_per_recipe",
+                    "requests",
+                    "warmup",
+                    "seed",
+                    "no_cache",
+                )
+            },
+            "dataset": dataset,
+            "endpoints": [
+                self.measure(client, endpoint, options)
+                for endpoint in endpoints
+            ],
+        }
+
+    def clean_up(self, last_blob: int):
+        """Delete the users of the run and everything they own
+
+        Args:
+            last_blob (int): Last ImageBlob id before the run, the blobs
+                stored by the run are deleted as well
+        """
+        with transaction.atomic():
+            get_user_model().objects.filter(
+                email__startswith=self.prefix
+            ).delete()
+            ImageBlob.objects.filter(
+                pk__gt=last_blob, ref_count__lte=0
+            ).delete()
+
+    def seed(self, rng, options) -> dict:
+        """Create the users and their data in bulk
+
+        All users share a single password hash, computed once. The data is
+        committed before the requests run.
+
+        Args:
+            rng (Random): Source of the random relations
+            options (dict): Command options
+
+        Returns:
+            dict: Number of created rows and the user running the requests
+        """
+        with transaction.atomic():
+            return self.create_dataset(rng, options)
+
+    def create_dataset(self, rng, options) -> dict:
+        password = make_password(PASSWORD)
+        users = get_user_model().objects.bulk_create(
+            get_user_model()(
+                email=f"{self.prefix}{i}@example.com",
+                name=f"User {i}",
+                password=password,
+            )
+            for i in range(options["users"])
+        )
+        tags = Tag.objects.bulk_create(
+            Tag(user=user, name=f"Tag {i}")
+            for user in users
+            for i in range(options["tags"])
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(user=user, name=f"Ingredient {i}")
+            for user in users
+            for i in range(options["ingredients"])
+        )
+        recipes = Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    user=user,
+                    title=f"Recipe {i} {rng.choice(('soup', 'curry', 'pie'))}",
+                    time_minutes=rng.randrange(5, 180),
+                    price=Decimal(rng.randrange(100, 99999)) / 100,
+                )
+                for user in users
+                for i in range(options["recipes"])
+            ),
+            batch_size=5000,
+        )
+
+        through_rows = 0
+        for field, related, column, per_recipe in (
+            ("tags", tags, "tag_id", options["tags_per_recipe"]),
+            (
+                "ingredients",
+                ingredients,
+                "ingredient_id",
+                options["ingredients_per_recipe"],
+            ),
+        ):
+            by_user = {user.pk: [] for user in users}
+            for obj in related:
+                by_user[obj.user_id].append(obj.pk)
+            through = getattr(Recipe, field).through
+            rows = [
+                through(recipe_id=recipe.pk, **{column: pk})
+                for recipe in recipes
+                for pk in rng.sample(
+                    by_user[recipe.user_id],
+                    min(per_recipe, len(by_user[recipe.user_id])),
+                )
+            ]
+            through.objects.bulk_create(rows, batch_size=5000)
+            through_rows += len(rows)
+        # Bulk inserts bypass the signals maintaining the search vectors
+        Recipe.objects.filter(user__in=users).update_search_vector()
+
+        return {
+            "user": users[0],
+            "users": len(users),
+            "tags": len(tags),
+            "ingredients": len(ingredients),
+            "recipes": len(recipes),
+            "through_rows": through_rows,
+        }
+
+    def get_endpoints(self, rng, user) -> list:
+        """Return the requests to benchmark, reads before writes
+
+        Args:
+            rng (Random): Source of the picked objects
+            user ([type]): User running the requests
+        """
+        recipes = Recipe.objects.filter(user=user).order_by("pk")
+        recipe = recipes[rng.randrange(recipes.count())]
+        tag_ids = list(
+            Tag.objects.filter(user=user).values_list("pk", flat=True)[:3]
+        )
+        ingredient_ids = list(
+            Ingredient.objects.filter(user=user).values_list("pk", flat=True)[
+                :3
+            ]
+        )
+        detail = reverse("recipe:recipe-detail", args=[recipe.pk])
+        buffer = io.BytesIO()
+        Image.new("RGB", (64, 64)).save(buffer, format="PNG")
+        png = buffer.getvalue()
+
+        def new_recipe(i):
+            return {
+                "title": f"New recipe {i}",
+                "time_minutes": 10,
+                "price": "5.00",
+                "tags": tag_ids,
+                "ingredients": ingredient_ids,
+            }
+
+        return [
+            Endpoint("tag-list", "get", reverse("recipe:tag-list"), {}, None),
+            Endpoint(
+                "tag-list-assigned",
+                "get",
+                reverse("recipe:tag-list"),
+                {"assigned_only": 1},
+                None,
+            ),
+            Endpoint(
+                "ingredient-list",
+                "get",
+                reverse("recipe:ingredient-list"),
+                {},
+                None,
+            ),
+            Endpoint(
+                "recipe-list", "get", reverse("recipe:recipe-list"), {}, None
+            ),
+            Endpoint(
+                "recipe-list-filtered",
+                "get",
+                reverse("recipe:recipe-list"),
+                {"tags": ",".join(str(pk) for pk in tag_ids)},
+                None,
+            ),
+            Endpoint(
+                "recipe-list-search",
+                "get",
+                reverse("recipe:recipe-list"),
+                {"search": "curry"},
+                None,
+            ),
+            Endpoint(
+                "recipe-list-fields",
+                "get",
+                reverse("recipe:recipe-list"),
+                {"fields": "id,title"},
+                None,
+            ),
+            Endpoint("recipe-detail", "get", detail, {}, None),
+            Endpoint(
+                "recipe-export",
+                "get",
+                reverse("recipe:recipe-export"),
+                {"export_format": "ndjson"},
+                None,
+            ),
+            Endpoint("user-me", "get", reverse("user:me"), {}, None),
+            Endpoint(
+                "user-token",
+                "post",
+                reverse("user:token"),
+                {"email": user.email, "password": PASSWORD},
+                "json",
+            ),
+            Endpoint(
+                "user-create",
+                "post",
+                reverse("user:create"),
+                lambda i: {
+                    "email": f"{self.prefix}new-{i}@example.com",
+                    "password": PASSWORD,
+                    "name": f"New user {i}",
+                },
+                "json",
+            ),
+            Endpoint(
+                "user-me-update",
+                "patch",
+                reverse("user:me"),
+                lambda i: {"name": f"Renamed {i}"},
+                "json",
+            ),
+            Endpoint(
+                "tag-create",
+                "post",
+                reverse("recipe:tag-list"),
+                lambda i: {"name": f"New tag {i}"},
+                "json",
+            ),
+            Endpoint(
+                "ingredient-create",
+                "post",
+                reverse("recipe:ingredient-list"),
+                lambda i: {"name": f"New ingredient {i}"},
+                "json",
+            ),
+            Endpoint(
+                "recipe-create",
+                "post",
+                reverse("recipe:recipe-list"),
+                new_recipe,
+                "json",
+            ),
+            Endpoint(
+                "recipe-update",
+                "patch",
+                detail,
+                lambda i: {"title": f"Renamed {i}", "tags": tag_ids},
+                "json",
+            ),
+            Endpoint(
+                "recipe-bulk",
+                "post",
+                reverse("recipe:recipe-bulk"),
+                lambda i: [new_recipe(f"{i}-{n}") for n in range(10)],
+                "json",
+            ),
+            Endpoint(
+                "recipe-upload-image",
+                "post",
+                reverse("recipe:recipe-upload-image", args=[recipe.pk]),
+                lambda i: {
+                    "image": SimpleUploadedFile(
+                        "bench.png", png, content_type="image/png"
+                    )
+                },
+                "multipart",
+            ),
+        ]
+
+    def measure(self, client, endpoint, options) -> dict:
+        """Call an endpoint repeatedly and summarize the timings
+
+        Args:
+            client (APIClient): Authenticated client
+            endpoint (Endpoint): Request to run
+            options (dict): Command options
+
+        Returns:
+            dict: Report of the endpoint
+        """
+        timings, queries, statuses = [], [], Counter()
+        with track_queries() as stats:
+            for i in range(options["warmup"]):
+                self.request(client, endpoint, i)
+
+            warmup_sql_time = stats.duration
+            started = time.perf_counter()
+            for i in range(
+                options["warmup"], options["warmup"] + options["requests"]
+            ):
+                stats.count = 0
+                start = time.perf_counter()
+                status_code = self.request(client, endpoint, i)
+                timings.append((time.perf_counter() - start) * 1000)
+                queries.append(stats.count)
+                statuses[str(status_code)] += 1
+            elapsed = time.perf_counter() - started
+            sql_time = stats.duration - warmup_sql_time
+
+        timings.sort()
+        latency = {
+            f"p{percent}": round(percentile(timings, percent), 3)
+            for percent in PERCENTILES
+        }
+        latency["mean"] = round(sum(timings) / len(timings), 3)
+        latency["max"] = round(timings[-1], 3)
+        return {
+            "name": endpoint.name,
+            "method": endpoint.method.upper(),
+            "path": endpoint.path,
+            "requests": len(timings),
+            "status": dict(statuses),
+            "latency_ms": latency,
+            "throughput_rps": round(len(timings) / elapsed, 2),
+            "queries": {
+                "mean": round(sum(queries) / len(queries), 2),
+                "max": max(queries),
+                "time_ms_mean": round(sql_time * 1000 / len(queries), 3),
+            },
+        }
+
+    def request(self, client, endpoint, i: int) -> int:
+        """Send one request and read the whole response
+
+        Args:
+            client (APIClient): Authenticated client
+            endpoint (Endpoint): Request to send
+            i (int): Number of the request, used to generate unique data
+
+        Returns:
+            int: Status code of the response
+        """
+        data = endpoint.data(i) if callable(endpoint.data) else endpoint.data
+        kwargs = {"format": endpoint.format} if endpoint.format else {}
+        response = getattr(client, endpoint.method)(
+            endpoint.path, data, **kwargs
+        )
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response.status_code
@@ -0,0 +1,138 @@
+import threading
+import time
+
+from core.db.postgresql.pool import close_pools
+from core.management.commands.benchmark_api import PERCENTILES, percentile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+
+# Connection settings of every mode, on top of the configured ones
+MODES = {
+    "new": {"CONN_MAX_AGE": 0, "POOL_SIZE": 0},
+    "persistent": {
+        "CONN_MAX_AGE": None,
+        "CONN_HEALTH_CHECKS": False,
+        "POOL_SIZE": 0,
+    },
+    "persistent-checked": {
+        "CONN_MAX_AGE": None,
+        "CONN_HEALTH_CHECKS": True,
+        "POOL_SIZE": 0,
+    },
+    "pooled": {"CONN_MAX_AGE": 0},
+}
+
+
+class Command(BaseCommand):
+    """Compare the request latency of the database connection strategies
+
+    Threads run simulated requests, each one a query between the
+    `request_started` and `request_finished` connection handling, on a
+    connection opened per request, a persistent connection with and
+    without health checks, and a pooled connection.
+
+    Args:
+        BaseCommand (class):
+        https://docs.djangoproject.com/en/3.1/howto/custom-management-commands/#django.core.management.BaseCommand
+    """
+
+    help = "Benchmark new, persistent and pooled database connections"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--threads", type=int, default=4)
+        parser.add_argument(
+            "--pool-size",
+            type=int,
+            help="Connections of the pooled mode, defaults to --threads",
+        )
+        parser.add_argument("--query", default="SELECT 1")
+        parser.add_argument(
+            "--mode",
+            action="append",
+            dest="modes",
+            choices=sorted(MODES),
+            help="Only run this mode, can be repeated",
+        )
+
+    def handle(self, *args, **options):
+        if min(options["requests"], options["threads"]) < 1:
+            raise CommandError("At least one request and thread are needed")
+
+        base = connections[DEFAULT_DB_ALIAS].settings_dict
+        self.stdout.write(
+            f"{'mode':<20}{'opened':>8}"
+            + "".join(f"{f'p{percent} ms':>10}" for percent in PERCENTILES)
+            + f"{'mean ms':>10}{'req/s':>10}"
+        )
+        for mode in options["modes"] or MODES:
+            settings_dict = {
+                **base,
+                "POOL_SIZE": options["pool_size"] or options["threads"],
+                **MODES[mode],
+            }
+            try:
+                latencies, opened, elapsed = self.run(settings_dict, options)
+            finally:
+                close_pools()
+            latencies.sort()
+            self.stdout.write(
+                f"{mode:<20}{opened:>8}"
+                + "".join(
+                    f"{percentile(latencies, percent) * 1000:>10.3f}"
+                    for percent in PERCENTILES
+                )
+                + f"{sum(latencies) / len(latencies) * 1000:>10.3f}"
+                + f"{len(latencies) / elapsed:>10.1f}"
+            )
+
+    def run(self, settings_dict, options):
+        latencies = []
+        # Pooled checkouts send the signal too, count the distinct sockets
+        opened = set()
+        wrappers = set()
+        lock = threading.Lock()
+
+        def count_opened(sender, connection, **kwargs):
+            if connection in wrappers:
+                opened.add(connection.connection)
+
+        def requests():
+            wrapper = type(connections[DEFAULT_DB_ALIAS])(
+                dict(settings_dict), "benchmark"
+            )
+            with lock:
+                wrappers.add(wrapper)
+            times = []
+            try:
+                for _ in range(options["requests"]):
+                    start = time.perf_counter()
+                    wrapper.close_if_unusable_or_obsolete()
+                    with wrapper.cursor() as cursor:
+                        cursor.execute(options["query"])
+                        cursor.fetchall()
+                    wrapper.close_if_unusable_or_obsolete()
+                    times.append(time.perf_counter() - start)
+            finally:
+                wrapper.close()
+            with lock:
+                latencies.extend(times)
+
+        connection_created.connect(count_opened)
+        try:
+            threads = [
+                threading.Thread(target=requests)
+                for _ in range(options["threads"])
+            ]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            connection_created.disconnect(count_opened)
+        if len(latencies) != options["requests"] * options["threads"]:
+            raise CommandError("A benchmark thread failed, see above")
+        return latencies, len(opened), elapsed
@@ -0,0 +1,407 @@
+import io
+import random
+import time
+from decimal import Decimal
+from itertools import islice
+
+from core.models import Ingredient, Recipe, Tag
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+TITLE_WORDS = (
+    "bean",
+    "chicken",
+    "chili",
+    "curry",
+    "dumpling",
+    "lentil",
+    "noodle",
+    "pie",
+    "risotto",
+    "salad",
+    "soup",
+    "stew",
+    "taco",
+    "tofu",
+)
+# Characters escaped by the text format of COPY
+COPY_ESCAPES = str.maketrans(
+    {"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"}
+)
+
+
+def copy_value(value) -> str:
+    """Return a value as a field of COPY's text format
+
+    Args:
+        value ([type]): Python value of the column
+    """
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, str):
+        return value.translate(COPY_ESCAPES)
+    return str(value)
+
+
+class Command(BaseCommand):
+    """Load large generated datasets with COPY FROM STDIN
+
+    Ids are reserved from the sequences up front, so the rows of every table
+    and their relations are generated from the seed alone, without reading
+    anything back. Every user owns the same number of tags, ingredients and
+    recipes, and shares one password hash computed once. Each batch is
+    committed on its own, run it against an otherwise idle database.
+
+    With --drop-foreign-keys the foreign keys of the seeded tables are
+    dropped for the load and added back after it, see `add_foreign_keys`.
+
+    Args:
+        BaseCommand (class):
+        https://docs.djangoproject.com/en/3.1/howto/custom-management-commands/#django.core.management.BaseCommand
+    """
+
+    help = "Seed users, tags, ingredients and recipes in bulk with COPY"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument(
+            "--tags", type=int, default=50, help="Tags per user"
+        )
+        parser.add_argument(
+            "--ingredients", type=int, default=200, help="Ingredients per user"
+        )
+        parser.add_argument(
+            "--recipes", type=int, default=100, help="Recipes per user"
+        )
+        parser.add_argument("--tags-per-recipe", type=int, default=5)
+        parser.add_argument("--ingredients-per-recipe", type=int, default=8)
+        parser.add_argument("--batch-size", type=int, default=100000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--password", default="password", help="Password of every user"
+        )
+        parser.add_argument(
+            "--email-prefix",
+            default="seed",
+            help="Users are named <prefix>-<id>@example.com",
+        )
+        parser.add_argument(
+            "--drop-foreign-keys",
+            action="store_true",
+            help="Check the foreign keys once at the end, not per row",
+        )
+        parser.add_argument(
+            "--skip-search-vector",
+            action="store_true",
+            help="Leave the search vectors of the recipes empty",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("The batch size must be positive")
+        self.batch_size = options["batch_size"]
+        tables = [
+            model._meta.db_table
+            for model in (
+                get_user_model(),
+                Tag,
+                Ingredient,
+                Recipe,
+                Recipe.tags.through,
+                Recipe.ingredients.through,
+            )
+        ]
+
+        constraints = []
+        if options["drop_foreign_keys"]:
+            constraints = self.drop_foreign_keys(tables)
+        try:
+            self.load(options)
+        finally:
+            failures = self.add_foreign_keys(constraints)
+        if failures:
+            raise CommandError(
+                f"{len(failures)} foreign keys could not be restored"
+            )
+
+        if not options["skip_search_vector"]:
+            self.update_search_vectors(*self.recipe_ids)
+        with connection.cursor() as cursor:
+            for table in tables:
+                cursor.execute(f"ANALYZE {connection.ops.quote_name(table)}")
+        self.stdout.write(self.style.SUCCESS("Seeding done"))
+
+    def load(self, options):
+        """Generate and copy the rows of every table
+
+        Args:
+            options (dict): Command options
+        """
+        rng = random.Random(options["seed"])
+        users = options["users"]
+        per_user = {
+            Tag: options["tags"],
+            Ingredient: options["ingredients"],
+            Recipe: options["recipes"],
+        }
+        self.now = timezone.now()
+
+        first_ids = {
+            model: self.reserve_ids(model, count)
+            for model, count in (
+                (get_user_model(), users),
+                (Tag, users * per_user[Tag]),
+                (Ingredient, users * per_user[Ingredient]),
+                (Recipe, users * per_user[Recipe]),
+            )
+        }
+        first_user = first_ids[get_user_model()]
+
+        password = make_password(options["password"])
+        self.copy(
+            get_user_model(),
+            ("id", "password", "is_superuser", "email", "name"),
+            (
+                (
+                    pk,
+                    password,
+                    False,
+                    f"{options['email_prefix']}-{pk}@example.com",
+                    f"User {pk}",
+                )
+                for pk in range(first_user, first_user + users)
+            ),
+            users,
+            extra={"is_active": True, "is_staff": False},
+        )
+        for model in (Tag, Ingredient):
+            self.copy(
+                model,
+                ("id", "name", "user"),
+                (
+                    (
+                        first_ids[model] + user * per_user[model] + i,
+                        f"{model._meta.verbose_name.title()} {i}",
+                        first_user + user,
+                    )
+                    for user in range(users)
+                    for i in range(per_user[model])
+                ),
+                users * per_user[model],
+                extra={"updated_at": self.now},
+            )
+        self.copy(
+            Recipe,
+            ("id", "user", "title", "time_minutes", "price"),
+            (
+                (
+                    first_ids[Recipe] + user * per_user[Recipe] + i,
+                    first_user + user,
+                    f"Recipe {i} {rng.choice(TITLE_WORDS)}",
+                    rng.randrange(5, 180),
+                    Decimal(rng.randrange(100, 99999)) / 100,
+                )
+                for user in range(users)
+                for i in range(per_user[Recipe])
+            ),
+            users * per_user[Recipe],
+            extra={
+                "link": "",
+                "image_state": "",
+                "image_variants": "{}",
+                "updated_at": self.now,
+            },
+        )
+
+        for field, model, per_recipe in (
+            ("tags", Tag, options["tags_per_recipe"]),
+            ("ingredients", Ingredient, options["ingredients_per_recipe"]),
+        ):
+            per_recipe = min(per_recipe, per_user[model])
+            through = getattr(Recipe, field).through
+            self.copy(
+                through,
+                ("recipe", model._meta.model_name),
+                (
+                    (
+                        first_ids[Recipe] + user * per_user[Recipe] + i,
+                        first_ids[model] + user * per_user[model] + related,
+                    )
+                    for user in range(users)
+                    for i in range(per_user[Recipe])
+                    for related in rng.sample(
+                        range(per_user[model]), per_recipe
+                    )
+                ),
+                users * per_user[Recipe] * per_recipe,
+            )
+        self.recipe_ids = (first_ids[Recipe], users * per_user[Recipe])
+
+    def drop_foreign_keys(self, tables) -> list:
+        """Drop the foreign keys of the tables, see `add_foreign_keys`
+
+        Checking a deferred foreign key costs a lookup per inserted row,
+        adding the constraint back validates all rows in a single join.
+        They are all dropped in one transaction, or none is.
+
+        Args:
+            tables (list): Names of the seeded tables
+
+        Returns:
+            list: Table, name and definition of the dropped constraints
+        """
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Pending checks of deferred constraints would block ALTER TABLE
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+            cursor.execute(
+                "SELECT conrelid::regclass::text, conname, "
+                "pg_get_constraintdef(oid) FROM pg_constraint "
+                "WHERE contype = 'f' AND conrelid = ANY(%s::regclass[])",
+                [tables],
+            )
+            constraints = cursor.fetchall()
+            for table, name, _ in constraints:
+                cursor.execute(
+                    f"ALTER TABLE {table} DROP CONSTRAINT "
+                    f"{connection.ops.quote_name(name)}"
+                )
+        return constraints
+
+    def add_foreign_keys(self, constraints) -> list:
+        """Restore the foreign keys dropped by `drop_foreign_keys`
+
+        They are all added back NOT VALID first, which checks new rows
+        without scanning the table, then the loaded rows are validated one
+        constraint at a time. A constraint which fails to be added or
+        validated doesn't stop the others, it's reported and left NOT VALID
+        or missing.
+
+        Args:
+            constraints (list): Table, name and definition of each of them
+
+        Returns:
+            list: Table, name and error of the constraints that failed
+        """
+        start = time.perf_counter()
+        failures = []
+        added = []
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+            for table, name, definition in constraints:
+                if not definition.endswith("NOT VALID"):
+                    definition = f"{definition} NOT VALID"
+                try:
+                    with transaction.atomic():
+                        cursor.execute(
+                            f"ALTER TABLE {table} ADD CONSTRAINT "
+                            f"{connection.ops.quote_name(name)} {definition}"
+                        )
+                except DatabaseError as e:
+                    failures.append((table, name, str(e).strip()))
+                else:
+                    added.append((table, name))
+            for table, name in added:
+                try:
+                    with transaction.atomic():
+                        cursor.execute(
+                            f"ALTER TABLE {table} VALIDATE CONSTRAINT "
+                            f"{connection.ops.quote_name(name)}"
+                        )
+                except DatabaseError as e:
+                    failures.append((table, name, str(e).strip()))
+        for table, name, error in failures:
+            self.stderr.write(f"Foreign key {table}.{name} failed: {error}")
+        if constraints:
+            self.stdout.write(
+                f"{len(constraints) - len(failures)}/{len(constraints)} "
+                f"foreign keys checked in {time.perf_counter() - start:.1f}s"
+            )
+        return failures
+
+    def reserve_ids(self, model, count: int) -> int:
+        """Advance the id sequence of the model past `count` new ids
+
+        Args:
+            model ([type]): Model whose ids are reserved
+            count (int): Number of ids to reserve
+
+        Returns:
+            int: First reserved id
+        """
+        if not count:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                "nextval(pg_get_serial_sequence(%s, 'id')) + %s - 1)",
+                [model._meta.db_table] * 2 + [count],
+            )
+            last = cursor.fetchone()[0]
+        return last - count + 1
+
+    def copy(self, model, fields, rows, total: int, extra=None):
+        """Stream rows into the table of the model in batches
+
+        Args:
+            model ([type]): Model of the table
+            fields (tuple): Names of the fields of each row
+            rows ([type]): Iterable of row tuples
+            total (int): Number of rows, for the progress report
+            extra (dict, optional): Field values shared by all rows.
+                Defaults to None.
+        """
+        extra = extra or {}
+        table = model._meta.db_table
+        columns = ", ".join(
+            connection.ops.quote_name(model._meta.get_field(name).column)
+            for name in (*fields, *extra)
+        )
+        suffix = "".join(f"\t{copy_value(value)}" for value in extra.values())
+        sql = f"COPY {connection.ops.quote_name(table)} ({columns}) FROM STDIN"
+
+        rows = iter(rows)
+        done = 0
+        start = time.perf_counter()
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            buffer = io.StringIO(
+                "".join(
+                    "\t".join(map(copy_value, row)) + suffix + "\n"
+                    for row in batch
+                )
+            )
+            with connection.cursor() as cursor:
+                cursor.copy_expert(sql, buffer)
+            done += len(batch)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"{table:<24} {done:>12,}/{total:,} rows "
+                f"{done / elapsed:,.0f} rows/s"
+            )
+
+    def update_search_vectors(self, first_id: int, count: int):
+        """Build the search vectors of the seeded recipes in batches
+
+        Args:
+            first_id (int): Id of the first seeded recipe
+            count (int): Number of seeded recipes
+        """
+        start = time.perf_counter()
+        for offset in range(0, count, self.batch_size):
+            Recipe.objects.filter(
+                id__gte=first_id + offset,
+                id__lt=first_id + min(offset + self.batch_size, count),
+            ).update_search_vector()
+            done = min(offset + self.batch_size, count)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"{'search vectors':<24} {done:>12,}/{count:,} rows "
+                f"{done / elapsed:,.0f} rows/s"
+            )
@@ -0,0 +1,386 @@
+import bisect
+import fcntl
+import glob
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Every file starts with the number of used slots and the slot count
+HEADER = struct.Struct("<II")
+# A slot is a float followed by its key, JSON padded with spaces
+VALUE = struct.Struct("<d")
+SLOT_SIZE = 256
+KEY_SIZE = SLOT_SIZE - VALUE.size
+# Samples of the exited processes, merged by the server's master process
+ARCHIVE_NAME = "archive.db"
+
+# Metrics by name, only these are exposed
+REGISTRY = {}
+
+
+class MetricsFile:
+    """Fixed-size memory-mapped file holding the samples of one process
+
+    Samples are appended to the first free slot, then only their values
+    change. Only the owning process writes the file, readers see a slot once
+    the used count includes it.
+
+    Args:
+        path (str): Path of the file, created if missing
+        slots (int): Number of samples the file can hold
+    """
+
+    def __init__(self, path: str, slots: int):
+        self.path = path
+        self.lock = threading.Lock()
+        self.offsets = {}
+        self.full = False
+
+        size = HEADER.size + slots * SLOT_SIZE
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self.mm = mmap.mmap(fd, os.fstat(fd).st_size)
+        finally:
+            os.close(fd)
+
+        self.used, self.slots = HEADER.unpack_from(self.mm, 0)
+        if self.slots == 0:
+            self.slots = slots
+            HEADER.pack_into(self.mm, 0, self.used, self.slots)
+        for key, offset in iter_slots(self.mm, self.used):
+            self.offsets[key] = offset
+
+    def inc(self, key: str, amount: float = 1.0):
+        """Add `amount` to the sample of the key, creating it at 0
+
+        Args:
+            key (str): Key of the sample, see `sample_key`
+            amount (float, optional): Increment. Defaults to 1.0.
+        """
+        with self.lock:
+            offset = self.offsets.get(key)
+            if offset is None:
+                offset = self.allocate(key)
+                if offset is None:
+                    return
+            (value,) = VALUE.unpack_from(self.mm, offset)
+            VALUE.pack_into(self.mm, offset, value + amount)
+
+    def allocate(self, key: str):
+        encoded = key.encode()
+        if len(encoded) > KEY_SIZE or self.used >= self.slots:
+            if not self.full:
+                self.full = True
+                logger.warning(
+                    "Metrics file %s can't hold %s, dropping the samples "
+                    "that don't fit, raise METRICS_MAX_SAMPLES",
+                    self.path,
+                    key,
+                )
+            return None
+
+        offset = HEADER.size + self.used * SLOT_SIZE
+        start, end = offset + VALUE.size, offset + SLOT_SIZE
+        self.mm[start:end] = encoded.ljust(KEY_SIZE)
+        VALUE.pack_into(self.mm, offset, 0.0)
+        self.used += 1
+        HEADER.pack_into(self.mm, 0, self.used, self.slots)
+        self.offsets[key] = offset
+        return offset
+
+    def close(self):
+        self.mm.close()
+
+
+def iter_slots(buffer, used: int):
+    """Yield the key and offset of the first `used` slots of a file"""
+    for index in range(used):
+        offset = HEADER.size + index * SLOT_SIZE
+        start, end = offset + VALUE.size, offset + SLOT_SIZE
+        key = bytes(buffer[start:end])
+        yield key.decode().rstrip(), offset
+
+
+def read_samples(path: str):
+    """Yield the key and value of every sample of a metrics file
+
+    Args:
+        path (str): Path of a file written by `MetricsFile`
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        return
+    used, slots = HEADER.unpack_from(data, 0)
+    used = min(used, slots, (len(data) - HEADER.size) // SLOT_SIZE)
+    for key, offset in iter_slots(data, used):
+        if key:
+            yield key, VALUE.unpack_from(data, offset)[0]
+
+
+_file = None
+_file_lock = threading.Lock()
+
+
+def get_metrics_file():
+    """Return the metrics file of this process, None when disabled
+
+    Forked workers, and changed METRICS_DIR settings, get a new file.
+    """
+    global _file
+    directory = settings.METRICS_DIR
+    if not directory:
+        return None
+    path = os.path.join(directory, f"{os.getpid()}.db")
+    if _file is None or _file.path != path:
+        with _file_lock:
+            if _file is None or _file.path != path:
+                os.makedirs(directory, exist_ok=True)
+                if _file is not None:
+                    # Only unmaps it here, a parent process keeps its own
+                    _file.close()
+                _file = MetricsFile(path, settings.METRICS_MAX_SAMPLES)
+    return _file
+
+
+def sample_key(name: str, labels: tuple, suffix: str = "") -> str:
+    return json.dumps([name, list(labels), suffix], separators=(",", ":"))
+
+
+class Counter:
+    """Monotonic count, summed across processes
+
+    Args:
+        name (str): Metric name
+        documentation (str): HELP text
+        labelnames (tuple): Names of the labels, in the order of `inc`'s
+            arguments
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        REGISTRY[name] = self
+
+    def inc(self, *labels, amount: float = 1.0):
+        metrics_file = get_metrics_file()
+        if metrics_file is not None:
+            metrics_file.inc(sample_key(self.name, labels), amount)
+
+    def expose(self, samples: dict) -> list:
+        return [
+            format_sample(self.name, self.labelnames, labels, value)
+            for (labels, suffix), value in sorted(samples.items())
+        ]
+
+
+class Histogram:
+    """Distribution of observations in fixed buckets, summed across processes
+
+    Each bucket is stored on its own and made cumulative when exposed, so an
+    observation writes two samples: its bucket and the sum.
+
+    Args:
+        name (str): Metric name
+        documentation (str): HELP text
+        labelnames (tuple): Names of the labels, in the order of `observe`'s
+            arguments
+        buckets (tuple): Sorted upper bounds, +Inf is added
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: tuple, buckets: tuple
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(float(bound) for bound in buckets)
+        self.bounds = [format_value(bound) for bound in self.buckets]
+        self.bounds.append("+Inf")
+        REGISTRY[name] = self
+
+    def observe(self, value: float, *labels):
+        metrics_file = get_metrics_file()
+        if metrics_file is None:
+            return
+        bound = self.bounds[bisect.bisect_left(self.buckets, value)]
+        metrics_file.inc(sample_key(self.name, labels, bound))
+        metrics_file.inc(sample_key(self.name, labels, "sum"), value)
+
+    def expose(self, samples: dict) -> list:
+        lines = []
+        labelsets = sorted({labels for labels, suffix in samples})
+        labelnames = (*self.labelnames, "le")
+        for labels in labelsets:
+            count = 0.0
+            for bound in self.bounds:
+                count += samples.get((labels, bound), 0.0)
+                lines.append(
+                    format_sample(
+                        f"{self.name}_bucket",
+                        labelnames,
+                        (*labels, bound),
+                        count,
+                    )
+                )
+            lines.append(
+                format_sample(
+                    f"{self.name}_sum",
+                    self.labelnames,
+                    labels,
+                    samples.get((labels, "sum"), 0.0),
+                )
+            )
+            lines.append(
+                format_sample(
+                    f"{self.name}_count", self.labelnames, labels, count
+                )
+            )
+        return lines
+
+
+def format_value(value: float) -> str:
+    return repr(float(value))
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def format_sample(name: str, labelnames, labels, value: float) -> str:
+    if labelnames:
+        pairs = ",".join(
+            f'{labelname}="{escape_label(str(label))}"'
+            for labelname, label in zip(labelnames, labels)
+        )
+        name = f"{name}{{{pairs}}}"
+    return f"{name} {format_value(value)}"
+
+
+def collect(directory: str) -> dict:
+    """Sum the samples of every process by metric
+
+    Args:
+        directory (str): METRICS_DIR
+
+    Returns:
+        dict: Samples by (labels, suffix) by metric name
+    """
+    metrics = {}
+    files = []
+    with directory_lock(directory, fcntl.LOCK_SH):
+        for path in glob.glob(os.path.join(directory, "*.db")):
+            try:
+                files.append(list(read_samples(path)))
+            except OSError:
+                # The file was removed while reading it
+                continue
+    for samples in files:
+        for key, value in samples:
+            try:
+                name, labels, suffix = json.loads(key)
+            except ValueError:
+                continue
+            if name not in REGISTRY:
+                continue
+            samples_by_key = metrics.setdefault(name, {})
+            sample = (tuple(labels), suffix)
+            samples_by_key[sample] = samples_by_key.get(sample, 0.0) + value
+    return metrics
+
+
+@contextmanager
+def directory_lock(directory: str, operation: int):
+    """Lock the metrics files against archiving, or reading when exclusive
+
+    Args:
+        directory (str): METRICS_DIR
+        operation (int): `fcntl.LOCK_SH` to read, `fcntl.LOCK_EX` to merge
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, ".lock"), "a") as f:
+        fcntl.flock(f, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def archive_process(directory: str, pid: int):
+    """Merge the samples of an exited process into the archive file
+
+    Keeps the number of files bounded while workers are recycled, without
+    the totals going down.
+
+    Args:
+        directory (str): METRICS_DIR
+        pid (int): Id of the exited process
+    """
+    path = os.path.join(directory, f"{pid}.db")
+    if not os.path.exists(path):
+        return
+    with directory_lock(directory, fcntl.LOCK_EX):
+        archive = MetricsFile(
+            os.path.join(directory, ARCHIVE_NAME),
+            settings.METRICS_MAX_SAMPLES,
+        )
+        try:
+            for key, value in read_samples(path):
+                archive.inc(key, value)
+        finally:
+            archive.close()
+        os.remove(path)
+
+
+def clear_metrics(directory: str):
+    """Remove the metrics files of a previous run of the server
+
+    Args:
+        directory (str): METRICS_DIR
+    """
+    with directory_lock(directory, fcntl.LOCK_EX):
+        for path in glob.glob(os.path.join(directory, "*.db")):
+            os.remove(path)
+
+
+def generate_latest(directory: str) -> str:
+    """Render the metrics of every process in the text exposition format
+
+    Args:
+        directory (str): METRICS_DIR
+    """
+    metrics = collect(directory)
+    lines = []
+    for name, metric in sorted(REGISTRY.items()):
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.type}")
+        lines.extend(metric.expose(metrics.get(name, {})))
+    return "\n".join(lines) + "\n"
+
+
+REQUESTS = Counter(
+    "http_requests_total",
+    "Requests handled, by route, method and status.",
+    ("route", "method", "status"),
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time to handle requests, by route and method.",
+    ("route", "method"),
+    settings.METRICS_LATENCY_BUCKETS,
+)
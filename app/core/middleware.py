@@ -0,0 +1,133 @@
+import cProfile
+import logging
+import os
+import random
+import time
+
+from core.metrics import REQUEST_LATENCY, REQUESTS
+from core.profiling import RequestTimer
+from core.queries import QueryBudgetExceeded, get_query_budget, track_queries
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCountMiddleware:
+    """Count the SQL queries of every request and check them on a budget
+
+    With QUERY_COUNT_HEADERS the count and the SQL time are sent in the
+    `X-Query-Count` and `X-Query-Time` headers. Requests over the budget of
+    their view, see `core.queries.get_query_budget`, are logged, or fail
+    with QUERY_BUDGET_STRICT. Rows read while a streaming response is sent
+    come after the middleware and aren't counted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.query_budget = settings.QUERY_BUDGET
+        with track_queries(keep_sql=settings.QUERY_BUDGET_STRICT) as stats:
+            response = self.get_response(request)
+
+        if settings.QUERY_COUNT_HEADERS:
+            response["X-Query-Count"] = str(stats.count)
+            response["X-Query-Time"] = f"{stats.duration * 1000:.3f}"
+
+        budget = request.query_budget
+        if budget is not None and stats.count > budget:
+            message = (
+                f"{request.method} {request.path} ran {stats.count} "
+                f"queries in {stats.duration * 1000:.1f}ms, over its budget "
+                f"of {budget}"
+            )
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(
+                    "\n".join([message, *stats.statements])
+                )
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_query_budget(view_func, request.method)
+
+
+class ProfilingMiddleware:
+    """Time the phases of requests and profile a sample of them
+
+    With SERVER_TIMING the time spent authenticating, querying, serializing
+    and rendering, see `core.profiling.timed_phase`, is sent in the
+    `Server-Timing` header along with the SQL and total time. A fraction
+    PROFILE_SAMPLE_RATE of the requests runs under cProfile, their stats
+    are written to PROFILE_DIR for `python -m pstats` or snakeviz. With
+    both off requests go straight through.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        server_timing = settings.SERVER_TIMING
+        rate = settings.PROFILE_SAMPLE_RATE
+        sampled = rate > 0 and random.random() < rate
+        if not server_timing and not sampled:
+            return self.get_response(request)
+
+        with track_queries() as stats:
+            request.timer = RequestTimer(stats)
+            if sampled:
+                profiler = cProfile.Profile()
+                profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    profiler.disable()
+                self.dump_profile(request, profiler)
+            else:
+                response = self.get_response(request)
+
+        if server_timing:
+            response["Server-Timing"] = request.timer.server_timing()
+        return response
+
+    def dump_profile(self, request, profiler):
+        match = request.resolver_match
+        route = match.view_name.replace(":", "-") if match else "unresolved"
+        name = (
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method}-{route}-"
+            f"{os.getpid()}-{random.getrandbits(32):08x}.prof"
+        )
+        try:
+            os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+            profiler.dump_stats(os.path.join(settings.PROFILE_DIR, name))
+        except OSError:
+            logger.exception("Can't write the profile of %s", request.path)
+
+
+class MetricsMiddleware:
+    """Record the count and latency of requests by route
+
+    Routes are the URL names of the views, e.g. `recipe:recipe-list`, so
+    the number of samples stays bounded whatever paths are requested. See
+    `core.metrics` and the `/metrics` endpoint.
+    """
+
+    METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS_DIR:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        route = match.view_name if match else "unmatched"
+        method = request.method if request.method in self.METHODS else "other"
+        REQUESTS.inc(route, method, str(response.status_code))
+        REQUEST_LATENCY.observe(duration, route, method)
+        return response
@@ -0,0 +1,68 @@
+# Generated by Django 2.1.3 on 2026-10-18 10:17
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+def create_index_concurrently(name, table, columns, using=''):
+    """Build the index without locking out writes to a large table"""
+    return migrations.RunSQL(
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{}" ON "{}" {}({})'.format(
+            name, table, 'USING {} '.format(using) if using else '', columns
+        ),
+        'DROP INDEX CONCURRENTLY IF EXISTS "{}"'.format(name),
+    )
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('core', '0008_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                create_index_concurrently(
+                    'core_ingredient_user_name_idx', 'core_ingredient',
+                    '"user_id", "name" DESC, "id"',
+                ),
+                create_index_concurrently(
+                    'core_recipe_allergies_gin', 'core_recipe',
+                    '"allergies_codes"', using='gin',
+                ),
+                create_index_concurrently(
+                    'core_tag_user_name_idx', 'core_tag',
+                    '"user_id", "name" DESC, "id"',
+                ),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='ingredient',
+                    index=models.Index(fields=['user', '-name', 'id'], name='core_ingredient_user_name_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='recipe',
+                    index=django.contrib.postgres.indexes.GinIndex(fields=['allergies_codes'], name='core_recipe_allergies_gin'),
+                ),
+                migrations.AddIndex(
+                    model_name='tag',
+                    index=models.Index(fields=['user', '-name', 'id'], name='core_tag_user_name_idx'),
+                ),
+            ],
+        ),
+        # Reverse lookups of the auto-created through tables, from the
+        # related object to its recipes (the unique constraint covers
+        # recipe_id first)
+        create_index_concurrently(
+            'core_recipe_tags_tag_recipe_idx', 'core_recipe_tags',
+            '"tag_id", "recipe_id"',
+        ),
+        create_index_concurrently(
+            'core_recipe_ingredients_ingredient_recipe_idx',
+            'core_recipe_ingredients', '"ingredient_id", "recipe_id"',
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 2.1.3 on 2026-10-18 10:22
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+
+
+def queue_existing_images(apps, schema_editor):
+    """Queue the images uploaded before the variants existed"""
+    Recipe = apps.get_model('core', 'Recipe')
+    Recipe.objects.exclude(image__isnull=True).exclude(image='').update(
+        image_state='pending'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_state',
+            field=models.CharField(blank=True, choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], db_index=True, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants',
+            field=django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(
+            queue_existing_images, migrations.RunPython.noop
+        ),
+    ]
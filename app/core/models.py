@@ -7,9 +7,16 @@ from django.contrib.auth.models import (
     BaseUserManager,
     PermissionsMixin,
 )
+from core.expressions import ArraySubquery
+from core.storage import ContentAddressedStorage
 from django.db import models
-from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.fields import ArrayField, JSONField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db.models import OuterRef, Subquery, TextField
 from django.db.models.fields import CharField
+from django.utils import timezone
 
 
 def recipe_image_file_path(instance, filename):
@@ -26,6 +33,7 @@ def recipe_image_file_path(instance, filename):
         [type]: [description]
     """
     ext = filename.split(".")[-1]
+    # Recipe.image is stored under its digest, only the extension remains
     filename = f"{uuid.uuid4()}.{ext}"
 
     return os.path.join("uploads/recipe/", filename)
@@ -103,6 +111,15 @@ class Tag(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # User's tags by name as listed and paginated by the API
+            models.Index(
+                fields=["user", "-name", "id"], name="core_tag_user_name_idx"
+            )
+        ]
 
     def __str__(self):
         return self.name
@@ -119,11 +136,102 @@ class Ingredient(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # User's ingredients by name as listed and paginated by the API
+            models.Index(
+                fields=["user", "-name", "id"],
+                name="core_ingredient_user_name_idx",
+            )
+        ]
 
     def __str__(self) -> str:
         return self.name
 
 
+def recipe_search_vector(model):
+    """Return the expression computing a recipe's full-text search vector
+
+    The title weighs more than the names of the linked tags and ingredients.
+
+    Args:
+        model (Model): Recipe model, the historical one in migrations
+
+    Returns:
+        CombinedSearchVector: Expression to be stored in `search_vector`
+    """
+    config = settings.RECIPE_SEARCH_CONFIG
+    vector = SearchVector("title", weight="A", config=config)
+    for field, name in (
+        ("tags", "tag__name"),
+        ("ingredients", "ingredient__name"),
+    ):
+        names = (
+            getattr(model, field)
+            .through.objects.filter(recipe=OuterRef("pk"))
+            .values("recipe")
+            .annotate(names=StringAgg(name, " "))
+            .values("names")
+        )
+        vector += SearchVector(
+            Subquery(names, output_field=TextField()),
+            weight="B",
+            config=config,
+        )
+    return vector
+
+
+class RecipeQuerySet(models.QuerySet):
+    """Queries shared by the recipe read paths"""
+
+    def touch(self):
+        """Mark the recipes as modified and rebuild their search vectors
+
+        Returns:
+            int: Number of updated recipes
+        """
+        return self.update(
+            updated_at=timezone.now(),
+            search_vector=recipe_search_vector(self.model),
+        )
+
+    def update_search_vector(self):
+        """Rebuild the search vectors in a single UPDATE statement
+
+        Returns:
+            int: Number of updated recipes
+        """
+        return self.update(search_vector=recipe_search_vector(self.model))
+
+    def with_relation_ids(self):
+        """Annotate every recipe with its tag and ingredient ids
+
+        Both id lists are collected by correlated ARRAY() subqueries, so
+        they come back in the same statement as the recipes themselves and
+        the number of queries doesn't grow with the number of rows. Ids are
+        sorted, which the unique (recipe_id, <related>_id) index provides.
+
+        Returns:
+            RecipeQuerySet: Recipes with `tag_ids` and `ingredient_ids`
+        """
+        return self.annotate(
+            tag_ids=ArraySubquery(
+                Recipe.tags.through.objects.filter(recipe=OuterRef("pk"))
+                .order_by("tag_id")
+                .values("tag_id")
+            ),
+            ingredient_ids=ArraySubquery(
+                Recipe.ingredients.through.objects.filter(
+                    recipe=OuterRef("pk")
+                )
+                .order_by("ingredient_id")
+                .values("ingredient_id")
+            ),
+        )
+
+
 class Recipe(models.Model):
     """Recipe object
 
@@ -132,6 +240,14 @@ class Recipe(models.Model):
     """
 
     ALLERGIES_CODES = (("GL", "Glucose"), ("LT", "Lactose"), ("EG", "Eggs"))
+    IMAGE_PENDING = "pending"
+    IMAGE_READY = "ready"
+    IMAGE_FAILED = "failed"
+    IMAGE_STATES = (
+        (IMAGE_PENDING, "Pending"),
+        (IMAGE_READY, "Ready"),
+        (IMAGE_FAILED, "Failed"),
+    )
 
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE
@@ -146,7 +262,17 @@ class Recipe(models.Model):
     # but then it would require Ingredient to be above Recipe
     ingredients = models.ManyToManyField("Ingredient")
     tags = models.ManyToManyField("Tag")
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image = models.ImageField(
+        null=True,
+        upload_to=recipe_image_file_path,
+        storage=ContentAddressedStorage(),
+    )
+    # Pending recipes are the queue of the process_images command
+    image_state = models.CharField(
+        max_length=10, choices=IMAGE_STATES, blank=True, db_index=True
+    )
+    # Variant name to storage path, see recipe.images
+    image_variants = JSONField(default=dict, blank=True, editable=False)
     allergies_codes = ArrayField(
         CharField(
             max_length=5,
@@ -154,6 +280,93 @@ class Recipe(models.Model):
         ),
         null=True,
     )
+    # Also touched when the recipe's tags or ingredients change,
+    # see core.signals
+    updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by core.signals, never computed when reading
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_vector"]),
+            GinIndex(
+                fields=["allergies_codes"], name="core_recipe_allergies_gin"
+            ),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class ImageBlobQuerySet(models.QuerySet):
+    def retain(self, name: str):
+        """Count a new reference to the stored file
+
+        Args:
+            name (str): Storage name of the file
+        """
+        self.get_or_create(name=name)
+        self.filter(name=name).update(ref_count=models.F("ref_count") + 1)
+
+    def release(self, name: str):
+        """Drop a reference to the stored file
+
+        Args:
+            name (str): Storage name of the file
+        """
+        self.filter(name=name).update(ref_count=models.F("ref_count") - 1)
+
+    def reuse(self, name: str):
+        """Record that the stored file was saved again
+
+        Keeps it from being collected before the new reference is counted,
+        see gc_images.
+
+        Args:
+            name (str): Storage name of the file
+        """
+        self.update_or_create(name=name, defaults={"used_at": timezone.now()})
+
+
+class ImageBlob(models.Model):
+    """Stored image file and the number of recipes using it
+
+    Maintained by core.signals, unreferenced blobs are removed by the
+    gc_images command.
+
+    Args:
+        models ([type]): [description]
+    """
+
+    name = models.CharField(max_length=255, unique=True)
+    ref_count = models.IntegerField(default=0, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Last time the file was stored, the same content reuses it
+    used_at = models.DateTimeField(default=timezone.now)
+
+    objects = ImageBlobQuerySet.as_manager()
+
+    def __str__(self):
+        return self.name
+
+
+class ImageUpload(models.Model):
+    """Chunked upload of a recipe image, see recipe.uploads
+
+    The received bytes are only tracked by the size of the temporary file,
+    so an interrupted chunk never leaves the upload in a wrong state.
+
+    Args:
+        models ([type]): [description]
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    recipe = models.ForeignKey("Recipe", on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.filename
@@ -0,0 +1,44 @@
+import io
+
+from core.renderers import FastJSONRenderer
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONParser(JSONParser):
+    """Parse JSON with orjson when it is installed
+
+    orjson only reads UTF-8 and rejects NaN and Infinity like the strict
+    `JSONParser`. Other encodings, and the documents orjson refuses but the
+    standard library accepts (e.g. integers over 64 bits), are parsed by
+    `JSONParser` so the results and errors stay the same.
+
+    Args:
+        JSONParser (JSONParser):
+        https://www.django-rest-framework.org/api-guide/parsers/#jsonparser
+    """
+
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if (
+            orjson is None
+            or not self.strict
+            or encoding.lower().replace("_", "-") not in ("utf-8", "utf8")
+        ):
+            return super().parse(stream, media_type, parser_context)
+
+        content = stream.read()
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            return super().parse(
+                io.BytesIO(content), media_type, parser_context
+            )
@@ -0,0 +1,57 @@
+import time
+from contextlib import contextmanager
+
+
+class RequestTimer:
+    """Time spent by a request in each of its phases
+
+    The SQL time of `stats` is reported as its own `db` phase and taken
+    out of the other phases, so they only count the Python side.
+
+    Args:
+        stats (QueryStats): SQL statements of the request
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.start = time.perf_counter()
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        sql_start = self.stats.duration
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            elapsed -= self.stats.duration - sql_start
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def server_timing(self) -> str:
+        """Return the phases as the value of a Server-Timing header"""
+        phases = {
+            **self.phases,
+            "db": self.stats.duration,
+            "total": time.perf_counter() - self.start,
+        }
+        return ", ".join(
+            f"{name};dur={duration * 1000:.3f}"
+            for name, duration in phases.items()
+        )
+
+
+@contextmanager
+def timed_phase(request, name: str):
+    """Add the time of the block to a phase of the request, if it's timed
+
+    Args:
+        request ([type]): Django or DRF request, None to skip timing
+        name (str): Name of the phase in the Server-Timing header
+    """
+    timer = getattr(request, "timer", None)
+    if timer is None:
+        yield
+        return
+    with timer.phase(name):
+        yield
@@ -0,0 +1,71 @@
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised instead of logging when QUERY_BUDGET_STRICT is set"""
+
+
+class QueryStats:
+    """Database execute wrapper counting statements and their SQL time
+
+    Args:
+        keep_sql (bool, optional): Also record the statements, for error
+            messages. Defaults to False.
+    """
+
+    def __init__(self, keep_sql=False):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = [] if keep_sql else None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            if self.statements is not None:
+                self.statements.append(sql)
+
+
+@contextmanager
+def track_queries(keep_sql=False):
+    """Count the statements run on every database connection of the thread
+
+    Args:
+        keep_sql (bool, optional): Also record the statements.
+            Defaults to False.
+
+    Yields:
+        QueryStats: Numbers updated as the statements run
+    """
+    stats = QueryStats(keep_sql)
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+        yield stats
+
+
+def get_query_budget(view_func, method: str):
+    """Return the number of queries the view may run for the method
+
+    Viewsets declare budgets per action in `query_budgets`, other views a
+    single `query_budget`. Views without one get QUERY_BUDGET.
+
+    Args:
+        view_func ([type]): View function resolved for the request
+        method (str): HTTP method of the request
+    """
+    cls = getattr(view_func, "cls", None)
+    actions = getattr(view_func, "actions", None) or {}
+    budgets = getattr(cls, "query_budgets", None) or {}
+    action = actions.get(method.lower())
+    if action in budgets:
+        return budgets[action]
+    budget = getattr(cls, "query_budget", None)
+    return settings.QUERY_BUDGET if budget is None else budget
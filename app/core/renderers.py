@@ -0,0 +1,58 @@
+from core.profiling import timed_phase
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """Render JSON with orjson when it is installed
+
+    The output is the same as `JSONRenderer`'s: compact, UTF-8, with the
+    types orjson doesn't know (Decimal, lazy strings, ...) and the datetime
+    family handed to DRF's encoder so they keep DRF's formats. Anything
+    orjson can't do itself, indented output included, goes through
+    `JSONRenderer`.
+
+    Args:
+        JSONRenderer (JSONRenderer):
+        https://www.django-rest-framework.org/api-guide/renderers/#jsonrenderer
+    """
+
+    def __init__(self):
+        self.default = self.encoder_class().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        request = (renderer_context or {}).get("request")
+        with timed_phase(request, "render"):
+            return self.render_json(
+                data, accepted_media_type, renderer_context
+            )
+
+    def render_json(self, data, accepted_media_type, renderer_context):
+        fast = orjson is not None and self.compact and not self.ensure_ascii
+        if not fast or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.default,
+                option=orjson.OPT_NON_STR_KEYS
+                | orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        except orjson.JSONEncodeError:
+            # e.g. integers over 64 bits, or the encoder's own error
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same escaping as JSONRenderer, keeps the output a JavaScript subset
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+                b"\xe2\x80\xa9", b"\\u2029"
+            )
+        return ret
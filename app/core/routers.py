@@ -0,0 +1,97 @@
+import random
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+_state = threading.local()
+
+
+def _pin_key(user_id: int) -> str:
+    return f"replica:pinned:{user_id}"
+
+
+def pin_to_primary(user_id: int):
+    """Read the user's data from the primary for REPLICA_PIN_SECONDS
+
+    Called once their writes commit, so they see them before the replicas
+    catch up.
+
+    Args:
+        user_id (int): Id of the user who wrote
+    """
+    if settings.DATABASE_REPLICAS:
+        caches[settings.REPLICA_PIN_CACHE_ALIAS].set(
+            _pin_key(user_id), True, settings.REPLICA_PIN_SECONDS
+        )
+
+
+def is_pinned(user_id: int) -> bool:
+    """Return whether the user wrote in the last REPLICA_PIN_SECONDS"""
+    return bool(
+        caches[settings.REPLICA_PIN_CACHE_ALIAS].get(_pin_key(user_id))
+    )
+
+
+def set_replica_reads(enabled: bool):
+    """Allow the reads of this thread to go to the replicas, or stop it"""
+    _state.replica_reads = enabled
+
+
+class ReplicaRouter:
+    """Send reads to the DATABASE_REPLICAS where they are allowed
+
+    Reads use a random replica only while enabled for the thread, see
+    `ReplicaReadMixin`, and outside of transactions. Everything else,
+    writes included, goes to the default database.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or not getattr(_state, "replica_reads", False):
+            return None
+        # Transactions must see their own writes
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema by replication
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """Serve the safe requests of a view from the replicas
+
+    Authentication and permissions are checked on the primary. Users who
+    wrote recently, see `pin_to_primary`, keep reading from the primary.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            settings.DATABASE_REPLICAS
+            and request.method in SAFE_METHODS
+            and not is_pinned(request.user.pk)
+        ):
+            set_replica_reads(True)
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            set_replica_reads(False)
@@ -0,0 +1,141 @@
+import threading
+
+from core.models import ImageBlob, Ingredient, Recipe, Tag
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+_pending = threading.local()
+
+
+def touch_recipes(recipe_ids):
+    """Touch the recipes once the transaction commits
+
+    A recipe is saved, then its tags and ingredients are set, every step
+    adds its recipes and a single UPDATE touches them all after the last
+    one, see `RecipeQuerySet.touch`. Outside of a transaction the recipes
+    are touched right away.
+
+    Args:
+        recipe_ids (iterable): Ids of the changed recipes
+    """
+    pending = getattr(_pending, "recipe_ids", None)
+    if pending is None:
+        pending = _pending.recipe_ids = set()
+    pending.update(recipe_ids)
+    transaction.on_commit(flush_touched_recipes)
+
+
+def flush_touched_recipes():
+    # The first callback of the commit touches every pending recipe, ids
+    # left by a rolled back transaction only get a harmless extra touch
+    recipe_ids = getattr(_pending, "recipe_ids", None)
+    if recipe_ids:
+        _pending.recipe_ids = set()
+        Recipe.objects.filter(pk__in=recipe_ids).touch()
+
+
+@receiver(post_save, sender=Recipe, dispatch_uid="core_recipe_saved")
+def update_recipe_search_vector(sender, instance, **kwargs):
+    """Rebuild the search vector of a saved recipe"""
+    touch_recipes([instance.pk])
+
+
+@receiver(
+    m2m_changed,
+    sender=Recipe.tags.through,
+    dispatch_uid="core_touch_recipe_tags_changed",
+)
+@receiver(
+    m2m_changed,
+    sender=Recipe.ingredients.through,
+    dispatch_uid="core_touch_recipe_ingredients_changed",
+)
+def touch_recipes_on_relation_change(
+    sender, instance, action, reverse, model, pk_set, **kwargs
+):
+    """Touch recipes whose tags or ingredients changed"""
+    if not reverse:
+        if action.startswith("post_"):
+            touch_recipes([instance.pk])
+    elif action in ("post_add", "post_remove"):
+        touch_recipes(pk_set)
+    elif action == "pre_clear":
+        # Afterwards there is no way to tell which recipes were linked
+        instance._cleared_recipe_ids = list(
+            instance.recipe_set.values_list("pk", flat=True)
+        )
+    elif action == "post_clear":
+        touch_recipes(instance._cleared_recipe_ids)
+
+
+@receiver(post_save, sender=Tag, dispatch_uid="core_touch_recipes_tag")
+@receiver(post_save, sender=Ingredient, dispatch_uid="core_touch_recipes_ingr")
+def touch_recipes_on_save(sender, instance, created, **kwargs):
+    """Touch recipes showing a renamed tag or ingredient"""
+    if not created:
+        touch_recipes(instance.recipe_set.values_list("pk", flat=True))
+
+
+@receiver(pre_delete, sender=Tag, dispatch_uid="core_linked_recipes_tag")
+@receiver(
+    pre_delete, sender=Ingredient, dispatch_uid="core_linked_recipes_ingr"
+)
+def remember_linked_recipes(sender, instance, **kwargs):
+    """Remember the recipes of a tag or ingredient about to be deleted"""
+    instance._linked_recipe_ids = list(
+        instance.recipe_set.values_list("pk", flat=True)
+    )
+
+
+@receiver(post_delete, sender=Tag, dispatch_uid="core_touch_recipes_tag_del")
+@receiver(
+    post_delete, sender=Ingredient, dispatch_uid="core_touch_recipes_ingr_del"
+)
+def touch_recipes_on_delete(sender, instance, **kwargs):
+    """Touch recipes which lost a tag or ingredient"""
+    linked = getattr(instance, "_linked_recipe_ids", None)
+    if linked:
+        touch_recipes(linked)
+
+
+@receiver(pre_save, sender=Recipe, dispatch_uid="core_recipe_image_before")
+def remember_recipe_image(sender, instance, update_fields, **kwargs):
+    """Remember the image a saved recipe had in the database"""
+    instance._stored_image = None
+    if instance._state.adding or (
+        update_fields is not None and "image" not in update_fields
+    ):
+        return
+    instance._stored_image = (
+        Recipe.objects.filter(pk=instance.pk)
+        .values_list("image", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=Recipe, dispatch_uid="core_recipe_image_saved")
+def count_recipe_image_references(sender, instance, update_fields, **kwargs):
+    """Move the reference of a recipe to its new image blob"""
+    if update_fields is not None and "image" not in update_fields:
+        return
+    stored, image = getattr(instance, "_stored_image", None), instance.image
+    if (stored or None) == (image.name or None):
+        return
+    if image:
+        ImageBlob.objects.retain(image.name)
+    if stored:
+        ImageBlob.objects.release(stored)
+
+
+@receiver(post_delete, sender=Recipe, dispatch_uid="core_recipe_image_deleted")
+def release_recipe_image(sender, instance, **kwargs):
+    """Drop the reference of a deleted recipe to its image blob"""
+    if instance.image:
+        ImageBlob.objects.release(instance.image.name)
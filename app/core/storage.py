@@ -0,0 +1,91 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# Directory of the stored blobs and of the files being hashed
+BLOBS_DIR = "uploads/recipe/blobs"
+BLOBS_TMP_DIR = "uploads/tmp"
+# Bytes read at a time when hashing a local file
+READ_SIZE = 64 * 1024
+
+
+def blob_name(digest: str, ext: str) -> str:
+    """Return the storage name of the content with the given digest
+
+    Args:
+        digest (str): SHA-256 of the content in hex
+        ext (str): Extension of the file, with its dot
+    """
+    return os.path.join(BLOBS_DIR, digest[:2], f"{digest}{ext}")
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Store each distinct file once, named after the SHA-256 of its content
+
+    The content is hashed while it is written to a temporary file, which is
+    then renamed to its digest or dropped when that blob already exists.
+    The same name always holds the same bytes, so URLs never go stale.
+    References to the blobs are counted by `core.models.ImageBlob`.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Only the extension of the proposed name is kept, see _save
+        return name
+
+    def _save(self, name, content):
+        temp_dir = self.path(BLOBS_TMP_DIR)
+        os.makedirs(temp_dir, exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=temp_dir)
+        digest = hashlib.sha256()
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    f.write(chunk)
+        except BaseException:
+            os.remove(temp)
+            raise
+        return self._commit(temp, digest.hexdigest(), name)
+
+    def save_local(self, path: str, name: str, digest: str = None) -> str:
+        """Move a local file into the storage
+
+        Used for files already written under MEDIA_ROOT, they are renamed
+        without being copied, and hashed unless the digest is given.
+
+        Args:
+            path (str): File to move, it's gone afterwards
+            name (str): Proposed name, only its extension is kept
+            digest (str, optional): SHA-256 of the file in hex, computed
+                while it was written. Defaults to None.
+
+        Returns:
+            str: Name of the blob
+        """
+        if digest is None:
+            sha256 = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(READ_SIZE), b""):
+                    sha256.update(chunk)
+            digest = sha256.hexdigest()
+        return self._commit(path, digest, name)
+
+    def _commit(self, temp: str, digest: str, name: str) -> str:
+        name = blob_name(digest, os.path.splitext(name)[1].lower())
+        path = self.path(name)
+        if os.path.exists(path):
+            from core.models import ImageBlob
+
+            os.remove(temp)
+            # The file is left untouched, its modification time is the one
+            # of its content
+            ImageBlob.objects.reuse(name)
+            return name
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.chmod(temp, self.file_permissions_mode or 0o644)
+        os.replace(temp, path)
+        return name
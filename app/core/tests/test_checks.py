@@ -0,0 +1,35 @@
+from core.checks import check_worker_processes
+from django.test import SimpleTestCase, override_settings
+
+FILE_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": "/tmp/recipe-api-test-cache",
+    }
+}
+
+
+class WorkerProcessesTests(SimpleTestCase):
+    """Test the settings are checked against the number of workers"""
+
+    def test_single_process_local_cache(self):
+        """Test one worker may keep its state in memory"""
+        self.assertEqual(check_worker_processes(1), [])
+
+    def test_workers_local_cache_refused(self):
+        """Test several workers can't share a process-local cache"""
+        problems = check_worker_processes(3)
+
+        self.assertTrue(
+            any("RESPONSE_CACHE_ALIAS" in problem for problem in problems)
+        )
+        self.assertTrue(
+            any("REPLICA_PIN_CACHE_ALIAS" in problem for problem in problems)
+        )
+
+    @override_settings(
+        CACHES=FILE_CACHES, TOKEN_AUTH_SHARED_CACHE_ALIAS="default"
+    )
+    def test_workers_shared_cache(self):
+        """Test several workers may share a cache backend"""
+        self.assertEqual(check_worker_processes(3), [])
@@ -1,8 +1,13 @@
+import json
+from io import StringIO
 from unittest.mock import patch
 
-from django.core.management import call_command
+from core.models import ImageBlob, Ingredient, Recipe, Tag
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
 from django.db.utils import OperationalError
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 
 
 class CommandTests(TestCase):
@@ -21,3 +26,193 @@ class CommandTests(TestCase):
             gi.side_effect = [OperationalError] * 5 + [True]
             call_command("wait_for_db")
             self.assertEqual(gi.call_count, 6)
+
+    def test_benchmark_api(self):
+        """Test the API benchmark reports the endpoints as JSON"""
+        out = StringIO()
+        call_command(
+            "benchmark_api",
+            users=2,
+            recipes=3,
+            tags=2,
+            ingredients=2,
+            requests=2,
+            warmup=1,
+            no_cache=True,
+            endpoints=["recipe-list", "user-me"],
+            stdout=out,
+        )
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["dataset"]["recipes"], 6)
+        self.assertEqual(
+            [endpoint["name"] for endpoint in report["endpoints"]],
+            ["recipe-list", "user-me"],
+        )
+        endpoint = report["endpoints"][0]
+        self.assertEqual(endpoint["status"], {"200": 2})
+        self.assertTrue({"p50", "p95", "p99"} <= set(endpoint["latency_ms"]))
+        self.assertEqual(endpoint["queries"]["max"], 1)
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(get_user_model().objects.exists())
+
+    def test_benchmark_api_unknown_endpoint(self):
+        """Test unknown endpoint names are rejected"""
+        with self.assertRaises(CommandError):
+            call_command(
+                "benchmark_api",
+                users=1,
+                recipes=1,
+                endpoints=["nope"],
+                stdout=StringIO(),
+            )
+
+    def test_seed_data(self):
+        """Test seeding users and their data with COPY"""
+        out = StringIO()
+        options = dict(
+            users=2,
+            tags=3,
+            ingredients=4,
+            recipes=5,
+            tags_per_recipe=2,
+            ingredients_per_recipe=3,
+            batch_size=4,
+            password="seedpass",
+            stdout=out,
+        )
+        call_command("seed_data", **options)
+
+        self.assertEqual(get_user_model().objects.count(), 2)
+        self.assertEqual(Tag.objects.count(), 6)
+        self.assertEqual(Ingredient.objects.count(), 8)
+        self.assertEqual(Recipe.objects.count(), 10)
+        for recipe in Recipe.objects.prefetch_related("tags", "ingredients"):
+            self.assertEqual(len(recipe.tags.all()), 2)
+            self.assertEqual(len(recipe.ingredients.all()), 3)
+            self.assertEqual(
+                {tag.user_id for tag in recipe.tags.all()}, {recipe.user_id}
+            )
+            self.assertIsNotNone(recipe.search_vector)
+        user = get_user_model().objects.first()
+        self.assertTrue(user.check_password("seedpass"))
+        self.assertIn("core_recipe_tags", out.getvalue())
+
+        # Same seed, same data
+        titles = list(Recipe.objects.order_by("id").values_list("title"))
+        Recipe.objects.all().delete()
+        call_command("seed_data", **options)
+        self.assertEqual(
+            list(Recipe.objects.order_by("id").values_list("title")), titles
+        )
+
+    def test_seed_data_keeps_foreign_keys(self):
+        """Test the foreign keys are only dropped when asked to"""
+        with patch(
+            "core.management.commands.seed_data.Command.drop_foreign_keys"
+        ) as drop_foreign_keys:
+            call_command("seed_data", users=1, recipes=1, stdout=StringIO())
+
+        drop_foreign_keys.assert_not_called()
+
+    def test_seed_data_restores_foreign_keys(self):
+        """Test the foreign keys dropped for the load are added back"""
+        query = (
+            "SELECT conname, convalidated FROM pg_constraint "
+            "WHERE contype = 'f'"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(query)
+            before = sorted(cursor.fetchall())
+
+            call_command(
+                "seed_data",
+                users=1,
+                recipes=1,
+                drop_foreign_keys=True,
+                stdout=StringIO(),
+            )
+
+            cursor.execute(query)
+            self.assertEqual(sorted(cursor.fetchall()), before)
+
+    def test_seed_data_reports_invalid_foreign_keys(self):
+        """Test rows breaking a dropped foreign key are reported"""
+
+        def load(command, options):
+            command.recipe_ids = (0, 0)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO core_recipe_tags (recipe_id, tag_id) "
+                    "VALUES (-1, -1)"
+                )
+
+        err = StringIO()
+        with patch(
+            "core.management.commands.seed_data.Command.load", load
+        ), self.assertRaises(CommandError):
+            call_command(
+                "seed_data",
+                drop_foreign_keys=True,
+                stdout=StringIO(),
+                stderr=err,
+            )
+
+        self.assertIn("core_recipe_tags", err.getvalue())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM pg_constraint WHERE contype = 'f' "
+                "AND conrelid = 'core_recipe_tags'::regclass "
+                "AND NOT convalidated"
+            )
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+    def test_benchmark_connections(self):
+        """Test every connection mode is reported with its sockets"""
+        out = StringIO()
+        call_command(
+            "benchmark_connections",
+            requests=3,
+            threads=2,
+            pool_size=1,
+            stdout=out,
+        )
+
+        lines = {
+            line.split()[0]: line.split()[1]
+            for line in out.getvalue().splitlines()[1:]
+        }
+        self.assertEqual(
+            lines,
+            {
+                "new": "6",
+                "persistent": "2",
+                "persistent-checked": "2",
+                "pooled": "1",
+            },
+        )
+
+
+class BenchmarkApiCommitTests(TransactionTestCase):
+    def test_benchmark_api_commits(self):
+        """Test the benchmark requests commit and their rows are removed"""
+        with patch(
+            "recipe.signals.invalidate_committed"
+        ) as invalidate_committed:
+            call_command(
+                "benchmark_api",
+                users=1,
+                recipes=2,
+                tags=2,
+                ingredients=2,
+                requests=1,
+                warmup=0,
+                endpoints=["recipe-create", "recipe-upload-image"],
+                stdout=StringIO(),
+            )
+
+        invalidate_committed.assert_called()
+        self.assertFalse(get_user_model().objects.exists())
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(Tag.objects.exists())
+        self.assertFalse(ImageBlob.objects.exists())
@@ -0,0 +1,118 @@
+import threading
+
+import psycopg2
+from core.db.postgresql.pool import ConnectionPool, close_pools
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.test import SimpleTestCase, TransactionTestCase
+
+
+def make_wrapper(**settings):
+    """Return a new wrapper of the test database with changed settings"""
+    connection = connections[DEFAULT_DB_ALIAS]
+    return type(connection)(
+        {**connection.settings_dict, **settings}, "test-pool"
+    )
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Test the bounded pool of connections"""
+
+    allow_database_queries = True
+
+    def setUp(self):
+        params = connections[DEFAULT_DB_ALIAS].get_connection_params()
+        self.connect = lambda: psycopg2.connect(**params)
+
+    def test_connections_reused(self):
+        """Test returned connections are handed out again, rolled back"""
+        pool = ConnectionPool(2, 1, 30)
+        raw = pool.acquire(self.connect)
+        raw.cursor().execute("SELECT 1")
+        pool.release(raw)
+
+        self.assertIs(pool.acquire(self.connect), raw)
+        self.assertEqual(
+            raw.get_transaction_status(),
+            psycopg2.extensions.TRANSACTION_STATUS_IDLE,
+        )
+        pool.release(raw)
+        pool.close()
+        self.assertTrue(raw.closed)
+
+    def test_pool_bounded(self):
+        """Test checkouts over the size wait, then fail"""
+        pool = ConnectionPool(1, 0.05, 30)
+        raw = pool.acquire(self.connect)
+
+        with self.assertRaises(psycopg2.OperationalError):
+            pool.acquire(self.connect)
+
+        threading.Timer(0.01, pool.release, [raw]).start()
+        pool.timeout = 5
+        self.assertIs(pool.acquire(self.connect), raw)
+        pool.discard(raw)
+
+    def test_broken_connections_dropped(self):
+        """Test connections closed while idle aren't handed out"""
+        pool = ConnectionPool(2, 1, 0)
+        raw = pool.acquire(self.connect)
+        pool.release(raw)
+        raw.close()
+
+        other = pool.acquire(self.connect)
+
+        self.assertIsNot(other, raw)
+        pool.discard(other)
+
+
+class DatabaseWrapperTests(TransactionTestCase):
+    """Test the health checks and pooling of the database backend"""
+
+    def tearDown(self):
+        close_pools()
+
+    def test_pooled_connection_returned(self):
+        """Test requests give their connection back to the pool"""
+        wrapper = make_wrapper(POOL_SIZE=1, POOL_TIMEOUT=0.05)
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+
+        other = make_wrapper(POOL_SIZE=1, POOL_TIMEOUT=0.05)
+        with self.assertRaises(OperationalError):
+            other.ensure_connection()
+
+        # As on request_finished
+        wrapper.close_if_unusable_or_obsolete()
+        self.assertIsNone(wrapper.connection)
+        self.assertFalse(raw.closed)
+        other.ensure_connection()
+        self.assertIs(other.connection, raw)
+        other.close()
+
+    def test_health_check(self):
+        """Test dropped persistent connections are reopened"""
+        wrapper = make_wrapper(CONN_MAX_AGE=None, CONN_HEALTH_CHECKS=True)
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        # As on request_started
+        wrapper.close_if_unusable_or_obsolete()
+        self.assertIs(wrapper.connection, raw)
+
+        raw.close()
+        with wrapper.cursor() as cursor:
+            cursor.execute("SELECT 1")
+
+        self.assertIsNot(wrapper.connection, raw)
+        wrapper.close()
+
+    def test_no_health_check(self):
+        """Test connections are reused as they are without health checks"""
+        wrapper = make_wrapper(CONN_MAX_AGE=None, CONN_HEALTH_CHECKS=False)
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        wrapper.close_if_unusable_or_obsolete()
+
+        wrapper.ensure_connection()
+
+        self.assertIs(wrapper.connection, raw)
+        wrapper.close()
@@ -0,0 +1,175 @@
+import os
+import tempfile
+
+from core.metrics import (
+    MetricsFile,
+    archive_process,
+    clear_metrics,
+    read_samples,
+    sample_key,
+)
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+METRICS_URL = reverse("metrics")
+TAGS_URL = reverse("recipe:tag-list")
+
+
+@override_settings(METRICS_TOKEN="secret")
+class MetricsTests(TestCase):
+    """Test recording and exposing request metrics"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        settings = override_settings(METRICS_DIR=self.directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "metrics@gmail.com", "testpass"
+        )
+        self.client.force_authenticate(self.user)
+
+    def _scrape(self):
+        """Request the metrics like a scraper holding the token"""
+        return self.client.get(METRICS_URL, HTTP_AUTHORIZATION="Bearer secret")
+
+    def test_requests_exposed(self):
+        """Test requests are counted and timed by route"""
+        self.client.get(TAGS_URL)
+        self.client.get(TAGS_URL)
+        self.client.post(TAGS_URL, {})
+
+        res = self._scrape()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res["Content-Type"].startswith("text/plain"))
+        lines = res.content.decode().splitlines()
+        self.assertIn("# TYPE http_requests_total counter", lines)
+        self.assertIn(
+            'http_requests_total{route="recipe:tag-list",method="GET",'
+            'status="200"} 2.0',
+            lines,
+        )
+        self.assertIn(
+            'http_requests_total{route="recipe:tag-list",method="POST",'
+            'status="400"} 1.0',
+            lines,
+        )
+        self.assertIn(
+            'http_request_duration_seconds_bucket{route="recipe:tag-list",'
+            'method="GET",le="+Inf"} 2.0',
+            lines,
+        )
+        self.assertIn(
+            'http_request_duration_seconds_count{route="recipe:tag-list",'
+            'method="GET"} 2.0',
+            lines,
+        )
+
+    def test_unmatched_route(self):
+        """Test unknown paths share a single route"""
+        self.client.get("/nothing/here/")
+        self.client.get("/nor/here/")
+
+        res = self._scrape()
+
+        self.assertIn(
+            'http_requests_total{route="unmatched",method="GET",'
+            'status="404"} 2.0',
+            res.content.decode().splitlines(),
+        )
+
+    def test_processes_aggregated(self):
+        """Test the samples of every worker's file are summed"""
+        self.client.get(TAGS_URL)
+        other = MetricsFile(os.path.join(self.directory.name, "1.db"), 16)
+        key = sample_key(
+            "http_requests_total", ("recipe:tag-list", "GET", "200")
+        )
+        other.inc(key, 3)
+        other.close()
+
+        res = self._scrape()
+
+        self.assertIn(
+            'http_requests_total{route="recipe:tag-list",method="GET",'
+            'status="200"} 4.0',
+            res.content.decode().splitlines(),
+        )
+
+    def test_exited_process_archived(self):
+        """Test the samples of exited workers are kept in the archive"""
+        key = sample_key(
+            "http_requests_total", ("recipe:tag-list", "GET", "200")
+        )
+        for pid in (3, 4):
+            path = os.path.join(self.directory.name, f"{pid}.db")
+            metrics_file = MetricsFile(path, 16)
+            metrics_file.inc(key, pid)
+            metrics_file.close()
+            archive_process(self.directory.name, pid)
+
+        self.assertEqual(
+            sorted(os.listdir(self.directory.name)), [".lock", "archive.db"]
+        )
+        res = self._scrape()
+        self.assertIn(
+            'http_requests_total{route="recipe:tag-list",method="GET",'
+            'status="200"} 7.0',
+            res.content.decode().splitlines(),
+        )
+
+    def test_clear_metrics(self):
+        """Test the files of a previous run are removed"""
+        self.client.get(TAGS_URL)
+
+        clear_metrics(self.directory.name)
+
+        self.assertEqual(os.listdir(self.directory.name), [".lock"])
+
+    def test_file_full(self):
+        """Test samples over the size of the file are dropped"""
+        path = os.path.join(self.directory.name, "2.db")
+        metrics_file = MetricsFile(path, 2)
+        with self.assertLogs("core.metrics", "WARNING"):
+            for key in ("a", "b", "c"):
+                metrics_file.inc(key, 2)
+        metrics_file.inc("a")
+        metrics_file.close()
+
+        self.assertEqual(dict(read_samples(path)), {"a": 3.0, "b": 2.0})
+        reopened = MetricsFile(path, 2)
+        self.assertEqual(set(reopened.offsets), {"a", "b"})
+        reopened.close()
+
+    def test_metrics_token(self):
+        """Test scrapers must send the token"""
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, 401)
+
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION="Bearer wrong")
+        self.assertEqual(res.status_code, 401)
+        self.assertEqual(self._scrape().status_code, 200)
+
+    @override_settings(METRICS_TOKEN="")
+    def test_metrics_refused_without_token(self):
+        """Test the metrics aren't public while no token is set"""
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, 403)
+
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION="Bearer ")
+        self.assertEqual(res.status_code, 403)
+
+    def test_metrics_disabled(self):
+        """Test nothing is recorded or exposed without METRICS_DIR"""
+        with self.settings(METRICS_DIR=""):
+            self.client.get(TAGS_URL)
+            res = self._scrape()
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(os.listdir(self.directory.name), [])
@@ -1,6 +1,7 @@
 from unittest.mock import patch
 
 from core import models
+from core.tests.utils import run_on_commit_callbacks
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 
@@ -81,3 +82,23 @@ class ModelTests(TestCase):
 
         exp_path = f"uploads/recipe/{uuid}.jpg"
         self.assertEqual(file_path, exp_path)
+
+    def test_recipe_touched_on_tags_change(self):
+        """Test changing a recipe's tags updates its modification time"""
+        user = sample_user()
+        recipe = models.Recipe.objects.create(
+            user=user, title="Pancakes", time_minutes=5, price=5.00
+        )
+        tag = models.Tag.objects.create(user=user, name="Breakfast")
+        updated_at = recipe.updated_at
+
+        recipe.tags.add(tag)
+        run_on_commit_callbacks()
+        recipe.refresh_from_db()
+        added_at = recipe.updated_at
+        tag.delete()
+        run_on_commit_callbacks()
+        recipe.refresh_from_db()
+
+        self.assertGreater(added_at, updated_at)
+        self.assertGreater(recipe.updated_at, added_at)
@@ -0,0 +1,84 @@
+import os
+import pstats
+import tempfile
+
+from core.profiling import RequestTimer, timed_phase
+from core.queries import QueryStats
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+def server_timing(response) -> dict:
+    """Return the durations of the Server-Timing header by phase"""
+    phases = {}
+    for metric in response["Server-Timing"].split(", "):
+        name, duration = metric.split(";dur=")
+        phases[name] = float(duration)
+    return phases
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0)
+class ProfilingMiddlewareTests(TestCase):
+    """Test timing and profiling requests"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "profiling@gmail.com", "testpass"
+        )
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    @override_settings(SERVER_TIMING=True)
+    def test_server_timing(self):
+        """Test the phases of the request are sent when enabled"""
+        res = self.client.get(RECIPES_URL)
+
+        phases = server_timing(res)
+        self.assertEqual(
+            set(phases),
+            {"auth", "query", "serialize", "render", "db", "total"},
+        )
+        self.assertGreater(phases["db"], 0)
+        self.assertGreaterEqual(phases["total"], phases["db"])
+
+    def test_no_server_timing(self):
+        """Test the header is off by default"""
+        res = self.client.get(RECIPES_URL)
+
+        self.assertNotIn("Server-Timing", res)
+
+    def test_profile_sampled(self):
+        """Test sampled requests leave a profile named after their route"""
+        with tempfile.TemporaryDirectory() as directory:
+            with self.settings(PROFILE_SAMPLE_RATE=1, PROFILE_DIR=directory):
+                res = self.client.get(RECIPES_URL)
+
+            names = os.listdir(directory)
+            self.assertEqual(len(names), 1)
+            self.assertIn("GET-recipe-recipe-list", names[0])
+            stats = pstats.Stats(os.path.join(directory, names[0]))
+
+        self.assertNotIn("Server-Timing", res)
+        self.assertTrue(stats.total_calls)
+
+    def test_phase_excludes_sql(self):
+        """Test the SQL time of a phase is only counted in db"""
+        stats = QueryStats()
+        timer = RequestTimer(stats)
+
+        with timer.phase("query"):
+            stats.duration += 10
+
+        self.assertLess(timer.phases["query"], 1)
+        self.assertIn("db;dur=10000.000", timer.server_timing())
+
+    def test_untimed_request(self):
+        """Test phases of requests without a timer are skipped"""
+        with timed_phase(None, "query"):
+            pass
@@ -0,0 +1,84 @@
+from unittest.mock import patch
+
+from core.models import Tag
+from core.queries import QueryBudgetExceeded, get_query_budget
+from core.tests.utils import query_budget
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import resolve, reverse
+from recipe.views import RecipeViewSet
+from rest_framework.test import APIClient
+
+TAGS_URL = reverse("recipe:tag-list")
+
+
+class QueryCountMiddlewareTests(TestCase):
+    """Test counting the queries of every request"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "queries@gmail.com", "testpass"
+        )
+        self.client.force_authenticate(self.user)
+
+    @override_settings(QUERY_COUNT_HEADERS=True)
+    def test_query_headers(self):
+        """Test the count and SQL time are sent when enabled"""
+        res = self.client.post(TAGS_URL, {"name": "Vegan"})
+
+        self.assertEqual(res["X-Query-Count"], "1")
+        self.assertGreater(float(res["X-Query-Time"]), 0)
+
+    def test_no_query_headers(self):
+        """Test the headers are off by default"""
+        res = self.client.get(TAGS_URL)
+
+        self.assertNotIn("X-Query-Count", res)
+
+    @override_settings(RESPONSE_CACHE_TIMEOUT=0)
+    @patch.object(RecipeViewSet, "query_budgets", {"list": 0})
+    def test_over_budget_logged(self):
+        """Test requests over their view's budget are logged"""
+        with self.assertLogs("core.middleware", "WARNING") as logs:
+            self.client.get(reverse("recipe:recipe-list"))
+
+        self.assertIn("over its budget of 0", logs.output[0])
+
+    @override_settings(RESPONSE_CACHE_TIMEOUT=0, QUERY_BUDGET_STRICT=True)
+    @patch.object(RecipeViewSet, "query_budgets", {"list": 0})
+    def test_over_budget_strict(self):
+        """Test over budget requests fail in strict mode"""
+        with self.assertRaises(QueryBudgetExceeded) as cm:
+            self.client.get(reverse("recipe:recipe-list"))
+
+        self.assertIn("core_recipe", str(cm.exception))
+
+    def test_view_budgets(self):
+        """Test budgets are read per action, per view, then from settings"""
+        match = resolve(reverse("recipe:recipe-list"))
+        self.assertEqual(
+            get_query_budget(match.func, "GET"),
+            RecipeViewSet.query_budgets["list"],
+        )
+        self.assertEqual(
+            get_query_budget(match.func, "POST"),
+            RecipeViewSet.query_budgets["create"],
+        )
+        match = resolve(reverse("user:token"))
+        self.assertEqual(get_query_budget(match.func, "POST"), 6)
+        with self.settings(QUERY_BUDGET=7):
+            match = resolve(reverse("admin:index"))
+            self.assertEqual(get_query_budget(match.func, "GET"), 7)
+
+    def test_query_budget_helper(self):
+        """Test the helper fails code running too many queries"""
+        with query_budget(1):
+            Tag.objects.count()
+
+        with self.assertRaises(QueryBudgetExceeded) as cm:
+            with query_budget(1):
+                Tag.objects.count()
+                Tag.objects.exists()
+
+        self.assertIn("core_tag", str(cm.exception))
@@ -0,0 +1,136 @@
+import datetime
+import io
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+from unittest import mock
+
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+PAYLOAD = {
+    "results": [
+        OrderedDict(
+            [
+                ("id", 1),
+                ("price", Decimal("12.30")),
+                ("title", "Żurek     ✓"),
+                ("tags", [1, 2, 3]),
+                ("link", ""),
+                ("image", None),
+            ]
+        )
+    ],
+    "created": datetime.datetime(
+        2020, 1, 2, 3, 4, 5, 6789, tzinfo=timezone.utc
+    ),
+    "naive": datetime.datetime(2020, 1, 2, 3, 4, 5),
+    "date": datetime.date(2020, 1, 2),
+    "time": datetime.time(3, 4, 5, 123456),
+    "duration": datetime.timedelta(minutes=90),
+    "uuid": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+    "lazy": gettext_lazy("Lazy"),
+    "bytes": b"raw",
+    "float": 0.1,
+    1: "int key",
+}
+
+
+class FastJSONRendererTests(TestCase):
+    """Test the fast renderer matches the DRF JSONRenderer"""
+
+    def assertSameRender(self, data, accepted_media_type=None, context=None):
+        self.assertEqual(
+            FastJSONRenderer().render(data, accepted_media_type, context),
+            JSONRenderer().render(data, accepted_media_type, context),
+        )
+
+    def test_render_payload(self):
+        """Test decimals, dates and lazy strings are encoded the same way"""
+        self.assertSameRender(PAYLOAD)
+        self.assertSameRender(None)
+        self.assertSameRender([])
+
+    def test_render_indent(self):
+        """Test indented output is rendered the same way"""
+        self.assertSameRender(PAYLOAD, "application/json; indent=4")
+        self.assertSameRender(PAYLOAD, None, {"indent": 2})
+
+    def test_render_big_integer(self):
+        """Test integers orjson can't encode are still rendered"""
+        self.assertSameRender({"big": 2**70})
+
+    def test_render_errors(self):
+        """Test values JSON can't represent raise like JSONRenderer"""
+        aware = datetime.time(3, 4, tzinfo=timezone.utc)
+        with self.assertRaises(ValueError):
+            JSONRenderer().render({"time": aware})
+        with self.assertRaises(ValueError):
+            FastJSONRenderer().render({"time": aware})
+
+    def test_render_without_orjson(self):
+        """Test the renderer falls back when orjson isn't installed"""
+        with mock.patch("core.renderers.orjson", None):
+            self.assertSameRender(PAYLOAD)
+
+
+class FastJSONParserTests(TestCase):
+    """Test the fast parser matches the DRF JSONParser"""
+
+    def parse(self, parser, content, **parser_context):
+        return parser.parse(io.BytesIO(content), None, parser_context)
+
+    def assertSameParse(self, content, **parser_context):
+        self.assertEqual(
+            self.parse(FastJSONParser(), content, **parser_context),
+            self.parse(JSONParser(), content, **parser_context),
+        )
+
+    def test_parse(self):
+        """Test documents are parsed the same way"""
+        self.assertSameParse('{"title": "Żurek", "price": "5.00"}'.encode())
+        self.assertSameParse(b'{"big": 1180591620717411303424}')
+        self.assertSameParse(b'"\\ud800"')
+        self.assertSameParse(
+            '{"title": "Café"}'.encode("latin-1"), encoding="latin-1"
+        )
+
+    def test_parse_errors(self):
+        """Test invalid documents raise a parse error"""
+        for content in (b"", b"{", b'{"price": NaN}', b"\xff"):
+            with self.assertRaises(ParseError):
+                self.parse(FastJSONParser(), content)
+
+    def test_parse_without_orjson(self):
+        """Test the parser falls back when orjson isn't installed"""
+        with mock.patch("core.parsers.orjson", None):
+            self.assertSameParse(b'{"title": "Curry"}')
+
+
+class FastJSONApiTests(TestCase):
+    """Test the API renders and parses with the fast classes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "json@gmail.com", "testpass"
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_api_json(self):
+        """Test JSON requests and responses go through the fast classes"""
+        res = self.client.post(
+            reverse("recipe:tag-list"), {"name": "Vegan"}, format="json"
+        )
+
+        self.assertIsInstance(res.accepted_renderer, FastJSONRenderer)
+        self.assertEqual(res.json()["name"], "Vegan")
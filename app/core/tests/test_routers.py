@@ -0,0 +1,120 @@
+from collections import Counter
+from contextlib import ExitStack
+
+from core.routers import ReplicaRouter, pin_to_primary, set_replica_reads
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+TAGS_URL = reverse("recipe:tag-list")
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRouterTests(SimpleTestCase):
+    """Test choosing the database of reads and writes"""
+
+    allow_database_queries = True
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.addCleanup(set_replica_reads, False)
+
+    def test_reads_on_primary_by_default(self):
+        """Test reads stay on the primary unless enabled"""
+        self.assertIsNone(self.router.db_for_read(None))
+
+    def test_reads_on_replica(self):
+        """Test enabled reads go to a replica, writes never do"""
+        set_replica_reads(True)
+
+        self.assertEqual(self.router.db_for_read(None), "replica")
+        self.assertEqual(self.router.db_for_write(None), DEFAULT_DB_ALIAS)
+
+    def test_transactions_on_primary(self):
+        """Test reads in a transaction stay on the primary"""
+        set_replica_reads(True)
+
+        with transaction.atomic():
+            self.assertIsNone(self.router.db_for_read(None))
+
+    def test_no_migrations_on_replicas(self):
+        """Test the schema is only migrated on the primary"""
+        self.assertFalse(self.router.allow_migrate("replica", "core"))
+        self.assertIsNone(self.router.allow_migrate(DEFAULT_DB_ALIAS, "core"))
+
+
+@override_settings(DATABASE_REPLICAS=["replica"], RESPONSE_CACHE_TIMEOUT=0)
+class ReplicaReadTests(TransactionTestCase):
+    """Test the recipe views read from the replicas"""
+
+    def setUp(self):
+        # A second connection to the test database stands in for a replica
+        connections.databases["replica"] = dict(
+            connections[DEFAULT_DB_ALIAS].settings_dict
+        )
+        self.addCleanup(connections.databases.pop, "replica")
+        self.addCleanup(delattr, connections._connections, "replica")
+        self.addCleanup(lambda: connections["replica"].close())
+        cache.clear()
+
+        self.user = get_user_model().objects.create_user(
+            "replica@gmail.com", "testpass"
+        )
+        token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def count_queries(self, method, *args):
+        """Return the number of queries of a request by database alias"""
+        counts = Counter()
+
+        def wrapper(alias):
+            def count(execute, sql, params, many, context):
+                counts[alias] += 1
+                return execute(sql, params, many, context)
+
+            return count
+
+        with ExitStack() as stack:
+            for alias in (DEFAULT_DB_ALIAS, "replica"):
+                stack.enter_context(
+                    connections[alias].execute_wrapper(wrapper(alias))
+                )
+            getattr(self.client, method)(*args)
+        return counts
+
+    def test_list_on_replica(self):
+        """Test safe requests read from the replica"""
+        counts = self.count_queries("get", TAGS_URL)
+
+        self.assertGreater(counts["replica"], 0)
+
+    def test_writes_on_primary(self):
+        """Test writes and the reads of write requests use the primary"""
+        counts = self.count_queries("post", TAGS_URL, {"name": "Vegan"})
+
+        self.assertEqual(counts["replica"], 0)
+        self.assertGreater(counts[DEFAULT_DB_ALIAS], 0)
+
+    def test_pinned_after_write(self):
+        """Test users read their own writes from the primary"""
+        self.client.post(TAGS_URL, {"name": "Vegan"})
+
+        counts = self.count_queries("get", TAGS_URL)
+        self.assertEqual(counts["replica"], 0)
+
+        cache.clear()
+        counts = self.count_queries("get", TAGS_URL)
+        self.assertGreater(counts["replica"], 0)
+
+    def test_others_not_pinned(self):
+        """Test the writes of one user don't pin the others"""
+        pin_to_primary(self.user.pk + 1)
+
+        counts = self.count_queries("get", TAGS_URL)
+
+        self.assertGreater(counts["replica"], 0)
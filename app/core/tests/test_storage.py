@@ -0,0 +1,93 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from core.models import ImageBlob, Recipe
+from core.storage import BLOBS_DIR
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+
+class ContentAddressedStorageTests(TestCase):
+    """Test storing recipe images once per distinct content"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.media_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.media_override.enable()
+        self.user = get_user_model().objects.create_user(
+            "storage@gmail.com", "testpass"
+        )
+
+    def tearDown(self):
+        self.media_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def _recipe(self, content=None):
+        """Create a recipe, with an image of `content` if given
+
+        Args:
+            content (bytes, optional): [description]. Defaults to None.
+        """
+        recipe = Recipe.objects.create(
+            user=self.user, title="Curry", time_minutes=10, price=5
+        )
+        if content is not None:
+            recipe.image.save("photo.JPG", ContentFile(content))
+        return recipe
+
+    def _ref_count(self, name):
+        return ImageBlob.objects.get(name=name).ref_count
+
+    def test_image_named_after_digest(self):
+        """Test the image is stored under the SHA-256 of its content"""
+        recipe = self._recipe(b"image bytes")
+
+        digest = hashlib.sha256(b"image bytes").hexdigest()
+        self.assertEqual(
+            recipe.image.name,
+            os.path.join(BLOBS_DIR, digest[:2], f"{digest}.jpg"),
+        )
+        with open(recipe.image.path, "rb") as f:
+            self.assertEqual(f.read(), b"image bytes")
+
+    def test_identical_images_stored_once(self):
+        """Test uploading the same content again reuses the blob"""
+        first = self._recipe(b"same photo")
+        second = self._recipe(b"same photo")
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(self._ref_count(first.image.name), 2)
+        blob_dir = os.path.dirname(first.image.path)
+        self.assertEqual(
+            os.listdir(blob_dir), [os.path.basename(first.image.path)]
+        )
+
+    def test_reused_blob_untouched(self):
+        """Test storing the same content again keeps the blob's mtime"""
+        first = self._recipe(b"same photo")
+        os.utime(first.image.path, (0, 0))
+        ImageBlob.objects.update(used_at=timezone.now() - timedelta(days=1))
+
+        self._recipe(b"same photo")
+
+        self.assertEqual(os.stat(first.image.path).st_mtime, 0)
+        blob = ImageBlob.objects.get(name=first.image.name)
+        self.assertGreater(blob.used_at, timezone.now() - timedelta(hours=1))
+
+    def test_references_counted(self):
+        """Test replacing and deleting images updates the counts"""
+        recipe = self._recipe(b"old photo")
+        old_name = recipe.image.name
+        other = self._recipe(b"old photo")
+
+        recipe.image.save("photo.jpg", ContentFile(b"new photo"))
+        self.assertEqual(self._ref_count(old_name), 1)
+        self.assertEqual(self._ref_count(recipe.image.name), 1)
+        other.delete()
+
+        self.assertEqual(self._ref_count(old_name), 0)
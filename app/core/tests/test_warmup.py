@@ -0,0 +1,28 @@
+from core.warmup import warm_up
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import SimpleTestCase
+from django.urls import get_resolver
+
+
+class WarmUpTests(SimpleTestCase):
+    """Test preparing a worker before it accepts requests"""
+
+    allow_database_queries = True
+
+    def setUp(self):
+        self.connection = connections[DEFAULT_DB_ALIAS]
+        self.connection.close()
+
+    def test_warm_up(self):
+        """Test the URLs are compiled and the databases connected"""
+        with self.assertLogs("core.warmup", "INFO"):
+            warm_up()
+
+        self.assertTrue(get_resolver()._populated)
+        self.assertIsNotNone(self.connection.connection)
+
+    def test_warm_up_without_databases(self):
+        """Test no connection is opened before forking"""
+        warm_up(databases=False)
+
+        self.assertIsNone(self.connection.connection)
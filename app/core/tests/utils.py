@@ -0,0 +1,62 @@
+from contextlib import ContextDecorator
+
+from core.queries import QueryBudgetExceeded, track_queries
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import override_settings
+
+
+def enforce_query_budgets(obj):
+    """Fail the requests of a test case that exceed their view's budget
+
+    Decorates a TestCase class or a test method, see
+    `core.middleware.QueryCountMiddleware` for the budgets.
+
+    Args:
+        obj ([type]): Test case class or test method
+    """
+    return override_settings(QUERY_BUDGET_STRICT=True)(obj)
+
+
+class query_budget(ContextDecorator):
+    """Fail when the wrapped code runs more than `budget` queries
+
+    Args:
+        budget (int): Maximum number of queries
+    """
+
+    def __init__(self, budget: int):
+        self.budget = budget
+
+    def __enter__(self):
+        self.tracker = track_queries(keep_sql=True)
+        self.stats = self.tracker.__enter__()
+        return self.stats
+
+    def __exit__(self, *exc_info):
+        self.tracker.__exit__(*exc_info)
+        if exc_info[0] is None and self.stats.count > self.budget:
+            raise QueryBudgetExceeded(
+                "\n".join(
+                    [
+                        f"{self.stats.count} queries over the budget of "
+                        f"{self.budget}:",
+                        *self.stats.statements,
+                    ]
+                )
+            )
+        return False
+
+
+def run_on_commit_callbacks(using: str = DEFAULT_DB_ALIAS):
+    """Run the callbacks waiting for the commit of the test's transaction
+
+    Test cases never commit, call it where the test expects a commit.
+
+    Args:
+        using (str, optional): Database alias. Defaults to "default".
+    """
+    connection = connections[using]
+    while connection.run_on_commit:
+        callbacks, connection.run_on_commit = connection.run_on_commit, []
+        for sids, func in callbacks:
+            func()
@@ -0,0 +1,30 @@
+from core.metrics import generate_latest
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@require_GET
+def metrics(request):
+    """Expose the metrics of every worker process to scrapers
+
+    Scrapers must send METRICS_TOKEN, every request is refused while it
+    isn't set.
+
+    Args:
+        request ([type]): [description]
+    """
+    if not settings.METRICS_DIR:
+        raise Http404
+    if not settings.METRICS_TOKEN:
+        return HttpResponse(status=403)
+    expected = f"Bearer {settings.METRICS_TOKEN}"
+    given = request.META.get("HTTP_AUTHORIZATION", "")
+    if not constant_time_compare(given, expected):
+        return HttpResponse(status=401)
+    return HttpResponse(
+        generate_latest(settings.METRICS_DIR), content_type=CONTENT_TYPE
+    )
@@ -0,0 +1,58 @@
+import logging
+import time
+from importlib import import_module
+from importlib.util import find_spec
+
+from django.apps import apps
+from django.db import connections
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+# Modules of the apps that are otherwise imported by the first request
+APP_MODULES = ("admin", "models", "serializers", "signals", "urls", "views")
+
+
+def import_apps():
+    """Import the request handling modules of every installed app"""
+    for app_config in apps.get_app_configs():
+        for name in APP_MODULES:
+            module = f"{app_config.name}.{name}"
+            if find_spec(module) is not None:
+                import_module(module)
+
+
+def compile_urls():
+    """Import the URLconf and compile the patterns of every URL"""
+    resolver = get_resolver()
+    # Populating the reverse lookups compiles every pattern on the way
+    resolver.reverse_dict
+    for namespace, (prefix, sub_resolver) in resolver.namespace_dict.items():
+        sub_resolver.reverse_dict
+
+
+def connect_databases():
+    """Open a connection to every database
+
+    The connections are then handled as at the end of a request: pooled
+    ones go back to the pool, persistent ones stay open for the first
+    request.
+    """
+    for connection in connections.all():
+        connection.ensure_connection()
+        connection.close_if_unusable_or_obsolete()
+
+
+def warm_up(databases=True):
+    """Do the work of the first request before a worker accepts traffic
+
+    Args:
+        databases (bool, optional): Also connect to the databases, not
+            before forking workers. Defaults to True.
+    """
+    start = time.perf_counter()
+    import_apps()
+    compile_urls()
+    if databases:
+        connect_databases()
+    logger.info("Warmed up in %.1fms", (time.perf_counter() - start) * 1000)
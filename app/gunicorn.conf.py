@@ -0,0 +1,91 @@
+"""
+Gunicorn configuration of the production server.
+
+Run `gunicorn` from this directory, it serves `app.wsgi:application` with
+pre-forked workers. Set GUNICORN_APP=app.asgi:application and
+GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker to serve ASGI instead.
+
+The application is loaded once in the master and shared by the forked
+workers. Each worker warms up, see `core.warmup`, before it accepts
+requests, and is replaced after about GUNICORN_MAX_REQUESTS requests.
+
+More than one worker needs the caches to be shared by the processes, e.g.
+CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache, see
+`core.checks`. The server refuses to start otherwise.
+
+Send HUP to gracefully replace the workers with the current configuration.
+The code is preloaded, so deploying new code takes USR2, to start a new
+master, then QUIT to the old master once the new workers are up.
+
+For more information on this file, see
+https://docs.gunicorn.org/en/20.1.0/settings.html
+"""
+
+import multiprocessing
+import os
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+
+wsgi_app = os.environ.get("GUNICORN_APP", "app.wsgi:application")
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(
+    os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1)
+)
+# Above 1 the threads of a worker share its database pool, see DB_POOL_SIZE
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+worker_class = os.environ.get(
+    "GUNICORN_WORKER_CLASS", "gthread" if threads > 1 else "sync"
+)
+preload_app = True
+# Recycle workers to contain memory growth, jittered so they don't all
+# restart at once
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 100))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+# Time given to workers to finish their requests on reloads and recycling
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+# Heartbeat files on disk stall workers when it's slow, e.g. in Docker
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-")
+
+
+def on_starting(server):
+    from core.checks import check_worker_processes
+    from core.metrics import clear_metrics
+    from django.conf import settings
+
+    problems = check_worker_processes(server.cfg.workers)
+    if problems:
+        raise RuntimeError(
+            f"{server.cfg.workers} workers can't share their state: "
+            + "; ".join(problems)
+            + ". Use a shared CACHE_BACKEND or GUNICORN_WORKERS=1"
+        )
+
+    # A master started by USR2 shares the metrics of the running one
+    if settings.METRICS_DIR and not server.master_pid:
+        clear_metrics(settings.METRICS_DIR)
+
+
+def when_ready(server):
+    from core.warmup import warm_up
+
+    # Imported before forking so the workers share the memory. Connections
+    # can't be shared, the workers open their own
+    warm_up(databases=False)
+
+
+def post_worker_init(worker):
+    from core.warmup import warm_up
+
+    warm_up()
+
+
+def child_exit(server, worker):
+    from core.metrics import archive_process
+    from django.conf import settings
+
+    if settings.METRICS_DIR:
+        archive_process(settings.METRICS_DIR, worker.pid)
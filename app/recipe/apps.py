@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 
 class RecipeConfig(AppConfig):
-    name = 'recipe'
+    name = "recipe"
+
+    def ready(self):
+        from recipe import signals  # noqa: F401
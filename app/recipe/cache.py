@@ -0,0 +1,141 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+# Query parameters that change the list responses, anything else is ignored
+# when building cache keys so junk parameters can't fragment the cache
+CACHED_QUERY_PARAMS = (
+    "assigned_only",
+    "cursor",
+    "fields",
+    "ingredients",
+    "match",
+    "page_size",
+    "search",
+    "tags",
+)
+# Comma separated sets, their order and repetitions don't matter
+SET_QUERY_PARAMS = ("fields", "ingredients", "tags")
+
+
+def get_response_cache():
+    """Return the cache backend storing API responses"""
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def _version_key(user_id: int) -> str:
+    return f"recipe:user-version:{user_id}"
+
+
+def get_user_version(user_id: int) -> int:
+    """Return the current version of the user's recipe data
+
+    Args:
+        user_id (int): Id of the owner of the data
+
+    Returns:
+        int: Version to embed in the user's cache keys
+    """
+    cache = get_response_cache()
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # Seed with the clock rather than 1 so a version key that was evicted
+        # can't come back with a number already used by older responses
+        version = int(time.time() * 1000)
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_user_version(user_id: int):
+    """Invalidate every cached response of the user
+
+    Args:
+        user_id (int): Id of the owner of the changed data
+    """
+    try:
+        get_response_cache().incr(_version_key(user_id))
+    except ValueError:
+        get_user_version(user_id)
+
+
+def normalize_query_params(query_params) -> str:
+    """Return the query parameters relevant for caching in canonical form
+
+    Id and field lists are deduplicated and sorted, as `tags=2,1` and
+    `tags=1,2,2` select the same recipes.
+
+    Args:
+        query_params (QueryDict): Query parameters of the request
+
+    Returns:
+        str: Url encoded, sorted query parameters
+    """
+    params = []
+    for name in CACHED_QUERY_PARAMS:
+        value = query_params.get(name, "").strip()
+        if not value:
+            continue
+        if name in SET_QUERY_PARAMS:
+            value = ",".join(
+                sorted({x.strip() for x in value.split(",")}, key=_id_order)
+            )
+        params.append((name, value))
+    return urlencode(params)
+
+
+def _id_order(value: str):
+    return (not value.isdigit(), int(value) if value.isdigit() else value)
+
+
+def response_cache_key(user_id: int, endpoint: str, query_params) -> str:
+    """Return the cache key of a response
+
+    Args:
+        user_id (int): Id of the authenticated user
+        endpoint (str): Name of the url, e.g. `recipe:tag-list`
+        query_params (QueryDict): Query parameters of the request
+
+    Returns:
+        str: Cache key bound to the current version of the user's data
+    """
+    params = hashlib.md5(
+        normalize_query_params(query_params).encode()
+    ).hexdigest()
+    version = get_user_version(user_id)
+    return f"recipe:response:{user_id}:{version}:{endpoint}:{params}"
+
+
+class CachedListMixin:
+    """Serve list responses from the per user versioned response cache
+
+    Only the serialized data is cached, rendering still honours the content
+    negotiation of every request. Entries become unreachable as soon as the
+    user's version is bumped by `recipe.signals`, and are evicted by the
+    cache backend itself.
+    """
+
+    def list(self, request, *args, **kwargs):
+        timeout = settings.RESPONSE_CACHE_TIMEOUT
+        if not timeout:
+            return super().list(request, *args, **kwargs)
+
+        cache = get_response_cache()
+        key = response_cache_key(
+            request.user.pk,
+            request.resolver_match.view_name,
+            request.query_params,
+        )
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, timeout)
+        return response
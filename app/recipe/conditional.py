@@ -0,0 +1,83 @@
+import hashlib
+
+from django.utils.http import parse_etags, quote_etag
+from recipe.cache import get_user_version, normalize_query_params
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def _strip_weak(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+class ConditionalGetMixin:
+    """Answer `If-None-Match` requests before any serializer runs
+
+    List ETags are derived from the per user data version kept by
+    `recipe.cache`, so a matching list request is answered without touching
+    the database. Object ETags come from `get_object_etag`.
+    """
+
+    def make_etag(self, request, *parts) -> str:
+        """Return a strong ETag for the parts and the response format
+
+        Args:
+            request (Request): Request being answered
+            parts: Values identifying the state of the resource
+
+        Returns:
+            str: Quoted ETag
+        """
+        parts = (
+            request.resolver_match.view_name,
+            request.accepted_media_type,
+            *parts,
+        )
+        digest = hashlib.md5(
+            ":".join(str(part) for part in parts).encode()
+        ).hexdigest()
+        return quote_etag(digest)
+
+    def get_list_etag(self, request):
+        """Return the ETag of the list response"""
+        return self.make_etag(
+            request,
+            request.user.pk,
+            get_user_version(request.user.pk),
+            normalize_query_params(request.query_params),
+        )
+
+    def get_object_etag(self, request):
+        """Return the ETag of the retrieved object, None to skip the check"""
+        return None
+
+    def _conditional_response(self, request, etag, handler, *args, **kwargs):
+        if etag is None:
+            return handler(request, *args, **kwargs)
+
+        if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+        if if_none_match:
+            etags = {_strip_weak(tag) for tag in parse_etags(if_none_match)}
+            if "*" in etags or etag in etags:
+                return Response(
+                    status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+                )
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response["ETag"] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional_response(
+            request, self.get_list_etag(request), super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional_response(
+            request,
+            self.get_object_etag(request),
+            super().retrieve,
+            *args,
+            **kwargs,
+        )
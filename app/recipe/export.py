@@ -0,0 +1,98 @@
+import csv
+from itertools import islice
+
+from core.renderers import FastJSONRenderer
+from recipe.rows import RELATIONS, RecipeDetailRowSerializer
+
+# Columns of the CSV export, followed by the names of the relations
+CSV_FIELDS = ("id", "title", "time_minutes", "price", "link")
+CSV_COLUMNS = CSV_FIELDS + tuple(field for field, _ in RELATIONS)
+# Separator of the related names in a CSV cell
+CSV_NAME_SEPARATOR = "; "
+
+
+class Echo:
+    """File-like object handing back what is written to it
+
+    Lets `csv.writer` format a single row without buffering the file.
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_chunks(serializer, queryset, chunk_size: int):
+    """Yield the recipes of the queryset as lists of row dicts
+
+    Rows are read through a server-side cursor and each chunk gets its tags
+    and ingredients attached with one query per relation, so memory only
+    ever holds a single chunk.
+
+    Args:
+        serializer (RecipeDetailRowSerializer): Reads and attaches the rows
+        queryset ([type]): Recipes to export
+        chunk_size (int): Number of recipes fetched at a time
+    """
+    rows = serializer.rows(queryset).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        serializer.attach(chunk)
+        yield chunk
+
+
+def export_ndjson(queryset, chunk_size: int, request=None):
+    """Stream the recipes as newline delimited JSON
+
+    Each line has the shape of `RecipeDetailSerializer`.
+
+    Args:
+        queryset ([type]): Recipes to export
+        chunk_size (int): Number of recipes fetched at a time
+        request ([type], optional): Makes the image URLs absolute. Defaults to
+            None.
+    """
+    serializer = RecipeDetailRowSerializer(context={"request": request})
+    renderer = FastJSONRenderer()
+    for chunk in iter_chunks(serializer, queryset, chunk_size):
+        yield b"".join(
+            renderer.render(serializer.to_representation(row)) + b"\n"
+            for row in chunk
+        )
+
+
+def export_csv(queryset, chunk_size: int, request=None):
+    """Stream the recipes as CSV with a header row
+
+    Tags and ingredients are exported as their names joined together.
+
+    Args:
+        queryset ([type]): Recipes to export
+        chunk_size (int): Number of recipes fetched at a time
+        request ([type], optional): Makes the image URLs absolute. Defaults to
+            None.
+    """
+    serializer = RecipeDetailRowSerializer(context={"request": request})
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for chunk in iter_chunks(serializer, queryset, chunk_size):
+        yield "".join(
+            writer.writerow(
+                [row[field] for field in CSV_FIELDS]
+                + [
+                    CSV_NAME_SEPARATOR.join(
+                        related["name"] for related in row[field]
+                    )
+                    for field, _ in RELATIONS
+                ]
+            )
+            for row in chunk
+        )
+
+
+# Export format, its row generator and content type
+EXPORT_FORMATS = {
+    "csv": (export_csv, "text/csv"),
+    "ndjson": (export_ndjson, "application/x-ndjson"),
+}
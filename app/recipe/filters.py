@@ -0,0 +1,126 @@
+from core.models import Recipe
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import Count, F, FloatField
+from django.db.models.functions import Cast
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+MATCH_ANY = "any"
+MATCH_ALL = "all"
+SEARCH_PARAM = "search"
+
+
+def parse_id_list(value: str, param: str) -> list:
+    """Convert a comma separated list of ids to a sorted list of integers
+
+    Args:
+        value (str): Value of the query parameter, e.g. `3,1,3`
+        param (str): Name of the query parameter, used in error messages
+
+    Raises:
+        ValidationError: When an id isn't a positive integer
+
+    Returns:
+        list: Unique ids in ascending order
+    """
+    try:
+        ids = {int(x) for x in value.split(",") if x.strip()}
+    except ValueError:
+        raise ValidationError({param: ["Expected a comma separated id list."]})
+    if any(pk < 1 for pk in ids):
+        raise ValidationError({param: ["Ids must be positive integers."]})
+    return sorted(ids)
+
+
+class RecipeFilterBackend(BaseFilterBackend):
+    """Filter recipes by their tags, ingredients and a search query
+
+    `?tags=1,2` and `?ingredients=3` keep recipes linked to any of the ids,
+    `&match=all` only those linked to every one of them. Each relation is
+    compiled to a `recipe.id IN (SELECT recipe_id FROM <through table> ...)`
+    semi-join, so recipes are never duplicated and the query doesn't get
+    another join per id. "Match all" groups the through rows by recipe and
+    compares the number of matched ids instead of chaining joins.
+
+    `?search=` matches the stored `Recipe.search_vector` through its GIN
+    index and annotates the rank used to order the results.
+
+    Args:
+        BaseFilterBackend (BaseFilterBackend):
+        https://www.django-rest-framework.org/api-guide/filtering/#custom-generic-filtering
+    """
+
+    # Query parameter, through table of the relation, related object column
+    relations = (
+        ("tags", Recipe.tags.through, "tag_id"),
+        ("ingredients", Recipe.ingredients.through, "ingredient_id"),
+    )
+
+    def get_match(self, request) -> str:
+        """Return the match mode requested by the `match` parameter"""
+        match = request.query_params.get("match") or MATCH_ANY
+        if match not in (MATCH_ANY, MATCH_ALL):
+            raise ValidationError(
+                {"match": [f'Expected "{MATCH_ANY}" or "{MATCH_ALL}".']}
+            )
+        return match
+
+    def relation_subquery(self, through, column: str, ids: list, match: str):
+        """Return the ids of the recipes linked to the given objects
+
+        Args:
+            through (Model): Through model of the relation
+            column (str): Column of the related object in the through table
+            ids (list): Ids of the related objects
+            match (str): `any` or `all`
+
+        Returns:
+            QuerySet: `recipe_id` values to be used with `pk__in`
+        """
+        rows = through.objects.filter(**{f"{column}__in": ids})
+        if match == MATCH_ALL and len(ids) > 1:
+            # (recipe, object) pairs are unique in the through table
+            rows = (
+                rows.values("recipe_id")
+                .annotate(matched=Count(column))
+                .filter(matched=len(ids))
+            )
+        return rows.values("recipe_id")
+
+    def search(self, queryset, terms: str):
+        """Keep recipes matching the search terms and annotate their rank
+
+        The rank is cast to double precision so it survives the round trip
+        through a pagination cursor.
+
+        Args:
+            queryset (QuerySet): Recipes to search
+            terms (str): Plain text search terms
+
+        Returns:
+            QuerySet: Matching recipes annotated with `search_rank`
+        """
+        query = SearchQuery(terms, config=settings.RECIPE_SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=Cast(
+                SearchRank(F("search_vector"), query), FloatField()
+            )
+        )
+
+    def filter_queryset(self, request, queryset, view):
+        terms = request.query_params.get(SEARCH_PARAM, "").strip()
+        if terms:
+            queryset = self.search(queryset, terms)
+
+        match = self.get_match(request)
+        for param, through, column in self.relations:
+            value = request.query_params.get(param)
+            if not value:
+                continue
+            ids = parse_id_list(value, param)
+            if ids:
+                queryset = queryset.filter(
+                    pk__in=self.relation_subquery(through, column, ids, match)
+                )
+        return queryset
@@ -0,0 +1,181 @@
+import logging
+import os
+from collections import namedtuple
+from functools import lru_cache
+
+from core.models import Recipe
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+Variant = namedtuple(
+    "Variant", ("name", "size", "format", "ext", "quality", "feature")
+)
+
+# Rendered in this order, each variant is resized from the previous one so
+# they must be listed from the largest to the smallest. `feature` is the
+# `PIL.features` name of the codec writing the format
+VARIANTS = (
+    Variant("medium", (800, 800), "JPEG", "jpg", 85, "jpg"),
+    Variant("webp", (800, 800), "WEBP", "webp", 80, "webp"),
+    Variant("thumbnail", (200, 200), "JPEG", "jpg", 80, "jpg"),
+)
+VARIANTS_DIR = "uploads/recipe/variants"
+
+
+@lru_cache(maxsize=None)
+def writable_variants() -> tuple:
+    """Return the VARIANTS whose format this build of Pillow can write
+
+    The others are skipped rather than failing every image.
+    """
+    variants = []
+    for variant in VARIANTS:
+        if features.check(variant.feature):
+            variants.append(variant)
+        else:
+            logger.warning(
+                "Pillow can't write %s, skipping the %s image variant",
+                variant.format,
+                variant.name,
+            )
+    return tuple(variants)
+
+
+def variant_names(image_name: str, variants=VARIANTS) -> dict:
+    """Return the storage names of the variants of an image
+
+    Args:
+        image_name (str): Name or path of the original image
+        variants (tuple, optional): Variants to name. Defaults to VARIANTS.
+
+    Returns:
+        dict: Variant name to its storage name
+    """
+    # The extension stays in the prefix, blobs only differing by it could
+    # otherwise share variants
+    prefix = os.path.basename(image_name).replace(".", "_")
+    return {
+        variant.name: os.path.join(
+            VARIANTS_DIR, f"{prefix}_{variant.name}.{variant.ext}"
+        )
+        for variant in variants
+    }
+
+
+def render_variants(source: str, media_root: str) -> dict:
+    """Decode an image once and write all of its variants
+
+    Runs in the worker processes, so it only touches the file system.
+    Variants in formats Pillow can't write are left out.
+
+    Args:
+        source (str): Path of the original image
+        media_root (str): Directory the variant paths are relative to
+
+    Returns:
+        dict: Variant name to its path relative to `media_root`
+    """
+    variants = writable_variants()
+    names = variant_names(source, variants)
+    paths = {
+        name: os.path.join(media_root, path) for name, path in names.items()
+    }
+    # Variants are named after the blob, a duplicate image has them already
+    if all(os.path.exists(path) for path in paths.values()):
+        return names
+    os.makedirs(os.path.join(media_root, VARIANTS_DIR), exist_ok=True)
+
+    with Image.open(source) as original:
+        # Lets JPEGs be decoded at a reduced scale straight away
+        original.draft("RGB", variants[0].size)
+        image = ImageOps.exif_transpose(original).convert("RGB")
+
+    for variant in variants:
+        image = image.copy()
+        image.thumbnail(variant.size, Image.LANCZOS)
+        path = paths[variant.name]
+        # Readers never see a partially written file
+        temp = f"{path}.{os.getpid()}.tmp"
+        image.save(
+            temp,
+            format=variant.format,
+            quality=variant.quality,
+            optimize=True,
+        )
+        os.replace(temp, path)
+    return names
+
+
+def variant_urls(recipe, request=None) -> dict:
+    """Return the URLs of the recipe's image variants once they are ready
+
+    Args:
+        recipe ([type]): Recipe or dict with the image_state and
+            image_variants of one
+        request ([type], optional): Makes the URLs absolute. Defaults to None.
+    """
+    if isinstance(recipe, dict):
+        state, variants = recipe["image_state"], recipe["image_variants"]
+    else:
+        state, variants = recipe.image_state, recipe.image_variants
+    if state != Recipe.IMAGE_READY:
+        return {}
+    urls = {name: default_storage.url(path) for name, path in variants.items()}
+    if request is not None:
+        urls = {
+            name: request.build_absolute_uri(url) for name, url in urls.items()
+        }
+    return urls
+
+
+def process_pending(executor, batch_size: int) -> int:
+    """Render the variants of a batch of pending recipe images
+
+    The recipes are locked with SKIP LOCKED until their results are saved,
+    so several workers can share the queue and a crashed worker just leaves
+    its batch pending.
+
+    Args:
+        executor ([type]): Executor running `render_variants`
+        batch_size (int): Maximum number of recipes to process
+
+    Returns:
+        int: Number of recipes processed
+    """
+    with transaction.atomic():
+        recipes = list(
+            Recipe.objects.select_for_update(skip_locked=True)
+            .filter(image_state=Recipe.IMAGE_PENDING)
+            .order_by("id")
+            .only("id", "image")[:batch_size]
+        )
+        futures = [
+            (
+                recipe,
+                executor.submit(
+                    render_variants,
+                    recipe.image.path,
+                    settings.MEDIA_ROOT,
+                ),
+            )
+            for recipe in recipes
+        ]
+        for recipe, future in futures:
+            try:
+                changes = {
+                    "image_state": Recipe.IMAGE_READY,
+                    "image_variants": future.result(),
+                }
+            except Exception:
+                logger.exception("Processing image of recipe %s", recipe.pk)
+                changes = {"image_state": Recipe.IMAGE_FAILED}
+            # Bumps the ETag of the recipe detail as well
+            Recipe.objects.filter(pk=recipe.pk).update(
+                updated_at=timezone.now(), **changes
+            )
+    return len(recipes)
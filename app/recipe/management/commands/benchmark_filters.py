@@ -0,0 +1,105 @@
+import random
+import statistics
+import time
+
+from core.models import Recipe, Tag
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipe.filters import MATCH_ALL, MATCH_ANY, RecipeFilterBackend
+
+
+class Rollback(Exception):
+    """Raised to discard the benchmark data"""
+
+
+class Command(BaseCommand):
+    """Compare the recipe tag filters on a large through table
+
+    The data is generated inside a transaction which is rolled back at the
+    end, the database is left untouched.
+
+    Args:
+        BaseCommand (class):
+        https://docs.djangoproject.com/en/3.1/howto/custom-management-commands/#django.core.management.BaseCommand
+    """
+
+    help = "Benchmark the recipe tag filters on generated data"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=20000)
+        parser.add_argument("--tags", type=int, default=50)
+        parser.add_argument("--tags-per-recipe", type=int, default=5)
+        parser.add_argument("--filter-tags", type=int, default=3)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(**options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, **options):
+        rng = random.Random(options["seed"])
+        user = get_user_model().objects.create_user(
+            f"benchmark-{rng.random()}@example.com"
+        )
+        tags = Tag.objects.bulk_create(
+            Tag(user=user, name=f"Tag {i}") for i in range(options["tags"])
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(user=user, title=f"Recipe {i}", time_minutes=10, price=5)
+            for i in range(options["recipes"])
+        )
+        per_recipe = min(options["tags_per_recipe"], len(tags))
+        Recipe.tags.through.objects.bulk_create(
+            (
+                Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag.pk)
+                for recipe in recipes
+                for tag in rng.sample(tags, per_recipe)
+            ),
+            batch_size=5000,
+        )
+        self.stdout.write(
+            f"{len(recipes)} recipes, {len(tags)} tags, "
+            f"{len(recipes) * per_recipe} through rows"
+        )
+
+        ids = [tag.pk for tag in rng.sample(tags, options["filter_tags"])]
+        backend = RecipeFilterBackend()
+        base = Recipe.objects.filter(user=user)
+        through = Recipe.tags.through
+        queries = (
+            ("join (legacy)", base.filter(tags__id__in=ids)),
+            (
+                f"semi-join ({MATCH_ANY})",
+                base.filter(
+                    pk__in=backend.relation_subquery(
+                        through, "tag_id", ids, MATCH_ANY
+                    )
+                ),
+            ),
+            (
+                f"grouped ({MATCH_ALL})",
+                base.filter(
+                    pk__in=backend.relation_subquery(
+                        through, "tag_id", ids, MATCH_ALL
+                    )
+                ),
+            ),
+        )
+        for name, queryset in queries:
+            timings = []
+            for _ in range(options["repeat"]):
+                start = time.perf_counter()
+                rows = list(queryset.values_list("pk", flat=True))
+                timings.append((time.perf_counter() - start) * 1000)
+            self.stdout.write(
+                f"{name:<18} rows={len(rows):<8} "
+                f"unique={len(set(rows)):<8} "
+                f"median={statistics.median(timings):.2f}ms "
+                f"min={min(timings):.2f}ms"
+            )
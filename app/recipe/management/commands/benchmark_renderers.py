@@ -0,0 +1,97 @@
+import io
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer, orjson
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from recipe.rows import RecipeListRowSerializer
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+
+class Command(BaseCommand):
+    """Compare the fast JSON renderer and parser with the DRF ones
+
+    The payloads are built in memory, no database access is needed. `list`
+    is a recipe list page as the API returns it, `raw` keeps the Decimal
+    prices and datetimes which the renderer has to encode itself.
+
+    Args:
+        BaseCommand (class):
+        https://docs.djangoproject.com/en/3.1/howto/custom-management-commands/#django.core.management.BaseCommand
+    """
+
+    help = "Benchmark the JSON renderers on recipe list payloads"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=1000)
+        parser.add_argument("--tags-per-recipe", type=int, default=5)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write("orjson is not installed, fast = fallback")
+
+        rng = random.Random(options["seed"])
+        now = timezone.now()
+        rows = [
+            {
+                "id": i,
+                "title": f"Recipe {i} żurek",
+                "ingredient_ids": rng.sample(range(1000), 3),
+                "tag_ids": rng.sample(range(1000), options["tags_per_recipe"]),
+                "time_minutes": rng.randrange(180),
+                "price": Decimal(rng.randrange(100000)) / 100,
+                "link": f"https://example.com/{i}",
+                "updated_at": now,
+            }
+            for i in range(options["recipes"])
+        ]
+        payloads = (
+            (
+                "list",
+                {
+                    "next": None,
+                    "previous": None,
+                    "results": RecipeListRowSerializer().many(rows),
+                },
+            ),
+            ("raw", rows),
+        )
+
+        for name, payload in payloads:
+            body = JSONRenderer().render(payload)
+            for label, renderer, parser in (
+                ("drf", JSONRenderer(), JSONParser()),
+                ("fast", FastJSONRenderer(), FastJSONParser()),
+            ):
+                render = self.time(
+                    lambda: renderer.render(payload), options["repeat"]
+                )
+                parse = self.time(
+                    lambda: parser.parse(io.BytesIO(body)), options["repeat"]
+                )
+                self.stdout.write(
+                    f"{name:<5} {label:<5} bytes={len(body):<9} "
+                    f"render={render * 1000:.2f}ms "
+                    f"parse={parse * 1000:.2f}ms"
+                )
+
+    def time(self, func, repeat: int) -> float:
+        """Return the median duration of `repeat` calls to func, in seconds
+
+        Args:
+            func ([type]): Function to call without arguments
+            repeat (int): Number of calls
+        """
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings)
@@ -0,0 +1,103 @@
+import random
+import statistics
+import time
+
+from core.models import Recipe, Tag
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipe import rows, serializers
+
+
+class Rollback(Exception):
+    """Raised to discard the benchmark data"""
+
+
+class Command(BaseCommand):
+    """Compare the row serializers with the DRF model serializers
+
+    Rows are fetched once per run, the serialization alone is timed. The
+    data is generated inside a transaction which is rolled back at the end.
+
+    Args:
+        BaseCommand (class):
+        https://docs.djangoproject.com/en/3.1/howto/custom-management-commands/#django.core.management.BaseCommand
+    """
+
+    help = "Benchmark the list serializers on generated data"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=5000)
+        parser.add_argument("--tags", type=int, default=50)
+        parser.add_argument("--tags-per-recipe", type=int, default=5)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(**options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, **options):
+        rng = random.Random(options["seed"])
+        user = get_user_model().objects.create_user(
+            f"benchmark-{rng.random()}@example.com"
+        )
+        tags = Tag.objects.bulk_create(
+            Tag(user=user, name=f"Tag {i}") for i in range(options["tags"])
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(user=user, title=f"Recipe {i}", time_minutes=i, price=5)
+            for i in range(options["recipes"])
+        )
+        per_recipe = min(options["tags_per_recipe"], len(tags))
+        Recipe.tags.through.objects.bulk_create(
+            (
+                Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag.pk)
+                for recipe in recipes
+                for tag in rng.sample(tags, per_recipe)
+            ),
+            batch_size=5000,
+        )
+
+        recipe_queryset = Recipe.objects.filter(user=user).with_relation_ids()
+        tag_queryset = Tag.objects.filter(user=user)
+        cases = (
+            (
+                "recipes",
+                recipe_queryset,
+                serializers.RecipeListSerializer,
+                rows.RecipeListRowSerializer,
+            ),
+            (
+                "tags",
+                tag_queryset,
+                serializers.TagSerializer,
+                rows.TagRowSerializer,
+            ),
+        )
+        for name, queryset, serializer_class, row_serializer_class in cases:
+            instances = list(queryset)
+            row_serializer = row_serializer_class()
+            values = list(row_serializer.rows(queryset))
+            for label, serialize in (
+                (
+                    "drf",
+                    lambda: serializer_class(instances, many=True).data,
+                ),
+                ("rows", lambda: row_serializer.many(values)),
+            ):
+                timings = []
+                for _ in range(options["repeat"]):
+                    start = time.perf_counter()
+                    serialize()
+                    timings.append(time.perf_counter() - start)
+                median = statistics.median(timings)
+                self.stdout.write(
+                    f"{name:<8} {label:<5} rows={len(values):<7} "
+                    f"median={median * 1000:.2f}ms "
+                    f"rows/s={len(values) / median:,.0f}"
+                )
@@ -0,0 +1,96 @@
+from core.models import Ingredient, Tag
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from recipe.views import IngredientViewSet, RecipeViewSet, TagViewSet
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+
+class Command(BaseCommand):
+    """Print the EXPLAIN plans of the recipe API list queries
+
+    The querysets are built by the viewsets themselves for the given user,
+    ordered and sliced the way the cursor pagination fetches the first page.
+
+    Args:
+        BaseCommand (class):
+        https://docs.djangoproject.com/en/3.1/howto/custom-management-commands/#django.core.management.BaseCommand
+    """
+
+    help = "Print the query plans of the recipe API list endpoints"
+
+    def add_arguments(self, parser):
+        parser.add_argument("email", help="Owner of the data to query")
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help="Run the queries and show actual timings",
+        )
+        parser.add_argument(
+            "--search", default="soup", help="Terms of the search query"
+        )
+
+    def get_cases(self, user, search):
+        """Return (name, viewset, query parameters) to explain"""
+        tag_ids = Tag.objects.filter(user=user).values_list("pk", flat=True)
+        tags = ",".join(str(pk) for pk in tag_ids[:3]) or "1"
+        ingredient = (
+            Ingredient.objects.filter(user=user)
+            .values_list("pk", flat=True)
+            .first()
+        ) or 1
+        return (
+            ("tags", TagViewSet, {}),
+            ("tags assigned_only", TagViewSet, {"assigned_only": "1"}),
+            ("ingredients", IngredientViewSet, {}),
+            (
+                "ingredients assigned_only",
+                IngredientViewSet,
+                {"assigned_only": "1"},
+            ),
+            ("recipes", RecipeViewSet, {}),
+            ("recipes tags any", RecipeViewSet, {"tags": tags}),
+            (
+                "recipes tags all",
+                RecipeViewSet,
+                {"tags": tags, "match": "all"},
+            ),
+            (
+                "recipes ingredients",
+                RecipeViewSet,
+                {"ingredients": str(ingredient)},
+            ),
+            ("recipes search", RecipeViewSet, {"search": search}),
+        )
+
+    def get_page_queryset(self, viewset, user, params):
+        """Return the query of the first page of a list endpoint"""
+        request = Request(APIRequestFactory().get("/", params))
+        request.user = user
+        view = viewset()
+        view.request = request
+        view.action = "list"
+        view.format_kwarg = None
+        view.args = ()
+        view.kwargs = {}
+
+        queryset = view.filter_queryset(view.get_queryset())
+        paginator = view.paginator
+        ordering = paginator.get_ordering(request, queryset, view)
+        return queryset.order_by(*ordering)[: paginator.page_size + 1]
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options["email"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User {options['email']} does not exist")
+
+        for name, viewset, params in self.get_cases(user, options["search"]):
+            queryset = self.get_page_queryset(viewset, user, params)
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{name} {params}"))
+            if options["analyze"]:
+                plan = queryset.explain(analyze=True, buffers=True)
+            else:
+                plan = queryset.explain()
+            self.stdout.write(plan)
+            self.stdout.write("")
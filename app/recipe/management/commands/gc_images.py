@@ -0,0 +1,152 @@
+import datetime
+import os
+import time
+
+from core.models import ImageBlob, ImageUpload, Recipe
+from core.storage import BLOBS_DIR, BLOBS_TMP_DIR
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from recipe.images import variant_names
+from recipe.uploads import temp_path
+
+
+class Command(BaseCommand):
+    """Delete image blobs no recipe refers to any more
+
+    Also drops abandoned chunked uploads and leftover temporary files.
+    Files modified and blobs reused within the grace period are always
+    kept, so blobs being stored while the command runs are left alone.
+
+    Args:
+        BaseCommand (class):
+        https://docs.djangoproject.com/en/3.1/howto/custom-management-commands/#django.core.management.BaseCommand
+    """
+
+    help = "Garbage-collect unreferenced recipe images"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace",
+            type=int,
+            default=24 * 60 * 60,
+            help="Seconds a file is kept after its last modification",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        self.storage = Recipe._meta.get_field("image").storage
+        self.dry_run = options["dry_run"]
+        self.cutoff = time.time() - options["grace"]
+        self.cutoff_date = datetime.datetime.fromtimestamp(
+            self.cutoff, tz=timezone.utc
+        )
+
+        blobs = self.collect_blobs()
+        untracked = self.sweep_untracked()
+        uploads = self.collect_uploads()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Removed {blobs} blobs, {untracked} untracked files "
+                f"and {uploads} abandoned uploads"
+            )
+        )
+
+    def is_stale(self, path: str) -> bool:
+        try:
+            return os.path.getmtime(path) < self.cutoff
+        except FileNotFoundError:
+            return True
+
+    def remove(self, name: str, with_variants=True):
+        """Delete a stored file and the variants rendered from it
+
+        Args:
+            name (str): Storage name of the file
+            with_variants (bool, optional): [description]. Defaults to True.
+        """
+        if self.dry_run:
+            return
+        names = [name]
+        if with_variants:
+            names += variant_names(name).values()
+        for name in names:
+            try:
+                os.remove(self.storage.path(name))
+            except FileNotFoundError:
+                pass
+
+    def collect_blobs(self) -> int:
+        removed = 0
+        candidates = ImageBlob.objects.filter(ref_count__lte=0)
+        for pk in candidates.values_list("pk", flat=True).iterator():
+            with transaction.atomic():
+                blob = (
+                    candidates.select_for_update(skip_locked=True)
+                    .filter(pk=pk)
+                    .first()
+                )
+                if blob is None:
+                    continue
+                # The counter is a hint, the recipes are the truth
+                references = Recipe.objects.filter(image=blob.name).count()
+                if references:
+                    blob.ref_count = references
+                    blob.save(update_fields=["ref_count"])
+                    continue
+                if blob.used_at >= self.cutoff_date or not self.is_stale(
+                    self.storage.path(blob.name)
+                ):
+                    continue
+                self.remove(blob.name)
+                if not self.dry_run:
+                    blob.delete()
+                removed += 1
+        return removed
+
+    def sweep_untracked(self) -> int:
+        """Delete old blob files without a row, left by rolled back saves"""
+        removed = 0
+        for directory, _, files in os.walk(self.storage.path(BLOBS_DIR)):
+            names = {
+                os.path.relpath(
+                    os.path.join(directory, filename), self.storage.location
+                )
+                for filename in files
+            }
+            tracked = set(
+                ImageBlob.objects.filter(name__in=names).values_list(
+                    "name", flat=True
+                )
+            )
+            for name in names - tracked:
+                if self.is_stale(self.storage.path(name)):
+                    self.remove(name)
+                    removed += 1
+        return removed
+
+    def collect_uploads(self) -> int:
+        """Delete abandoned uploads and stray temporary files"""
+        removed = 0
+        for upload in ImageUpload.objects.filter(
+            created_at__lt=self.cutoff_date
+        ):
+            # An upload still receiving chunks has a fresh temporary file
+            if self.is_stale(temp_path(upload)):
+                if not self.dry_run:
+                    upload.delete()
+                removed += 1
+
+        # Also drops the files of the uploads deleted above
+        temp_dir = self.storage.path(BLOBS_TMP_DIR)
+        active = {
+            str(pk) for pk in ImageUpload.objects.values_list("pk", flat=True)
+        }
+        if os.path.isdir(temp_dir):
+            for filename in os.listdir(temp_dir):
+                name = os.path.join(BLOBS_TMP_DIR, filename)
+                if filename not in active and self.is_stale(
+                    self.storage.path(name)
+                ):
+                    self.remove(name, with_variants=False)
+        return removed
@@ -0,0 +1,193 @@
+import mimetypes
+import os
+import re
+
+from core.models import Recipe
+from core.storage import BLOBS_DIR, blob_name
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from recipe.images import VARIANTS, VARIANTS_DIR
+from rest_framework import status
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+# Blobs, and the variants rendered from them, start with the content digest
+DIGEST_NAME_RE = re.compile(r"^[0-9a-f]{64}(_\w+)?\.\w+$")
+# Bytes read at a time when serving a file directly
+READ_SIZE = 64 * 1024
+
+
+def image_names(name: str):
+    """Return the names of the recipe images a media file belongs to
+
+    A variant maps back to the originals it may have been rendered from,
+    see `recipe.images.variant_names`.
+
+    Args:
+        name (str): Storage name of the requested file
+    """
+    if os.path.dirname(name) != VARIANTS_DIR:
+        return [name]
+    basename = os.path.basename(name)
+    for variant in VARIANTS:
+        suffix = f"_{variant.name}.{variant.ext}"
+        if basename.endswith(suffix):
+            stem, _, ext = basename[: -len(suffix)].rpartition("_")
+            original = f"{stem}.{ext}"
+            # Blobs, or images stored before them
+            return [
+                blob_name(stem, f".{ext}"),
+                os.path.join("uploads/recipe", original),
+            ]
+    return []
+
+
+def user_owns_media(user, name: str) -> bool:
+    """Tell whether the media file belongs to one of the user's recipes
+
+    Args:
+        user ([type]): [description]
+        name (str): Storage name of the requested file
+    """
+    names = image_names(name)
+    return bool(names) and (
+        Recipe.objects.filter(user=user, image__in=names).exists()
+    )
+
+
+def parse_range(header: str, size: int):
+    """Return the first and last byte of a single range request
+
+    Args:
+        header (str): Value of the `Range` header
+        size (int): Size of the file
+
+    Returns:
+        tuple: First and last byte, None to send the whole file or False
+            when the range can't be satisfied
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        # Multiple or malformed ranges, the whole file is a valid answer
+        return None
+    first, last = match.groups()
+    if not first:
+        # The last n bytes
+        first, last = max(size - int(last), 0), size - 1
+    else:
+        first, last = int(first), min(int(last or size - 1), size - 1)
+    if first > last or first >= size:
+        return False
+    return first, last
+
+
+def iter_file(path: str, first: int, length: int):
+    """Yield `length` bytes of a file starting at `first`
+
+    Args:
+        path (str): [description]
+        first (int): [description]
+        length (int): [description]
+    """
+    with open(path, "rb") as f:
+        f.seek(first)
+        while length > 0:
+            block = f.read(min(READ_SIZE, length))
+            if not block:
+                return
+            length -= len(block)
+            yield block
+
+
+def content_etag(name: str):
+    """Return the ETag of a file named after its content, None otherwise
+
+    Unlike its modification time, the name of a blob or variant only
+    changes with its content.
+
+    Args:
+        name (str): Storage name of the file
+    """
+    directory, basename = os.path.split(name)
+    if not (
+        os.path.dirname(directory) == BLOBS_DIR or directory == VARIANTS_DIR
+    ) or not DIGEST_NAME_RE.match(basename):
+        return None
+    return f'"{os.path.splitext(basename)[0]}"'
+
+
+def serve_file(request, name: str, path: str):
+    """Answer a request for a stored media file
+
+    Stored names never change their content, so the response can be cached
+    for long. With MEDIA_SENDFILE set, the front server sends the file.
+
+    Args:
+        request ([type]): [description]
+        name (str): Storage name of the file
+        path (str): Path of the file
+    """
+    stat = os.stat(path)
+    # Images stored before the blobs are only told apart by their metadata
+    etag = content_etag(name) or f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = send_file(request, name, path, stat.st_size, etag)
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    response[
+        "Cache-Control"
+    ] = f"private, max-age={settings.MEDIA_CACHE_MAX_AGE}, immutable"
+    return response
+
+
+def send_file(request, name: str, path: str, size: int, etag: str):
+    """Return the response transferring the file or the requested range
+
+    Args:
+        request ([type]): [description]
+        name (str): Storage name of the file
+        path (str): Path of the file
+        size (int): Size of the file
+        etag (str): Current ETag, checked against `If-Range`
+    """
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+    backend = settings.MEDIA_SENDFILE
+    if backend == "x-accel-redirect":
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = settings.MEDIA_SENDFILE_PREFIX + name
+        return response
+    if backend == "x-sendfile":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = path
+        return response
+
+    byte_range = None
+    range_header = request.META.get("HTTP_RANGE")
+    if_range = request.META.get("HTTP_IF_RANGE")
+    # A range of an older version of the file must not be served
+    if range_header and (not if_range or if_range == etag):
+        byte_range = parse_range(range_header, size)
+    if byte_range is False:
+        response = HttpResponse(
+            status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    first, last = byte_range or (0, size - 1)
+    length = last - first + 1
+    response = StreamingHttpResponse(
+        iter_file(path, first, length), content_type=content_type
+    )
+    if byte_range:
+        response.status_code = status.HTTP_206_PARTIAL_CONTENT
+        response["Content-Range"] = f"bytes {first}-{last}/{size}"
+    response["Content-Length"] = str(length)
+    response["Accept-Ranges"] = "bytes"
+    return response
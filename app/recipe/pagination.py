@@ -0,0 +1,37 @@
+from django.conf import settings
+from recipe.filters import SEARCH_PARAM
+from rest_framework.pagination import CursorPagination
+
+
+class BaseRecipeCursorPagination(CursorPagination):
+    """Keyset pagination shared by the recipe API list endpoints
+
+    The position of the last row is encoded in the `next` and `previous`
+    cursors, so every page is fetched with an indexed range filter and deep
+    pages cost the same as the first one.
+
+    Args:
+        CursorPagination (CursorPagination):
+        https://www.django-rest-framework.org/api-guide/pagination/#cursorpagination
+    """
+
+    page_size_query_param = "page_size"
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+
+class RecipeAttrCursorPagination(BaseRecipeCursorPagination):
+    """Paginate tags and ingredients by name, ties broken by id"""
+
+    ordering = ("-name", "id")
+
+
+class RecipeCursorPagination(BaseRecipeCursorPagination):
+    """Paginate recipes from the newest one, or the best search match"""
+
+    ordering = ("-id",)
+    search_ordering = ("-search_rank", "-id")
+
+    def get_ordering(self, request, queryset, view):
+        if request.query_params.get(SEARCH_PARAM, "").strip():
+            return self.search_ordering
+        return super().get_ordering(request, queryset, view)
@@ -0,0 +1,253 @@
+from core.models import Recipe
+from core.profiling import timed_phase
+from recipe import serializers
+from recipe.images import variant_urls
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+
+# Relation field and the name of the related model in the through table
+RELATIONS = (("ingredients", "ingredient"), ("tags", "tag"))
+
+
+class RowSerializer:
+    """Read-only serializer building plain dicts from `values()` rows
+
+    Mirrors the output of `serializer_class` without creating a serializer,
+    a model instance or a field lookup per row. Only the fields listed in
+    `converted` go through the DRF field, the others are plain values with
+    the same JSON representation. Given `fields`, only those output names
+    are read from the database and rendered.
+    """
+
+    serializer_class = None
+    # Output name and the column or annotation it is read from
+    fields = ()
+    converted = ()
+    # Output names filled in by `attach` rather than read from a column
+    attached = ()
+
+    def __init__(self, context=None, fields=None):
+        self.context = context or {}
+        if fields is not None:
+            self.fields = tuple(
+                (name, column)
+                for name, column in self.fields
+                if name in fields
+            )
+        names = self.field_names()
+        serializer_fields = self.serializer_class(context=self.context).fields
+        self.converters = [
+            (name, serializer_fields[name].to_representation)
+            for name in self.converted
+            if name in names
+        ]
+
+    def field_names(self) -> tuple:
+        return tuple(name for name, _ in self.fields)
+
+    @property
+    def columns(self):
+        return tuple(
+            column for name, column in self.fields if name not in self.attached
+        )
+
+    def rows(self, queryset, *extra):
+        """Return the rows to serialize from the queryset
+
+        Args:
+            queryset ([type]): [description]
+            extra: Other columns to read, e.g. for the pagination cursor
+        """
+        extra = [column for column in extra if column not in self.columns]
+        return queryset.values(*self.columns, *extra)
+
+    def to_representation(self, row) -> dict:
+        data = {name: row[column] for name, column in self.fields}
+        for name, convert in self.converters:
+            if data[name] is not None:
+                data[name] = convert(data[name])
+        return data
+
+    def many(self, rows) -> list:
+        return [self.to_representation(row) for row in rows]
+
+
+class TagRowSerializer(RowSerializer):
+    serializer_class = serializers.TagSerializer
+    fields = (("id", "id"), ("name", "name"))
+
+
+class IngredientRowSerializer(RowSerializer):
+    serializer_class = serializers.IngredientSerializer
+    fields = (("id", "id"), ("name", "name"))
+
+
+class RecipeListRowSerializer(RowSerializer):
+    """Rows of `RecipeQuerySet.with_relation_ids`"""
+
+    serializer_class = serializers.RecipeListSerializer
+    fields = (
+        ("id", "id"),
+        ("title", "title"),
+        ("ingredients", "ingredient_ids"),
+        ("tags", "tag_ids"),
+        ("time_minutes", "time_minutes"),
+        ("price", "price"),
+        ("link", "link"),
+    )
+    converted = ("price",)
+
+
+class RecipeDetailRowSerializer(RowSerializer):
+    """Rows with the tags and ingredients added by `attach`"""
+
+    serializer_class = serializers.RecipeDetailSerializer
+    fields = (
+        ("id", "id"),
+        ("title", "title"),
+        ("ingredients", "ingredients"),
+        ("tags", "tags"),
+        ("time_minutes", "time_minutes"),
+        ("price", "price"),
+        ("link", "link"),
+        ("image", "image"),
+        ("image_state", "image_state"),
+        ("image_variants", "image_variants"),
+    )
+    converted = ("price",)
+    attached = ("ingredients", "tags")
+
+    def __init__(self, context=None, fields=None):
+        super().__init__(context, fields)
+        self.storage = Recipe._meta.get_field("image").storage
+
+    def rows(self, queryset, *extra):
+        # Needed by `attach` and `variant_urls` whatever the fields
+        return super().rows(queryset, "id", "image_state", *extra)
+
+    def to_representation(self, row) -> dict:
+        data = super().to_representation(row)
+        request = self.context.get("request")
+        if "image" in data:
+            image = data["image"]
+            if image:
+                image = self.storage.url(image)
+                if request is not None:
+                    image = request.build_absolute_uri(image)
+            data["image"] = image or None
+        if "image_variants" in data:
+            data["image_variants"] = variant_urls(row, request)
+        return data
+
+    def attach(self, rows):
+        """Add the related ids and names to recipe rows
+
+        Takes one query per relation whatever the number of rows. Related
+        objects are sorted by id, like `RecipeQuerySet.with_relation_ids`.
+
+        Args:
+            rows ([type]): Row dicts of the recipes
+        """
+        recipes = {row["id"]: row for row in rows}
+        names = self.field_names()
+        for field, name in RELATIONS:
+            if field not in names:
+                continue
+            for row in rows:
+                row[field] = []
+            through = getattr(Recipe, field).through
+            related = (
+                through.objects.filter(recipe_id__in=list(recipes))
+                .order_by("recipe_id", f"{name}_id")
+                .values_list("recipe_id", f"{name}_id", f"{name}__name")
+            )
+            for recipe_id, pk, related_name in related:
+                recipes[recipe_id][field].append(
+                    {"id": pk, "name": related_name}
+                )
+
+    def many(self, rows) -> list:
+        rows = list(rows)
+        self.attach(rows)
+        return super().many(rows)
+
+
+class RowReadMixin:
+    """Serve the read-only actions through row serializers
+
+    Views map actions to a `RowSerializer` in `row_serializer_classes`,
+    the other actions keep their DRF serializers. Clients pick the fields
+    of these actions with `?fields=id,title`, the columns, annotations and
+    relation queries of the other fields are skipped.
+    """
+
+    row_serializer_classes = {}
+
+    def get_requested_fields(self):
+        """Return the output fields picked by the client, None for all"""
+        value = self.request.query_params.get("fields", "")
+        requested = {name.strip() for name in value.split(",")} - {""}
+        if not requested:
+            return None
+        available = [
+            name for name, _ in self.row_serializer_classes[self.action].fields
+        ]
+        unknown = requested.difference(available)
+        if unknown:
+            raise ValidationError(
+                {
+                    "fields": [
+                        "Unknown fields: {}. Choose from: {}.".format(
+                            ", ".join(sorted(unknown)), ", ".join(available)
+                        )
+                    ]
+                }
+            )
+        return requested
+
+    def get_row_serializer(self):
+        return self.row_serializer_classes[self.action](
+            context=self.get_serializer_context(),
+            fields=self.get_requested_fields(),
+        )
+
+    def list(self, request, *args, **kwargs):
+        if self.action not in self.row_serializer_classes:
+            return super().list(request, *args, **kwargs)
+
+        serializer = self.get_row_serializer()
+        queryset = self.filter_queryset(self.get_queryset())
+        # Cursor pagination reads its position from the ordering columns
+        extra = ()
+        if hasattr(self.paginator, "get_ordering"):
+            ordering = self.paginator.get_ordering(request, queryset, self)
+            extra = [field.lstrip("-") for field in ordering]
+        rows = serializer.rows(queryset, *extra)
+
+        with timed_phase(request, "query"):
+            page = self.paginate_queryset(rows)
+            paginated = page is not None
+            if not paginated:
+                page = list(rows)
+        with timed_phase(request, "serialize"):
+            data = serializer.many(page)
+        if paginated:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        if self.action not in self.row_serializer_classes:
+            return super().retrieve(request, *args, **kwargs)
+
+        serializer = self.get_row_serializer()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        rows = serializer.rows(self.filter_queryset(self.get_queryset()))
+        with timed_phase(request, "query"):
+            row = get_object_or_404(
+                rows, **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        self.check_object_permissions(request, row)
+        with timed_phase(request, "serialize"):
+            data = serializer.many([row])[0]
+        return Response(data)
@@ -1,5 +1,63 @@
-from core.models import Ingredient, Recipe, Tag
+import re
+
+from core.models import ImageUpload, Ingredient, Recipe, Tag
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+from recipe.images import variant_urls
+from recipe.signals import invalidate_user
+from recipe.uploads import received_bytes
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+from rest_framework.settings import api_settings
+
+
+class PrimaryKeysRelatedField(serializers.ManyRelatedField):
+    """Many primary keys looked up with one query, whatever their number
+
+    Args:
+        serializers ([type]): [description]
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, "__iter__"):
+            self.fail("not_a_list", input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail("empty")
+
+        child = self.child_relation
+        queryset = child.get_queryset()
+        pks = []
+        for item in data:
+            if child.pk_field is not None:
+                item = child.pk_field.to_internal_value(item)
+            try:
+                pks.append(queryset.model._meta.pk.to_python(item))
+            except (TypeError, ValueError, DjangoValidationError):
+                child.fail("incorrect_type", data_type=type(item).__name__)
+
+        objects = queryset.in_bulk(set(pks)) if pks else {}
+        for pk in pks:
+            if pk not in objects:
+                child.fail("does_not_exist", pk_value=pk)
+        return [objects[pk] for pk in pks]
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key relation validating `many=True` lists in one query
+
+    Args:
+        serializers ([type]): [description]
+    """
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {"child_relation": cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return PrimaryKeysRelatedField(**list_kwargs)
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -35,12 +93,10 @@ class RecipeSerializer(serializers.ModelSerializer):
         serializer ([type]): [description]
     """
 
-    ingredients = serializers.PrimaryKeyRelatedField(
+    ingredients = BulkPrimaryKeyRelatedField(
         many=True, queryset=Ingredient.objects.all()
     )
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True, queryset=Tag.objects.all()
-    )
+    tags = BulkPrimaryKeyRelatedField(many=True, queryset=Tag.objects.all())
 
     class Meta:
         model = Recipe
@@ -56,7 +112,226 @@ class RecipeSerializer(serializers.ModelSerializer):
         read_only_fields = ("id",)
 
 
-class RecipeDetailSerializer(RecipeSerializer):
+class RecipeListSerializer(RecipeSerializer):
+    """Serialize recipes annotated by `RecipeQuerySet.with_relation_ids`
+
+    Args:
+        RecipeSerializer ([type]): [description]
+    """
+
+    ingredients = serializers.ListField(
+        source="ingredient_ids",
+        child=serializers.IntegerField(),
+        read_only=True,
+    )
+    tags = serializers.ListField(
+        source="tag_ids", child=serializers.IntegerField(), read_only=True
+    )
+
+
+class RecipeBulkListSerializer(serializers.ListSerializer):
+    """Validate and write a batch of recipes with a fixed number of queries
+
+    Items with an `id` replace that recipe of the user, all others are
+    created. Errors are reported per item, in the order of the payload.
+
+    Args:
+        serializers ([type]): [description]
+    """
+
+    # Relation field, related model and its column in the through table
+    relations = (
+        ("ingredients", Ingredient, "ingredient_id"),
+        ("tags", Tag, "tag_id"),
+    )
+
+    def to_internal_value(self, data):
+        """Validate the items and check all referenced ids in bulk
+
+        Args:
+            data ([type]): [description]
+        """
+        max_items = settings.RECIPE_BULK_MAX_ITEMS
+        if isinstance(data, list) and len(data) > max_items:
+            raise serializers.ValidationError(
+                {
+                    api_settings.NON_FIELD_ERRORS_KEY: [
+                        f"Ensure there are no more than {max_items} items."
+                    ]
+                }
+            )
+        items = super().to_internal_value(data)
+        errors = [{} for _ in items]
+
+        # Owners of the referenced objects, their cached lists change too
+        self.related_owners = set()
+        does_not_exist = (
+            serializers.PrimaryKeyRelatedField.default_error_messages[
+                "does_not_exist"
+            ]
+        )
+        for field, model, _ in self.relations:
+            ids = {pk for item in items for pk in item.get(field, ())}
+            existing = dict(
+                model.objects.filter(pk__in=ids).values_list("pk", "user_id")
+            )
+            self.related_owners.update(existing.values())
+            for item, item_errors in zip(items, errors):
+                missing = [
+                    pk for pk in item.get(field, ()) if pk not in existing
+                ]
+                if missing:
+                    item_errors[field] = [
+                        does_not_exist.format(pk_value=missing[0])
+                    ]
+
+        update_ids = [item["id"] for item in items if "id" in item]
+        owned = set(
+            Recipe.objects.filter(
+                user=self.context["request"].user, pk__in=update_ids
+            ).values_list("pk", flat=True)
+        )
+        seen = set()
+        for item, item_errors in zip(items, errors):
+            if "id" not in item:
+                continue
+            if item["id"] not in owned:
+                item_errors["id"] = ["Not found."]
+            elif item["id"] in seen:
+                item_errors["id"] = ["Duplicate recipe in the payload."]
+            seen.add(item["id"])
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return items
+
+    def create(self, validated_data):
+        """Insert new recipes and their relations in batched statements
+
+        Args:
+            validated_data ([type]): [description]
+        """
+        relation_data = [
+            {
+                field: attrs.pop(field)
+                for field, _, _ in self.relations
+                if field in attrs
+            }
+            for attrs in validated_data
+        ]
+        new_recipes = Recipe.objects.bulk_create(
+            [Recipe(**attrs) for attrs in validated_data if "id" not in attrs]
+        )
+        existing = Recipe.objects.in_bulk(
+            [attrs["id"] for attrs in validated_data if "id" in attrs]
+        )
+
+        recipes = []
+        # Values of each updated field by recipe
+        updates = {}
+        new_recipes = iter(new_recipes)
+        for attrs in validated_data:
+            if "id" not in attrs:
+                recipes.append(next(new_recipes))
+                continue
+            recipe = existing[attrs.pop("id")]
+            for attr, value in attrs.items():
+                setattr(recipe, attr, value)
+                # Relations are written through their column, e.g. user_id
+                column = Recipe._meta.get_field(attr).attname
+                updates.setdefault(column, {})[recipe.pk] = getattr(
+                    recipe, column
+                )
+            recipes.append(recipe)
+        if existing:
+            self.update_recipes(existing, updates)
+
+        for field, _, column in self.relations:
+            through = getattr(Recipe, field).through
+            replaced = [
+                recipe.pk
+                for recipe, relations in zip(recipes, relation_data)
+                if recipe.pk in existing and field in relations
+            ]
+            if replaced:
+                through.objects.filter(recipe_id__in=replaced).delete()
+            through.objects.bulk_create(
+                [
+                    through(recipe_id=recipe.pk, **{column: pk})
+                    for recipe, relations in zip(recipes, relation_data)
+                    for pk in dict.fromkeys(relations.get(field, ()))
+                ]
+            )
+
+        # Bulk writes bypass the model signals
+        Recipe.objects.filter(
+            pk__in=[recipe.pk for recipe in recipes]
+        ).update_search_vector()
+        owners = {recipe.user_id for recipe in recipes} | self.related_owners
+        for user_id in owners:
+            invalidate_user(user_id)
+        return recipes
+
+    def update_recipes(self, recipes: dict, updates: dict):
+        """Write the changes of every updated recipe in one UPDATE
+
+        Django 2.1 has no bulk_update, each field gets a CASE choosing its
+        value by recipe, recipes without a value for it keep theirs.
+
+        Args:
+            recipes (dict): Updated recipes by id
+            updates (dict): New values by recipe id, by column attribute
+        """
+        fields = {}
+        for column, values in updates.items():
+            field = Recipe._meta.get_field(column)
+            fields[column] = Case(
+                *[
+                    When(pk=pk, then=Value(value, output_field=field))
+                    for pk, value in values.items()
+                ],
+                default=F(column),
+                output_field=field,
+            )
+        Recipe.objects.filter(pk__in=recipes).update(
+            updated_at=timezone.now(), **fields
+        )
+
+
+class RecipeBulkSerializer(RecipeSerializer):
+    """Serialize one item of a bulk write
+
+    Args:
+        RecipeSerializer ([type]): [description]
+    """
+
+    id = serializers.IntegerField(required=False)
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(), required=False
+    )
+    tags = serializers.ListField(
+        child=serializers.IntegerField(), required=False
+    )
+
+    class Meta(RecipeSerializer.Meta):
+        read_only_fields = ()
+        list_serializer_class = RecipeBulkListSerializer
+
+
+class ImageVariantsMixin(serializers.Serializer):
+    """Expose the URLs of the image variants once they are processed
+
+    Args:
+        serializers ([type]): [description]
+    """
+
+    image_variants = serializers.SerializerMethodField()
+
+    def get_image_variants(self, obj):
+        return variant_urls(obj, self.context.get("request"))
+
+
+class RecipeDetailSerializer(ImageVariantsMixin, RecipeSerializer):
     """Serialize a recipe detail
 
     Args:
@@ -66,15 +341,65 @@ class RecipeDetailSerializer(RecipeSerializer):
     ingredients = IngredientSerializer(many=True, read_only=True)
     tags = TagSerializer(many=True, read_only=True)
 
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + (
+            "image",
+            "image_state",
+            "image_variants",
+        )
+        read_only_fields = ("id", "image", "image_state")
 
-class RecipeImageSerializer(serializers.ModelSerializer):
+
+class RecipeImageSerializer(ImageVariantsMixin, serializers.ModelSerializer):
     """Serializer for uploading images to recipes
 
+    The upload only queues the image, the variants are rendered by the
+    process_images command.
+
     Args:
         serializers ([type]): [description]
     """
 
     class Meta:
         model = Recipe
-        fields = ("id", "image")
+        fields = ("id", "image", "image_state", "image_variants")
+        read_only_fields = ("id", "image_state")
+
+    def update(self, instance, validated_data):
+        validated_data.update(
+            image_state=Recipe.IMAGE_PENDING, image_variants={}
+        )
+        return super().update(instance, validated_data)
+
+
+class ImageUploadSerializer(serializers.ModelSerializer):
+    """Serializer for starting and resuming chunked image uploads
+
+    Args:
+        serializers ([type]): [description]
+    """
+
+    received = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImageUpload
+        fields = ("id", "filename", "size", "received")
         read_only_fields = ("id",)
+
+    def get_received(self, obj):
+        return received_bytes(obj)
+
+    def validate_filename(self, value):
+        if not re.match(r"^[^/\\]+\.[A-Za-z0-9]+$", value):
+            raise serializers.ValidationError(
+                "Enter a file name with an extension."
+            )
+        return value
+
+    def validate_size(self, value):
+        max_size = settings.IMAGE_UPLOAD_MAX_SIZE
+        if not 0 < value <= max_size:
+            raise serializers.ValidationError(
+                f"Ensure the size is between 1 and {max_size} bytes."
+            )
+        return value
@@ -0,0 +1,72 @@
+from core.models import Ingredient, Recipe, Tag
+from core.routers import pin_to_primary
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from recipe.cache import bump_user_version
+
+
+def invalidate_user(user_id: int):
+    """Bump the user's data version now and once the transaction commits
+
+    The second bump drops responses cached from a snapshot taken between
+    the write and the commit. The user also reads from the primary for a
+    while after the commit, until the replicas have the change.
+
+    Args:
+        user_id (int): Id of the owner of the changed data
+    """
+    bump_user_version(user_id)
+    transaction.on_commit(lambda: invalidate_committed(user_id))
+
+
+def invalidate_committed(user_id: int):
+    bump_user_version(user_id)
+    pin_to_primary(user_id)
+
+
+@receiver(post_save, sender=Recipe, dispatch_uid="recipe_cache_recipe_saved")
+@receiver(
+    post_delete, sender=Recipe, dispatch_uid="recipe_cache_recipe_deleted"
+)
+@receiver(post_save, sender=Tag, dispatch_uid="recipe_cache_tag_saved")
+@receiver(post_delete, sender=Tag, dispatch_uid="recipe_cache_tag_deleted")
+@receiver(post_save, sender=Ingredient, dispatch_uid="recipe_cache_ingr_saved")
+@receiver(
+    post_delete, sender=Ingredient, dispatch_uid="recipe_cache_ingr_deleted"
+)
+def invalidate_owner(sender, instance, **kwargs):
+    """Invalidate cached responses of the owner of a changed object"""
+    invalidate_user(instance.user_id)
+
+
+@receiver(
+    m2m_changed,
+    sender=Recipe.tags.through,
+    dispatch_uid="recipe_cache_recipe_tags_changed",
+)
+@receiver(
+    m2m_changed,
+    sender=Recipe.ingredients.through,
+    dispatch_uid="recipe_cache_recipe_ingredients_changed",
+)
+def invalidate_relation_owners(
+    sender, instance, action, model, pk_set, **kwargs
+):
+    """Invalidate cached responses of both sides of a changed relation
+
+    Tags and ingredients aren't validated against the recipe's owner, so the
+    other side of the relation may belong to someone else whose
+    `assigned_only` lists change as well.
+    """
+    if not action.startswith("post_"):
+        return
+    user_ids = {instance.user_id}
+    if pk_set:
+        user_ids.update(
+            model.objects.filter(pk__in=pk_set)
+            .values_list("user_id", flat=True)
+            .distinct()
+        )
+    for user_id in user_ids:
+        invalidate_user(user_id)
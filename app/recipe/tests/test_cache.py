@@ -0,0 +1,176 @@
+from core.checks import is_process_local
+from core.models import Ingredient, Recipe, Tag
+from core.tests.utils import enforce_query_budgets
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from recipe.cache import (
+    bump_user_version,
+    get_response_cache,
+    get_user_version,
+    normalize_query_params,
+)
+from rest_framework import status
+from rest_framework.test import APIClient
+
+TAGS_URL = reverse("recipe:tag-list")
+INGREDIENTS_URL = reverse("recipe:ingredient-list")
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+def sample_recipe(user, **params):
+    """Create and return a sample recipe
+
+    Args:
+        user ([type]): [description]
+    """
+    defaults = {"title": "Sample Recipe", "time_minutes": 10, "price": 5.00}
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+@enforce_query_budgets
+class ResponseCacheHelpersTests(TestCase):
+    """Test the cache key and version helpers"""
+
+    def setUp(self):
+        get_response_cache().clear()
+
+    def test_off_over_process_local_cache(self):
+        """Test responses aren't cached by default in a process-local cache"""
+        self.assertTrue(is_process_local(settings.RESPONSE_CACHE_ALIAS))
+        self.assertEqual(settings.RESPONSE_CACHE_TIMEOUT, 0)
+
+    def test_id_lists_normalized(self):
+        """Test that id order and duplicates don't change the key params"""
+        first = normalize_query_params(QueryDict("tags=2,1,2&junk=1"))
+        second = normalize_query_params(QueryDict("tags=1, 2"))
+
+        self.assertEqual(first, second)
+
+    def test_fields_normalized(self):
+        """Test that the order of the requested fields doesn't matter"""
+        first = normalize_query_params(QueryDict("fields=title,id"))
+        second = normalize_query_params(QueryDict("fields=id,title,id"))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, normalize_query_params(QueryDict()))
+
+    def test_bump_user_version(self):
+        """Test bumping a version changes only that user's version"""
+        version = get_user_version(1)
+        other_version = get_user_version(2)
+
+        bump_user_version(1)
+
+        self.assertNotEqual(get_user_version(1), version)
+        self.assertEqual(get_user_version(2), other_version)
+
+    def test_bump_evicted_version(self):
+        """Test bumping a version that was evicted from the cache"""
+        get_response_cache().clear()
+
+        bump_user_version(1)
+
+        self.assertIsNotNone(get_user_version(1))
+
+
+@enforce_query_budgets
+@override_settings(RESPONSE_CACHE_TIMEOUT=300)
+class PrivateResponseCacheTests(TestCase):
+    """Test caching of the authenticated list responses"""
+
+    def setUp(self):
+        get_response_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            "cache@gmail.com", "password123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_served_from_cache(self):
+        """Test a repeated request doesn't query the database"""
+        Tag.objects.create(user=self.user, name="Vegan")
+        res = self.client.get(TAGS_URL)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(TAGS_URL)
+
+        self.assertEqual(cached.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached.data, res.data)
+
+    def test_query_params_part_of_key(self):
+        """Test responses for different filters are cached separately"""
+        Ingredient.objects.create(user=self.user, name="Salt")
+        self.client.get(INGREDIENTS_URL)
+
+        res = self.client.get(INGREDIENTS_URL, {"assigned_only": 1})
+
+        self.assertEqual(res.data["results"], [])
+
+    @override_settings(RESPONSE_CACHE_TIMEOUT=0)
+    def test_cache_disabled(self):
+        """Test that a zero timeout disables the response cache"""
+        self.client.get(TAGS_URL)
+
+        with self.assertNumQueries(1):
+            self.client.get(TAGS_URL)
+
+    def test_invalidated_on_create(self):
+        """Test creating a tag invalidates the cached tag list"""
+        self.client.get(TAGS_URL)
+
+        self.client.post(TAGS_URL, {"name": "Dessert"})
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(len(res.data["results"]), 1)
+
+    def test_invalidated_on_update(self):
+        """Test updating a recipe invalidates the cached recipe list"""
+        recipe = sample_recipe(user=self.user)
+        self.client.get(RECIPES_URL)
+
+        recipe.title = "Changed"
+        recipe.save()
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.data["results"][0]["title"], "Changed")
+
+    def test_invalidated_on_delete(self):
+        """Test deleting an ingredient invalidates the cached list"""
+        ingredient = Ingredient.objects.create(user=self.user, name="Salt")
+        self.client.get(INGREDIENTS_URL)
+
+        ingredient.delete()
+        res = self.client.get(INGREDIENTS_URL)
+
+        self.assertEqual(res.data["results"], [])
+
+    def test_invalidated_on_m2m_change(self):
+        """Test adding a tag to a recipe invalidates both lists"""
+        recipe = sample_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        self.client.get(RECIPES_URL)
+        self.client.get(TAGS_URL, {"assigned_only": 1})
+
+        recipe.tags.add(tag)
+        recipes = self.client.get(RECIPES_URL)
+        tags = self.client.get(TAGS_URL, {"assigned_only": 1})
+
+        self.assertEqual(recipes.data["results"][0]["tags"], [tag.id])
+        self.assertEqual(len(tags.data["results"]), 1)
+
+    def test_other_users_cache_kept(self):
+        """Test a change only invalidates the owner's responses"""
+        user2 = get_user_model().objects.create_user(
+            "other@gmail.com", "password123"
+        )
+        self.client.get(TAGS_URL)
+
+        Tag.objects.create(user=user2, name="Vegan")
+
+        with self.assertNumQueries(0):
+            self.client.get(TAGS_URL)
@@ -0,0 +1,60 @@
+from io import StringIO
+
+from core.models import Recipe, Tag
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+
+class CommandTests(TestCase):
+    def test_benchmark_filters(self):
+        """Test the filter benchmark reports every query and cleans up"""
+        out = StringIO()
+        call_command(
+            "benchmark_filters",
+            recipes=20,
+            tags=5,
+            tags_per_recipe=2,
+            filter_tags=2,
+            repeat=1,
+            stdout=out,
+        )
+
+        self.assertIn("join (legacy)", out.getvalue())
+        self.assertIn("grouped (all)", out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_benchmark_serializers(self):
+        """Test the serializer benchmark reports both paths and cleans up"""
+        out = StringIO()
+        call_command(
+            "benchmark_serializers", recipes=10, tags=3, repeat=1, stdout=out
+        )
+
+        self.assertIn("recipes  drf", out.getvalue())
+        self.assertIn("tags     rows", out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_benchmark_renderers(self):
+        """Test the renderer benchmark reports both renderers"""
+        out = StringIO()
+        call_command("benchmark_renderers", recipes=10, repeat=1, stdout=out)
+
+        self.assertIn("list  drf", out.getvalue())
+        self.assertIn("raw   fast", out.getvalue())
+
+    def test_explain_queries(self):
+        """Test the plans of every list endpoint are printed"""
+        user = get_user_model().objects.create_user("plan@gmail.com")
+        Tag.objects.create(user=user, name="Vegan")
+        out = StringIO()
+
+        call_command("explain_queries", user.email, analyze=True, stdout=out)
+
+        self.assertIn("recipes tags all", out.getvalue())
+        self.assertIn("Execution Time", out.getvalue())
+
+    def test_explain_queries_unknown_user(self):
+        """Test explaining queries of a missing user fails"""
+        with self.assertRaises(CommandError):
+            call_command("explain_queries", "nobody@gmail.com")
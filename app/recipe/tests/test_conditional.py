@@ -0,0 +1,127 @@
+from core.models import Recipe, Tag
+from core.tests.utils import enforce_query_budgets, run_on_commit_callbacks
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from recipe.cache import get_response_cache
+from rest_framework import status
+from rest_framework.test import APIClient
+
+TAGS_URL = reverse("recipe:tag-list")
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+def detail_url(recipe_id: int) -> str:
+    """Return recipe detail URL
+
+    Args:
+        recipe_id (int): Id of the recipe to be retrieved
+
+    Returns:
+        str: URL to recipe details
+    """
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+def sample_recipe(user, **params):
+    """Create and return a sample recipe
+
+    Args:
+        user ([type]): [description]
+    """
+    defaults = {"title": "Sample Recipe", "time_minutes": 10, "price": 5.00}
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+@enforce_query_budgets
+class ConditionalGetTests(TestCase):
+    """Test ETag handling of the recipe API"""
+
+    def setUp(self):
+        get_response_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            "etag@gmail.com", "password123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_not_modified(self):
+        """Test a list request with a matching ETag returns 304"""
+        Tag.objects.create(user=self.user, name="Vegan")
+        res = self.client.get(TAGS_URL)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=res["ETag"])
+
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(cached["ETag"], res["ETag"])
+        self.assertEqual(cached.content, b"")
+
+    def test_list_etag_changes_on_write(self):
+        """Test the list ETag changes when the user's data changes"""
+        res = self.client.get(TAGS_URL)
+
+        Tag.objects.create(user=self.user, name="Vegan")
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=res["ETag"])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["results"]), 1)
+
+    def test_list_etag_depends_on_query(self):
+        """Test filtered lists have their own ETags"""
+        res = self.client.get(RECIPES_URL)
+        filtered = self.client.get(RECIPES_URL, {"tags": "1"})
+
+        self.assertNotEqual(res["ETag"], filtered["ETag"])
+
+    def test_weak_etag_matches(self):
+        """Test a weak form of the ETag is accepted"""
+        res = self.client.get(RECIPES_URL)
+
+        res = self.client.get(
+            RECIPES_URL, HTTP_IF_NONE_MATCH=f'"other", W/{res["ETag"]}'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_not_modified(self):
+        """Test retrieving an unchanged recipe returns 304"""
+        recipe = sample_recipe(user=self.user)
+        res = self.client.get(detail_url(recipe.id))
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(
+                detail_url(recipe.id), HTTP_IF_NONE_MATCH=res["ETag"]
+            )
+
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_etag_changes_with_tags(self):
+        """Test the detail ETag changes when a shown tag is renamed"""
+        recipe = sample_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        recipe.tags.add(tag)
+        res = self.client.get(detail_url(recipe.id))
+
+        tag.name = "Vegetarian"
+        tag.save()
+        run_on_commit_callbacks()
+        res = self.client.get(
+            detail_url(recipe.id), HTTP_IF_NONE_MATCH=res["ETag"]
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["tags"][0]["name"], "Vegetarian")
+
+    def test_detail_of_other_user_not_found(self):
+        """Test an ETag isn't computed for another user's recipe"""
+        user2 = get_user_model().objects.create_user(
+            "other@gmail.com", "password123"
+        )
+        recipe = sample_recipe(user=user2)
+
+        res = self.client.get(detail_url(recipe.id), HTTP_IF_NONE_MATCH="*")
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,198 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from core.models import ImageBlob, ImageUpload, Recipe
+from core.tests.utils import enforce_query_budgets
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from recipe.images import VARIANTS, render_variants, writable_variants
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+def sample_image(size=(1600, 1200)) -> bytes:
+    """Return the content of a JPEG image
+
+    Args:
+        size (tuple, optional): [description]. Defaults to (1600, 1200).
+    """
+    with tempfile.TemporaryFile() as tf:
+        Image.new("RGB", size, color="red").save(tf, format="JPEG")
+        tf.seek(0)
+        return tf.read()
+
+
+@enforce_query_budgets
+class ImageProcessingTests(TestCase):
+    """Test rendering the variants of recipe images"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.media_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.media_override.enable()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "images@gmail.com", "testpass"
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title="Curry", time_minutes=10, price=5
+        )
+
+    def tearDown(self):
+        self.media_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def _upload(self, content):
+        """Upload an image to the recipe through the API
+
+        Args:
+            content (bytes): Content of the image file
+        """
+        url = reverse("recipe:recipe-upload-image", args=[self.recipe.id])
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as ntf:
+            ntf.write(content)
+            ntf.seek(0)
+            return self.client.post(url, {"image": ntf}, format="multipart")
+
+    def test_render_variants(self):
+        """Test every variant is written within its bounds"""
+        source = os.path.join(self.media_root, "original.jpg")
+        with open(source, "wb") as f:
+            f.write(sample_image())
+
+        variants = render_variants(source, self.media_root)
+
+        self.assertEqual(set(variants), {variant.name for variant in VARIANTS})
+        for variant in VARIANTS:
+            path = os.path.join(self.media_root, variants[variant.name])
+            with Image.open(path) as image:
+                self.assertEqual(image.format, variant.format)
+                self.assertLessEqual(image.width, variant.size[0])
+                self.assertLessEqual(image.height, variant.size[1])
+
+    def test_render_variants_without_webp(self):
+        """Test variants Pillow can't write are skipped, not failed"""
+        source = os.path.join(self.media_root, "original.jpg")
+        with open(source, "wb") as f:
+            f.write(sample_image())
+        writable_variants.cache_clear()
+        self.addCleanup(writable_variants.cache_clear)
+
+        with patch(
+            "recipe.images.features.check", side_effect=lambda f: f != "webp"
+        ), self.assertLogs("recipe.images", "WARNING"):
+            variants = render_variants(source, self.media_root)
+
+        self.assertEqual(set(variants), {"medium", "thumbnail"})
+        for path in variants.values():
+            self.assertTrue(
+                os.path.exists(os.path.join(self.media_root, path))
+            )
+
+    def test_upload_queues_image(self):
+        """Test uploading an image only queues the variants"""
+        res = self._upload(sample_image())
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["image_state"], Recipe.IMAGE_PENDING)
+        self.assertEqual(res.data["image_variants"], {})
+
+    def test_process_images_command(self):
+        """Test the worker renders the variants and exposes their URLs"""
+        self._upload(sample_image())
+
+        call_command(
+            "process_images", "--once", "--workers", "1", stdout=StringIO()
+        )
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_state, Recipe.IMAGE_READY)
+        res = self.client.get(
+            reverse("recipe:recipe-detail", args=[self.recipe.id])
+        )
+        self.assertEqual(
+            set(res.data["image_variants"]),
+            {variant.name for variant in VARIANTS},
+        )
+        for url in res.data["image_variants"].values():
+            self.assertTrue(url.startswith("http://testserver/media/"))
+
+    def test_process_invalid_image(self):
+        """Test an image that can't be decoded is marked as failed"""
+        self.recipe.image.save("broken.jpg", ContentFile(b"not an image"))
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            image_state=Recipe.IMAGE_PENDING
+        )
+
+        with self.assertLogs("recipe.images", "ERROR"):
+            call_command(
+                "process_images", "--once", "--workers", "1", stdout=StringIO()
+            )
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_state, Recipe.IMAGE_FAILED)
+        self.assertEqual(self.recipe.image_variants, {})
+
+    def test_gc_images(self):
+        """Test unreferenced blobs and abandoned uploads are removed"""
+        self.recipe.image.save("kept.jpg", ContentFile(b"kept"))
+        other = Recipe.objects.create(
+            user=self.user, title="Soup", time_minutes=5, price=2
+        )
+        other.image.save("gone.jpg", ContentFile(b"gone"))
+        gone_path = other.image.path
+        other.delete()
+        ImageUpload.objects.create(
+            recipe=self.recipe, filename="a.jpg", size=10
+        )
+
+        call_command("gc_images", "--grace", "0", stdout=StringIO())
+
+        self.assertFalse(os.path.exists(gone_path))
+        self.assertTrue(os.path.exists(self.recipe.image.path))
+        self.assertEqual(
+            list(ImageBlob.objects.values_list("name", flat=True)),
+            [self.recipe.image.name],
+        )
+        self.assertFalse(ImageUpload.objects.exists())
+
+    def test_gc_images_grace_period(self):
+        """Test recently stored blobs are kept"""
+        self.recipe.image.save("gone.jpg", ContentFile(b"gone"))
+        path = self.recipe.image.path
+        self.recipe.delete()
+
+        call_command("gc_images", stdout=StringIO())
+
+        self.assertTrue(os.path.exists(path))
+        self.assertTrue(ImageBlob.objects.exists())
+
+    def test_gc_images_keeps_reused_blobs(self):
+        """Test blobs stored again within the grace period are kept"""
+        self.recipe.image.save("gone.jpg", ContentFile(b"gone"))
+        name, path = self.recipe.image.name, self.recipe.image.path
+        self.recipe.delete()
+        os.utime(path, (0, 0))
+        ImageBlob.objects.update(used_at=timezone.now() - timedelta(days=2))
+
+        # Saved again, its new reference isn't recorded yet
+        self.assertEqual(
+            Recipe._meta.get_field("image").storage.save(
+                "again.jpg", ContentFile(b"gone")
+            ),
+            name,
+        )
+        call_command("gc_images", stdout=StringIO())
+
+        self.assertTrue(os.path.exists(path))
+        self.assertTrue(ImageBlob.objects.filter(name=name).exists())
@@ -1,4 +1,5 @@
 from core.models import Ingredient, Recipe
+from core.tests.utils import enforce_query_budgets
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 from django.urls import reverse
@@ -9,6 +10,7 @@ from rest_framework.test import APIClient
 INGREDIENTS_URL = reverse("recipe:ingredient-list")
 
 
+@enforce_query_budgets
 class PublicIngredientsApiTests(TestCase):
     """Test the publicly available ingredients API
 
@@ -25,6 +27,7 @@ class PublicIngredientsApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+@enforce_query_budgets
 class PrivateIngredientsAPITests(TestCase):
     """Test ingredients can be retrieved by authorized user
 
@@ -49,7 +52,7 @@ class PrivateIngredientsAPITests(TestCase):
         ingredients = Ingredient.objects.all().order_by("-name")
         serializer = IngredientSerializer(ingredients, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
 
     def test_ingredients_limited_to_user(self):
         """Test that only ingredients for
@@ -64,8 +67,8 @@ class PrivateIngredientsAPITests(TestCase):
         res = self.client.get(INGREDIENTS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]["name"], ingredient.name)
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertEqual(res.data["results"][0]["name"], ingredient.name)
 
     def test_create_ingredients_successful(self):
         """Test create a new ingredient"""
@@ -98,8 +101,8 @@ class PrivateIngredientsAPITests(TestCase):
 
         serializer_1 = IngredientSerializer(ingredient_1)
         serializer_2 = IngredientSerializer(ingredient_2)
-        self.assertIn(serializer_1.data, res.data)
-        self.assertNotIn(serializer_2.data, res.data)
+        self.assertIn(serializer_1.data, res.data["results"])
+        self.assertNotIn(serializer_2.data, res.data["results"])
 
     def test_retrieve_ingredients_assigned_unique(self):
         """Test filtering ingredients by assigned returns unique items"""
@@ -119,4 +122,4 @@ class PrivateIngredientsAPITests(TestCase):
 
         res = self.client.get(INGREDIENTS_URL, {"assigned_only": 1})
 
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data["results"]), 1)
@@ -0,0 +1,170 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from core.models import Recipe
+from core.tests.utils import enforce_query_budgets
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from recipe.images import variant_names
+from rest_framework import status
+from rest_framework.test import APIClient
+
+CONTENT = b"0123456789"
+
+
+def media_url(name: str) -> str:
+    """Return the URL serving a media file
+
+    Args:
+        name (str): Storage name of the file
+    """
+    return reverse("media", args=[name])
+
+
+@enforce_query_budgets
+@override_settings(MEDIA_SENDFILE="")
+class MediaServingTests(TestCase):
+    """Test serving the media files of recipes"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.media_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.media_override.enable()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "media@gmail.com", "testpass"
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title="Curry", time_minutes=10, price=5
+        )
+        self.recipe.image.save("photo.jpg", ContentFile(CONTENT))
+        self.url = media_url(self.recipe.image.name)
+
+    def tearDown(self):
+        self.media_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_serve_image(self):
+        """Test the owner gets the file with long-lived cache headers"""
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(b"".join(res.streaming_content), CONTENT)
+        self.assertEqual(res["Content-Type"], "image/jpeg")
+        self.assertEqual(res["Accept-Ranges"], "bytes")
+        self.assertIn("immutable", res["Cache-Control"])
+        self.assertIn("ETag", res)
+        self.assertIn("Last-Modified", res)
+
+    def test_etag_from_content(self):
+        """Test the ETag follows the content, not the modification time"""
+        digest = hashlib.sha256(CONTENT).hexdigest()
+        res = self.client.get(self.url)
+        os.utime(self.recipe.image.path, (0, 0))
+
+        res_touched = self.client.get(self.url)
+
+        self.assertEqual(res["ETag"], f'"{digest}"')
+        self.assertEqual(res_touched["ETag"], res["ETag"])
+
+    def test_serve_variant(self):
+        """Test the variants of the user's images are served"""
+        name = variant_names(self.recipe.image.name)["thumbnail"]
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path))
+        with open(path, "wb") as f:
+            f.write(CONTENT)
+
+        res = self.client.get(media_url(name))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res["ETag"], f'"{os.path.splitext(os.path.basename(name))[0]}"'
+        )
+
+    def test_other_users_image_not_found(self):
+        """Test images of other users' recipes are not served"""
+        user2 = get_user_model().objects.create_user(
+            "other@gmail.com", "passxd"
+        )
+        self.client.force_authenticate(user2)
+
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_login_required(self):
+        """Test media files require authentication"""
+        res = APIClient().get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_path_outside_media_root(self):
+        """Test names escaping MEDIA_ROOT are rejected"""
+        res = self.client.get(media_url("../etc/passwd"))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_range_requests(self):
+        """Test single byte ranges are answered with partial content"""
+        res = self.client.get(self.url, HTTP_RANGE="bytes=2-5")
+        self.assertEqual(res.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b"".join(res.streaming_content), b"2345")
+        self.assertEqual(res["Content-Range"], "bytes 2-5/10")
+
+        res = self.client.get(self.url, HTTP_RANGE="bytes=-3")
+        self.assertEqual(b"".join(res.streaming_content), b"789")
+
+        res = self.client.get(self.url, HTTP_RANGE="bytes=20-")
+        self.assertEqual(
+            res.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+        self.assertEqual(res["Content-Range"], "bytes */10")
+
+    def test_if_range_mismatch(self):
+        """Test a stale If-Range gets the whole file"""
+        res = self.client.get(
+            self.url, HTTP_RANGE="bytes=2-5", HTTP_IF_RANGE='"stale"'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(b"".join(res.streaming_content), CONTENT)
+
+    def test_revalidation(self):
+        """Test matching validators are answered with 304"""
+        res = self.client.get(self.url)
+
+        res_etag = self.client.get(self.url, HTTP_IF_NONE_MATCH=res["ETag"])
+        res_date = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=res["Last-Modified"]
+        )
+
+        self.assertEqual(res_etag.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res_date.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    @override_settings(
+        MEDIA_SENDFILE="x-accel-redirect",
+        MEDIA_SENDFILE_PREFIX="/protected-media/",
+    )
+    def test_x_accel_redirect(self):
+        """Test the transfer is handed to nginx"""
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res["X-Accel-Redirect"],
+            f"/protected-media/{self.recipe.image.name}",
+        )
+        self.assertEqual(res.content, b"")
+
+    @override_settings(MEDIA_SENDFILE="x-sendfile")
+    def test_x_sendfile(self):
+        """Test the transfer is handed to Apache"""
+        res = self.client.get(self.url)
+
+        self.assertEqual(res["X-Sendfile"], self.recipe.image.path)
@@ -1,16 +1,25 @@
+import csv
+import json
 import os
 import tempfile
+from unittest.mock import patch
 
 from core.models import Ingredient, Recipe, Tag
+from core.tests.utils import enforce_query_budgets, run_on_commit_callbacks
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from PIL import Image
+from recipe.pagination import RecipeCursorPagination
 from recipe.serializers import RecipeDetailSerializer, RecipeSerializer
 from rest_framework import status
 from rest_framework.test import APIClient
 
 RECIPES_URL = reverse("recipe:recipe-list")
+BULK_URL = reverse("recipe:recipe-bulk")
+EXPORT_URL = reverse("recipe:recipe-export")
 
 
 def image_upload_url(recipe_id: int):
@@ -66,6 +75,7 @@ def sample_recipe(user, **params):
     return Recipe.objects.create(user=user, **defaults)
 
 
+@enforce_query_budgets
 class PublicRecipeApiTests(TestCase):
     """Test unauthenticated recipe API access
 
@@ -83,6 +93,7 @@ class PublicRecipeApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+@enforce_query_budgets
 class PrivateRecipeApiTests(TestCase):
     """Test authenticated recipe API access"""
 
@@ -103,7 +114,7 @@ class PrivateRecipeApiTests(TestCase):
         recipes = Recipe.objects.all().order_by("-id")
         serializer = RecipeSerializer(recipes, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
 
     def test_recipes_limited_to_user(self):
         """Test retrieving recipes for user"""
@@ -119,8 +130,67 @@ class PrivateRecipeApiTests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertEqual(res.data["results"], serializer.data)
+
+    def test_list_recipes_relation_ids(self):
+        """Test listing recipes returns their tag and ingredient ids"""
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(sample_tag(user=self.user, name="Vegan"))
+        recipe.tags.add(sample_tag(user=self.user, name="Dessert"))
+        recipe.ingredients.add(sample_ingredient(user=self.user))
+        sample_recipe(user=self.user, title="No relations")
+
+        res = self.client.get(RECIPES_URL)
+
+        recipes = Recipe.objects.filter(user=self.user)
+        serializer = RecipeSerializer(recipes, many=True)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertCountEqual(res.data["results"], serializer.data)
+
+    def test_list_recipes_query_count_is_flat(self):
+        """Test listing recipes runs a fixed number of queries"""
+        tag = sample_tag(user=self.user)
+        ingredient = sample_ingredient(user=self.user)
+        for i in range(20):
+            recipe = sample_recipe(user=self.user, title=f"Recipe {i}")
+            recipe.tags.add(tag)
+            recipe.ingredients.add(ingredient)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["results"]), 20)
+
+    def test_paginate_recipes(self):
+        """Test recipes are returned in pages linked by cursors"""
+        recipes = [
+            sample_recipe(user=self.user, title=f"Recipe {i}")
+            for i in range(5)
+        ]
+
+        res = self.client.get(RECIPES_URL, {"page_size": 2})
+        ids = [recipe["id"] for recipe in res.data["results"]]
+        while res.data["next"]:
+            res = self.client.get(res.data["next"])
+            ids += [recipe["id"] for recipe in res.data["results"]]
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(res.data["previous"])
+        self.assertEqual(ids, [recipe.id for recipe in reversed(recipes)])
+
+    def test_page_size_capped(self):
+        """Test that the requested page size can't exceed the maximum"""
+        for i in range(3):
+            sample_recipe(user=self.user, title=f"Recipe {i}")
+
+        with patch.object(RecipeCursorPagination, "max_page_size", 2):
+            res = self.client.get(RECIPES_URL, {"page_size": 50})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["results"]), 2)
+        self.assertIsNotNone(res.data["next"])
 
     def test_view_recipe_detail(self):
         """Test viewing a recipe detail"""
@@ -183,6 +253,66 @@ class PrivateRecipeApiTests(TestCase):
         self.assertIn(ingredient1, ingredients)
         self.assertIn(ingredient2, ingredients)
 
+    def test_create_recipe_with_many_relations(self):
+        """Test the ids of every relation are looked up within the budget"""
+        tags = [sample_tag(user=self.user, name=f"Tag {i}") for i in range(6)]
+        ingredients = [
+            sample_ingredient(user=self.user, name=f"Ingredient {i}")
+            for i in range(6)
+        ]
+        payload = {
+            "title": "Everything soup",
+            "tags": [tag.id for tag in tags],
+            "ingredients": [ingredient.id for ingredient in ingredients],
+            "time_minutes": 45,
+            "price": 9.00,
+        }
+        res = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data["id"])
+        self.assertEqual(recipe.tags.count(), 6)
+        self.assertEqual(recipe.ingredients.count(), 6)
+
+    def test_create_recipe_search_vector_built_once(self):
+        """Test the search vector is rebuilt once, when the create commits"""
+        payload = {
+            "title": "Pho",
+            "tags": [sample_tag(user=self.user).id],
+            "ingredients": [sample_ingredient(user=self.user).id],
+            "time_minutes": 90,
+            "price": 12.00,
+        }
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(RECIPES_URL, payload)
+            run_on_commit_callbacks()
+
+        rebuilds = [
+            query
+            for query in queries.captured_queries
+            if query["sql"].startswith("UPDATE")
+            and '"search_vector" =' in query["sql"]
+        ]
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(rebuilds), 1)
+        recipe = Recipe.objects.get(id=res.data["id"])
+        self.assertIsNotNone(recipe.search_vector)
+
+    def test_create_recipe_unknown_relation(self):
+        """Test creating a recipe with a missing tag fails"""
+        tag = sample_tag(user=self.user)
+        payload = {
+            "title": "Ghost pie",
+            "tags": [tag.id, tag.id + 1000, "abc"],
+            "time_minutes": 10,
+            "price": 3.00,
+        }
+        res = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("tags", res.data)
+        self.assertFalse(Recipe.objects.exists())
+
     def test_partial_update_recipe(self):
         """Test updating a recipe with PATCH"""
         recipe = sample_recipe(user=self.user)
@@ -219,6 +349,388 @@ class PrivateRecipeApiTests(TestCase):
         self.assertEqual(len(tags), 0)
 
 
+@enforce_query_budgets
+class RecipeFilterTests(TestCase):
+    """Test filtering recipes by tags and ingredients"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "filter@gmail.com", "testpass"
+        )
+        self.client.force_authenticate(self.user)
+        self.vegan = sample_tag(user=self.user, name="Vegan")
+        self.dessert = sample_tag(user=self.user, name="Dessert")
+        self.both = sample_recipe(user=self.user, title="Vegan cake")
+        self.both.tags.add(self.vegan, self.dessert)
+        self.vegan_only = sample_recipe(user=self.user, title="Tofu")
+        self.vegan_only.tags.add(self.vegan)
+
+    def _ids(self, res):
+        return [recipe["id"] for recipe in res.data["results"]]
+
+    def test_filter_any_not_duplicated(self):
+        """Test recipes matching several tags are returned once"""
+        res = self.client.get(
+            RECIPES_URL, {"tags": f"{self.vegan.id},{self.dessert.id}"}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._ids(res), [self.vegan_only.id, self.both.id])
+
+    def test_filter_match_all(self):
+        """Test match=all returns recipes having every listed tag"""
+        res = self.client.get(
+            RECIPES_URL,
+            {"tags": f"{self.vegan.id},{self.dessert.id}", "match": "all"},
+        )
+
+        self.assertEqual(self._ids(res), [self.both.id])
+
+    def test_filter_match_all_with_ingredients(self):
+        """Test tag and ingredient filters are combined"""
+        ingredient = sample_ingredient(user=self.user)
+        self.vegan_only.ingredients.add(ingredient)
+
+        res = self.client.get(
+            RECIPES_URL,
+            {
+                "tags": str(self.vegan.id),
+                "ingredients": str(ingredient.id),
+                "match": "all",
+            },
+        )
+
+        self.assertEqual(self._ids(res), [self.vegan_only.id])
+
+    def test_filter_invalid_ids(self):
+        """Test invalid ids are rejected"""
+        res = self.client.get(RECIPES_URL, {"tags": "1,vegan"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("tags", res.data)
+
+    def test_filter_invalid_match(self):
+        """Test an unknown match mode is rejected"""
+        res = self.client.get(RECIPES_URL, {"tags": "1", "match": "some"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@enforce_query_budgets
+class RecipeSearchTests(TestCase):
+    """Test full-text search of recipes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "search@gmail.com", "testpass"
+        )
+        self.client.force_authenticate(self.user)
+
+    def _search(self, terms, **params):
+        # Search vectors are rebuilt when the writes commit
+        run_on_commit_callbacks()
+        res = self.client.get(RECIPES_URL, {"search": terms, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res
+
+    def _ids(self, res):
+        return [recipe["id"] for recipe in res.data["results"]]
+
+    def test_search_title(self):
+        """Test searching recipes by a stemmed title word"""
+        curry = sample_recipe(user=self.user, title="Thai curries")
+        sample_recipe(user=self.user, title="Fish and chips")
+
+        res = self._search("curry")
+
+        self.assertEqual(self._ids(res), [curry.id])
+
+    def test_search_related_names(self):
+        """Test searching recipes by tag and ingredient names"""
+        recipe = sample_recipe(user=self.user, title="Weekday dinner")
+        recipe.ingredients.add(sample_ingredient(self.user, name="Lentils"))
+        tagged = sample_recipe(user=self.user, title="Pudding")
+        tagged.tags.add(sample_tag(self.user, name="Dessert"))
+
+        self.assertEqual(self._ids(self._search("lentil")), [recipe.id])
+        self.assertEqual(self._ids(self._search("dessert")), [tagged.id])
+
+    def test_search_vector_follows_renames(self):
+        """Test the stored vector is updated when a tag is renamed"""
+        recipe = sample_recipe(user=self.user, title="Weekday dinner")
+        tag = sample_tag(self.user, name="Vegan")
+        recipe.tags.add(tag)
+
+        tag.name = "Spicy"
+        tag.save()
+
+        self.assertEqual(self._ids(self._search("vegan")), [])
+        self.assertEqual(self._ids(self._search("spicy")), [recipe.id])
+
+    def test_search_ranked(self):
+        """Test title matches are ranked above tag matches"""
+        tagged = sample_recipe(user=self.user, title="Weekday dinner")
+        tagged.tags.add(sample_tag(self.user, name="Soup"))
+        titled = sample_recipe(user=self.user, title="Tomato soup")
+
+        res = self._search("soup")
+
+        self.assertEqual(self._ids(res), [titled.id, tagged.id])
+
+    def test_search_paginated(self):
+        """Test paginating search results by rank"""
+        recipes = [
+            sample_recipe(user=self.user, title=f"Soup {i}") for i in range(5)
+        ]
+
+        res = self._search("soup", page_size=2)
+        ids = self._ids(res)
+        while res.data["next"]:
+            res = self.client.get(res.data["next"])
+            ids += self._ids(res)
+
+        self.assertCountEqual(ids, [recipe.id for recipe in recipes])
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_bulk_created_recipes_searchable(self):
+        """Test recipes written in bulk get a search vector"""
+        tag = sample_tag(self.user, name="Breakfast")
+        payload = [
+            {
+                "title": "Pancakes",
+                "time_minutes": 10,
+                "price": "5.00",
+                "tags": [tag.id],
+            }
+        ]
+        self.client.post(BULK_URL, payload, format="json")
+
+        res = self._search("breakfast")
+
+        self.assertEqual(len(res.data["results"]), 1)
+
+
+@enforce_query_budgets
+class BulkRecipeApiTests(TestCase):
+    """Test writing recipes in bulk"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "bulk@gmail.com", "testpass"
+        )
+        self.client.force_authenticate(self.user)
+
+    def _payload(self, count, **params):
+        """Return a bulk payload of `count` recipes
+
+        Args:
+            count (int): Number of recipes
+        """
+        item = {"title": "Bulk recipe", "time_minutes": 10, "price": "5.00"}
+        item.update(params)
+        return [dict(item, title=f"Bulk recipe {i}") for i in range(count)]
+
+    def test_bulk_create_recipes(self):
+        """Test creating recipes with their relations in bulk"""
+        tag = sample_tag(user=self.user)
+        ingredient = sample_ingredient(user=self.user)
+        payload = self._payload(
+            3, tags=[tag.id], ingredients=[ingredient.id, ingredient.id]
+        )
+
+        res = self.client.post(BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 3)
+        recipes = Recipe.objects.filter(user=self.user).order_by("id")
+        self.assertEqual(
+            [recipe.title for recipe in recipes],
+            [item["title"] for item in payload],
+        )
+        for recipe, item in zip(recipes, res.data):
+            self.assertEqual(item["id"], recipe.id)
+            self.assertEqual(list(recipe.tags.all()), [tag])
+            self.assertEqual(list(recipe.ingredients.all()), [ingredient])
+
+    def test_bulk_create_query_count_is_flat(self):
+        """Test the number of queries doesn't depend on the batch size"""
+        tag = sample_tag(user=self.user)
+        counts = []
+        for size in (2, 20):
+            payload = self._payload(size, tags=[tag.id])
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.post(BULK_URL, payload, format="json")
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+
+    def test_bulk_update_query_count_is_flat(self):
+        """Test updating more recipes doesn't take more queries"""
+        tag = sample_tag(user=self.user)
+        counts = []
+        for size in (2, 20):
+            payload = self._payload(size, tags=[tag.id])
+            for item in payload:
+                item["id"] = sample_recipe(user=self.user).id
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.post(BULK_URL, payload, format="json")
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(
+            Recipe.objects.filter(
+                user=self.user, title__startswith="Bulk recipe"
+            ).count(),
+            22,
+        )
+
+    def test_bulk_update_recipes(self):
+        """Test items with an id replace the user's recipe"""
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(sample_tag(user=self.user))
+        new_tag = sample_tag(user=self.user, name="Curry")
+        payload = self._payload(1, tags=[new_tag.id])
+        payload[0]["id"] = recipe.id
+        payload += self._payload(1)
+
+        res = self.client.post(BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, payload[0]["title"])
+        self.assertEqual(list(recipe.tags.all()), [new_tag])
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 2)
+
+    def test_bulk_errors_reported_per_item(self):
+        """Test invalid items are reported and nothing is written"""
+        user2 = get_user_model().objects.create_user(
+            "other@gmail.com", "passxd"
+        )
+        other_recipe = sample_recipe(user=user2)
+        payload = self._payload(3)
+        payload[1]["tags"] = [0]
+        payload[2]["id"] = other_recipe.id
+
+        res = self.client.post(BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn("tags", res.data[1])
+        self.assertIn("id", res.data[2])
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+
+    @override_settings(RECIPE_BULK_MAX_ITEMS=2)
+    def test_bulk_size_limited(self):
+        """Test a batch can't exceed the maximum number of items"""
+        res = self.client.post(BULK_URL, self._payload(3), format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+
+
+@enforce_query_budgets
+class RecipeExportTests(TestCase):
+    """Test streaming exports of the user's recipes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "export@gmail.com", "testpass"
+        )
+        self.client.force_authenticate(self.user)
+
+    def _export(self, export_format):
+        """Request an export and return the response and its body
+
+        Args:
+            export_format (str): Value of the export_format parameter
+        """
+        res = self.client.get(EXPORT_URL, {"export_format": export_format})
+        body = b"".join(res.streaming_content).decode()
+        return res, body
+
+    def test_export_ndjson(self):
+        """Test the NDJSON export matches the recipe detail"""
+        recipe = sample_recipe(user=self.user, title="Curry")
+        recipe.tags.add(sample_tag(user=self.user))
+        recipe.ingredients.add(sample_ingredient(user=self.user))
+        sample_recipe(user=self.user, title="Soup")
+        user2 = get_user_model().objects.create_user(
+            "other@gmail.com", "passxd"
+        )
+        sample_recipe(user=user2)
+
+        res, body = self._export("ndjson")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "application/x-ndjson")
+        recipes = Recipe.objects.filter(user=self.user).order_by("-id")
+        serializer = RecipeDetailSerializer(recipes, many=True)
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(rows, json.loads(json.dumps(serializer.data)))
+
+    def test_export_csv(self):
+        """Test the CSV export has a header and a row per recipe"""
+        recipe = sample_recipe(user=self.user, title="Curry, hot")
+        recipe.tags.add(sample_tag(user=self.user, name="Vegan"))
+        recipe.tags.add(sample_tag(user=self.user, name="Dinner"))
+
+        res, body = self._export("csv")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "text/csv")
+        rows = list(csv.DictReader(body.splitlines()))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["id"], str(recipe.id))
+        self.assertEqual(rows[0]["title"], "Curry, hot")
+        self.assertEqual(rows[0]["tags"], "Vegan; Dinner")
+        self.assertEqual(rows[0]["ingredients"], "")
+
+    def test_export_image_urls_absolute(self):
+        """Test the exported image URLs are absolute, like in the detail"""
+        recipe = sample_recipe(user=self.user)
+        Recipe.objects.filter(pk=recipe.pk).update(
+            image="uploads/recipe/curry.jpg",
+            image_state=Recipe.IMAGE_READY,
+            image_variants={"thumbnail": "variants/curry.webp"},
+        )
+
+        res, body = self._export("ndjson")
+
+        row = json.loads(body)
+        self.assertTrue(row["image"].startswith("http://testserver/"))
+        self.assertTrue(row["image"].endswith("uploads/recipe/curry.jpg"))
+        self.assertTrue(
+            row["image_variants"]["thumbnail"].startswith("http://testserver/")
+        )
+
+    @override_settings(RECIPE_EXPORT_CHUNK_SIZE=2)
+    def test_export_queries_per_chunk(self):
+        """Test the relations are fetched once per chunk of recipes"""
+        tag = sample_tag(user=self.user)
+        for i in range(5):
+            sample_recipe(user=self.user, title=f"Recipe {i}").tags.add(tag)
+
+        with CaptureQueriesContext(connection) as queries:
+            res, body = self._export("ndjson")
+
+        self.assertEqual(len(body.splitlines()), 5)
+        # The cursor and then both relations for each of the 3 chunks
+        self.assertEqual(len(queries), 1 + 3 * 2)
+
+    def test_export_unknown_format(self):
+        """Test an unknown export format is rejected"""
+        res = self.client.get(EXPORT_URL, {"export_format": "xml"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@enforce_query_budgets
 class RecipeImageUploadTests(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -267,9 +779,9 @@ class RecipeImageUploadTests(TestCase):
         serializer_1 = RecipeSerializer(recipe_1)
         serializer_2 = RecipeSerializer(recipe_2)
         serializer_3 = RecipeSerializer(recipe_3)
-        self.assertIn(serializer_1.data, res.data)
-        self.assertIn(serializer_2.data, res.data)
-        self.assertNotIn(serializer_3.data, res.data)
+        self.assertIn(serializer_1.data, res.data["results"])
+        self.assertIn(serializer_2.data, res.data["results"])
+        self.assertNotIn(serializer_3.data, res.data["results"])
 
     def test_filter_by_ingredients(self):
         """Test returning recipes with specific ingredients"""
@@ -289,6 +801,6 @@ class RecipeImageUploadTests(TestCase):
         serializer_1 = RecipeSerializer(recipe_1)
         serializer_2 = RecipeSerializer(recipe_2)
         serializer_3 = RecipeSerializer(recipe_3)
-        self.assertIn(serializer_1.data, res.data)
-        self.assertIn(serializer_2.data, res.data)
-        self.assertNotIn(serializer_3.data, res.data)
+        self.assertIn(serializer_1.data, res.data["results"])
+        self.assertIn(serializer_2.data, res.data["results"])
+        self.assertNotIn(serializer_3.data, res.data["results"])
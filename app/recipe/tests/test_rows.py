@@ -0,0 +1,196 @@
+import shutil
+import tempfile
+from decimal import Decimal
+
+from core.models import Ingredient, Recipe, Tag
+from core.tests.utils import enforce_query_budgets
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.db.models import Prefetch
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from recipe import rows, serializers
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+
+@enforce_query_budgets
+class RowSerializerTests(TestCase):
+    """Test the row serializers render the same bytes as the DRF ones"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.media_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.media_override.enable()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "rows@gmail.com", "testpass"
+        )
+        self.client.force_authenticate(self.user)
+
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ("Vegan", "Dinner", "Żurek ✓")
+        ]
+        ingredients = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ("Salt", 'Quote "me"')
+        ]
+        for i, price in enumerate(("0.50", "5.00", "999.99", "12.30")):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f"Recipe {i} — ünïcode",
+                time_minutes=i,
+                price=Decimal(price),
+                link="" if i % 2 else f"https://example.com/{i}",
+            )
+            recipe.tags.set(tags[: i % 4])
+            recipe.ingredients.set(ingredients[: i % 3])
+        self.recipe = recipe
+
+    def tearDown(self):
+        self.media_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def assertSameBytes(self, row_data, drf_data):
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(row_data), renderer.render(drf_data))
+
+    def test_tag_and_ingredient_rows(self):
+        """Test the attribute rows match their model serializers"""
+        for row_serializer, model, serializer in (
+            (rows.TagRowSerializer, Tag, serializers.TagSerializer),
+            (
+                rows.IngredientRowSerializer,
+                Ingredient,
+                serializers.IngredientSerializer,
+            ),
+        ):
+            queryset = model.objects.order_by("id")
+            row_data = row_serializer().many(row_serializer().rows(queryset))
+
+            self.assertSameBytes(
+                row_data, serializer(queryset, many=True).data
+            )
+
+    def test_recipe_list_rows(self):
+        """Test the recipe list rows match RecipeListSerializer"""
+        queryset = Recipe.objects.with_relation_ids().order_by("-id")
+        row_serializer = rows.RecipeListRowSerializer()
+
+        row_data = row_serializer.many(row_serializer.rows(queryset))
+
+        self.assertSameBytes(
+            row_data,
+            serializers.RecipeListSerializer(queryset, many=True).data,
+        )
+
+    def test_recipe_detail_rows(self):
+        """Test the detail rows match RecipeDetailSerializer"""
+        self.recipe.image.save("photo.jpg", ContentFile(b"image"))
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            image_state=Recipe.IMAGE_READY,
+            image_variants={"thumbnail": "uploads/recipe/variants/t.jpg"},
+        )
+
+        res = self.client.get(
+            reverse("recipe:recipe-detail", args=[self.recipe.id])
+        )
+
+        context = {"request": res.wsgi_request}
+        # The model serializer doesn't order the related objects by itself
+        recipe = Recipe.objects.prefetch_related(
+            Prefetch("tags", queryset=Tag.objects.order_by("id")),
+            Prefetch(
+                "ingredients", queryset=Ingredient.objects.order_by("id")
+            ),
+        ).get(pk=self.recipe.pk)
+        self.assertSameBytes(
+            res.data,
+            serializers.RecipeDetailSerializer(recipe, context=context).data,
+        )
+        self.assertIn("http://testserver/media/", res.data["image"])
+
+    def test_list_endpoints(self):
+        """Test the list endpoints render the DRF serializers' bytes"""
+        res = self.client.get(reverse("recipe:recipe-list"))
+        queryset = Recipe.objects.with_relation_ids().order_by("-id")
+        self.assertSameBytes(
+            res.data["results"],
+            serializers.RecipeListSerializer(queryset, many=True).data,
+        )
+
+        res = self.client.get(reverse("recipe:tag-list"))
+        queryset = Tag.objects.order_by("-name", "id")
+        self.assertSameBytes(
+            res.data["results"],
+            serializers.TagSerializer(queryset, many=True).data,
+        )
+
+
+@enforce_query_budgets
+class SparseFieldsTests(TestCase):
+    """Test picking the fields of the read endpoints with `?fields=`"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "fields@gmail.com", "testpass"
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title="Curry", time_minutes=10, price=5
+        )
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name="Hot"))
+        self.recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name="Rice")
+        )
+
+    def test_list_fields(self):
+        """Test the list only selects and renders the requested fields"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(
+                reverse("recipe:recipe-list"), {"fields": "title,id"}
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data["results"], [{"id": self.recipe.id, "title": "Curry"}]
+        )
+        sql = queries.captured_queries[-1]["sql"]
+        self.assertNotIn("ARRAY(", sql)
+        self.assertNotIn("price", sql)
+
+    def test_detail_fields(self):
+        """Test the detail only queries the requested relations"""
+        url = reverse("recipe:recipe-detail", args=[self.recipe.id])
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, {"fields": "tags,title"})
+
+        self.assertEqual(list(res.data), ["title", "tags"])
+        self.assertEqual(res.data["tags"][0]["name"], "Hot")
+        sql = " ".join(query["sql"] for query in queries.captured_queries)
+        self.assertNotIn("core_recipe_ingredients", sql)
+
+        res = self.client.get(url, {"fields": "image,image_variants"})
+
+        self.assertEqual(res.data, {"image": None, "image_variants": {}})
+
+    def test_attr_list_fields(self):
+        """Test tags and ingredients can be narrowed too"""
+        res = self.client.get(reverse("recipe:tag-list"), {"fields": "name"})
+
+        self.assertEqual(res.data["results"], [{"name": "Hot"}])
+
+    def test_unknown_fields(self):
+        """Test unknown field names are rejected"""
+        res = self.client.get(
+            reverse("recipe:recipe-list"), {"fields": "id,secret"}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("secret", res.data["fields"][0])
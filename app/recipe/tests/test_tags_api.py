@@ -1,4 +1,5 @@
 from core.models import Tag, Recipe
+from core.tests.utils import enforce_query_budgets
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 from django.urls import reverse
@@ -9,6 +10,7 @@ from rest_framework.test import APIClient
 TAGS_URL = reverse("recipe:tag-list")
 
 
+@enforce_query_budgets
 class PublicTagApiTests(TestCase):
     """Test the publicly available tags API """
 
@@ -22,6 +24,7 @@ class PublicTagApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+@enforce_query_budgets
 class PrivateTagsApiTests(TestCase):
     """Test the atuhorized user tags API
 
@@ -46,7 +49,21 @@ class PrivateTagsApiTests(TestCase):
         tags = Tag.objects.all().order_by("-name")
         serializer = TagSerializer(tags, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
+
+    def test_paginate_tags(self):
+        """Test tags are paginated by name with ties broken by id"""
+        first = Tag.objects.create(user=self.user, name="Vegan")
+        second = Tag.objects.create(user=self.user, name="Vegan")
+        third = Tag.objects.create(user=self.user, name="Dessert")
+
+        res = self.client.get(TAGS_URL, {"page_size": 2})
+        ids = [tag["id"] for tag in res.data["results"]]
+        res = self.client.get(res.data["next"])
+        ids += [tag["id"] for tag in res.data["results"]]
+
+        self.assertEqual(ids, [first.id, second.id, third.id])
+        self.assertIsNone(res.data["next"])
 
     def test_tags_limited_to_user(self):
         """Test that tags returned are for the authenticated user"""
@@ -57,8 +74,8 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.get(TAGS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]["name"], tag.name)
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertEqual(res.data["results"][0]["name"], tag.name)
 
     def test_create_tags_successful(self):
         """Test creating a new tag"""
@@ -93,8 +110,8 @@ class PrivateTagsApiTests(TestCase):
 
         serializer_1 = TagSerializer(tag_1)
         serializer_2 = TagSerializer(tag_2)
-        self.assertIn(serializer_1.data, res.data)
-        self.assertNotIn(serializer_2.data, res.data)
+        self.assertIn(serializer_1.data, res.data["results"])
+        self.assertNotIn(serializer_2.data, res.data["results"])
 
     def test_retrieve_tags_assigned_unique(self):
         """Test filtering tags by assigned returns unique items"""
@@ -117,4 +134,4 @@ class PrivateTagsApiTests(TestCase):
 
         res = self.client.get(TAGS_URL, {"assigned_only": 1})
 
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data["results"]), 1)
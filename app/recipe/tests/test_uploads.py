@@ -0,0 +1,235 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from core.models import ImageUpload, Recipe
+from core.storage import ContentAddressedStorage, blob_name
+from core.tests.utils import enforce_query_budgets
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from recipe import uploads
+from recipe.uploads import temp_path
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+def sample_image(size=(64, 48)) -> bytes:
+    """Return the content of a PNG image
+
+    Args:
+        size (tuple, optional): [description]. Defaults to (64, 48).
+    """
+    with tempfile.TemporaryFile() as tf:
+        Image.new("RGB", size, color="blue").save(tf, format="PNG")
+        tf.seek(0)
+        return tf.read()
+
+
+@enforce_query_budgets
+class ChunkedUploadTests(TestCase):
+    """Test the chunked and resumable image uploads"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.media_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.media_override.enable()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "uploads@gmail.com", "testpass"
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title="Curry", time_minutes=10, price=5
+        )
+
+    def tearDown(self):
+        self.media_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def _start(self, content, filename="photo.png"):
+        """Start an upload of `content` and return its id
+
+        Args:
+            content (bytes): Content of the whole file
+            filename (str, optional): [description]. Defaults to "photo.png".
+        """
+        url = reverse("recipe:recipe-uploads", args=[self.recipe.id])
+        res = self.client.post(
+            url, {"filename": filename, "size": len(content)}
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data["received"], 0)
+        return res.data["id"]
+
+    def _put(self, upload_id, content, first, last):
+        """Send the bytes `first` to `last` of the content
+
+        Args:
+            upload_id (str): [description]
+            content (bytes): Content of the whole file
+            first (int): First byte of the chunk
+            last (int): Last byte of the chunk
+        """
+        url = reverse("recipe:recipe-upload", args=[self.recipe.id, upload_id])
+        chunk = content[first:][: last - first + 1]
+        return self.client.put(
+            url,
+            chunk,
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes {first}-{last}/{len(content)}",
+        )
+
+    def _finalize(self, upload_id):
+        url = reverse(
+            "recipe:recipe-upload-finalize", args=[self.recipe.id, upload_id]
+        )
+        return self.client.post(url)
+
+    def test_chunked_upload(self):
+        """Test uploading an image in chunks and finalizing it"""
+        content = sample_image()
+        upload_id = self._start(content)
+        half = len(content) // 2
+
+        res = self._put(upload_id, content, 0, half - 1)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["received"], half)
+        res = self._put(upload_id, content, half, len(content) - 1)
+        self.assertEqual(res.data["received"], len(content))
+        res = self._finalize(upload_id)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["image_state"], Recipe.IMAGE_PENDING)
+        self.recipe.refresh_from_db()
+        with open(self.recipe.image.path, "rb") as f:
+            self.assertEqual(f.read(), content)
+        self.assertFalse(ImageUpload.objects.exists())
+
+    def test_digest_computed_while_writing(self):
+        """Test the chunks are hashed as they arrive, not read again"""
+        content = sample_image()
+        digest = hashlib.sha256(content).hexdigest()
+        upload_id = self._start(content)
+        half = len(content) // 2
+        self._put(upload_id, content, 0, half - 1)
+        self._put(upload_id, content, half, len(content) - 1)
+
+        with patch.object(
+            ContentAddressedStorage,
+            "save_local",
+            autospec=True,
+            side_effect=ContentAddressedStorage.save_local,
+        ) as save_local:
+            self._finalize(upload_id)
+
+        self.assertEqual(save_local.call_args[0][3], digest)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image.name, blob_name(digest, ".png"))
+
+    def test_digest_of_chunk_from_other_process(self):
+        """Test an upload whose running digest was lost is hashed once done"""
+        content = sample_image()
+        upload_id = self._start(content)
+        half = len(content) // 2
+        self._put(upload_id, content, 0, half - 1)
+        # As if the first chunk was written by another worker
+        uploads._digests.clear()
+        self._put(upload_id, content, half, len(content) - 1)
+
+        res = self._finalize(upload_id)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertEqual(
+            self.recipe.image.name,
+            blob_name(hashlib.sha256(content).hexdigest(), ".png"),
+        )
+
+    def test_resume_upload(self):
+        """Test a chunk must start where the upload stopped"""
+        content = sample_image()
+        upload_id = self._start(content)
+        self._put(upload_id, content, 0, 9)
+
+        res = self._put(upload_id, content, 20, 29)
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        res = self.client.get(
+            reverse("recipe:recipe-upload", args=[self.recipe.id, upload_id])
+        )
+        self.assertEqual(res.data["received"], 10)
+        res = self._put(upload_id, content, 10, len(content) - 1)
+
+        self.assertEqual(res.data["received"], len(content))
+
+    def test_invalid_content_range(self):
+        """Test a range outside of the announced size is rejected"""
+        content = sample_image()
+        upload_id = self._start(content)
+
+        res = self._put(upload_id, content + b"extra", 0, len(content))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_finalize_incomplete_upload(self):
+        """Test an upload can't be finalized before all bytes arrived"""
+        content = sample_image()
+        upload_id = self._start(content)
+        self._put(upload_id, content, 0, 9)
+
+        res = self._finalize(upload_id)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(ImageUpload.objects.filter(pk=upload_id).exists())
+
+    def test_finalize_invalid_image(self):
+        """Test a file that isn't an image is rejected when finalizing"""
+        content = b"not an image"
+        upload_id = self._start(content)
+        self._put(upload_id, content, 0, len(content) - 1)
+
+        res = self._finalize(upload_id)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    @override_settings(IMAGE_UPLOAD_MAX_DIMENSION=32)
+    def test_finalize_image_too_large(self):
+        """Test the dimensions are checked from the header"""
+        content = sample_image()
+        upload_id = self._start(content)
+        self._put(upload_id, content, 0, len(content) - 1)
+
+        res = self._finalize(upload_id)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        upload = ImageUpload.objects.get(pk=upload_id)
+        self.assertTrue(os.path.exists(temp_path(upload)))
+
+    def test_start_upload_invalid(self):
+        """Test the file name and size are validated"""
+        url = reverse("recipe:recipe-uploads", args=[self.recipe.id])
+
+        res = self.client.post(url, {"filename": "../photo", "size": 10})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        with self.settings(IMAGE_UPLOAD_MAX_SIZE=5):
+            res = self.client.post(url, {"filename": "a.png", "size": 10})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_upload_other_users_recipe(self):
+        """Test uploads are limited to the user's recipes"""
+        user2 = get_user_model().objects.create_user(
+            "other@gmail.com", "passxd"
+        )
+        recipe = Recipe.objects.create(
+            user=user2, title="Soup", time_minutes=5, price=2
+        )
+        url = reverse("recipe:recipe-uploads", args=[recipe.id])
+
+        res = self.client.post(url, {"filename": "a.png", "size": 10})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
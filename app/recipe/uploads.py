@@ -0,0 +1,234 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from core.models import Recipe
+from django.conf import settings
+from django.core.files.storage import default_storage
+from PIL import Image
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+# Temporary files live under MEDIA_ROOT so finalizing is a single rename
+UPLOADS_TMP_DIR = "uploads/tmp"
+# Bytes read from the request at a time while appending a chunk
+READ_SIZE = 64 * 1024
+IMAGE_FORMATS = ("GIF", "JPEG", "PNG", "WEBP")
+CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+# Uploads of this process whose running SHA-256 is kept, the oldest are
+# dropped first and hashed from their file when finalized
+MAX_DIGESTS = 128
+
+# Upload id to the bytes hashed so far and the running SHA-256. Hash
+# objects can't leave their process, an upload continued by another worker
+# loses its entry and is hashed from its file when finalized.
+_digests = OrderedDict()
+_digests_lock = threading.Lock()
+
+
+class UploadOffsetConflict(APIException):
+    """Raised for a chunk that doesn't start where the upload stopped"""
+
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "The chunk doesn't start at the received offset."
+    default_code = "conflict"
+
+
+def temp_path(upload) -> str:
+    """Return the path of the upload's temporary file
+
+    Args:
+        upload (ImageUpload): [description]
+    """
+    return default_storage.path(os.path.join(UPLOADS_TMP_DIR, f"{upload.pk}"))
+
+
+def received_bytes(upload) -> int:
+    """Return the number of bytes received so far
+
+    Args:
+        upload (ImageUpload): [description]
+    """
+    try:
+        return os.path.getsize(temp_path(upload))
+    except FileNotFoundError:
+        return 0
+
+
+def take_digest(upload, offset: int):
+    """Remove and return the running SHA-256 of the upload's first bytes
+
+    Args:
+        upload (ImageUpload): [description]
+        offset (int): Number of bytes in the temporary file
+
+    Returns:
+        [type]: SHA-256 of the `offset` first bytes, None when unknown
+    """
+    with _digests_lock:
+        hashed, digest = _digests.pop(upload.pk, (None, None))
+    if offset == 0:
+        return hashlib.sha256()
+    return digest if hashed == offset else None
+
+
+def keep_digest(upload, offset: int, digest):
+    """Keep the running SHA-256 of the upload for its next chunk
+
+    Args:
+        upload (ImageUpload): [description]
+        offset (int): Number of bytes hashed
+        digest ([type]): SHA-256 of the `offset` first bytes, or None
+    """
+    if digest is None:
+        return
+    with _digests_lock:
+        _digests[upload.pk] = (offset, digest)
+        while len(_digests) > MAX_DIGESTS:
+            _digests.popitem(last=False)
+
+
+def parse_content_range(header: str, size: int):
+    """Return the first and last byte of a `Content-Range` header
+
+    Args:
+        header (str): Value like `bytes 0-1023/4096`
+        size (int): Total size announced when starting the upload
+
+    Raises:
+        ValidationError: Malformed range or one outside of the upload
+    """
+    match = CONTENT_RANGE_RE.match(header or "")
+    if not match:
+        raise ValidationError(
+            {"Content-Range": ["Expected bytes <first>-<last>/<size>."]}
+        )
+    first, last, total = map(int, match.groups())
+    if total != size or first > last or last >= size:
+        raise ValidationError(
+            {"Content-Range": ["The range doesn't fit in the upload."]}
+        )
+    return first, last
+
+
+def append_chunk(upload, stream, content_range: str) -> int:
+    """Append a byte range read from the request to the temporary file
+
+    The body is copied in small blocks, nothing is buffered in memory, and
+    hashed on the way for `finalize`. When the client disconnects, the
+    bytes written so far are kept and the upload resumes from there.
+    Callers must lock the upload row.
+
+    Args:
+        upload (ImageUpload): [description]
+        stream ([type]): File-like body of the request
+        content_range (str): `Content-Range` header of the request
+
+    Raises:
+        UploadOffsetConflict: The chunk doesn't continue the upload
+        ValidationError: The chunk is malformed or incomplete
+
+    Returns:
+        int: Number of bytes received so far
+    """
+    first, last = parse_content_range(content_range, upload.size)
+    path = temp_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "ab") as f:
+        offset = f.tell()
+        if first != offset:
+            raise UploadOffsetConflict(
+                f"Expected a chunk starting at byte {offset}."
+            )
+        digest = take_digest(upload, offset)
+        remaining = last - first + 1
+        while remaining and stream is not None:
+            try:
+                block = stream.read(min(READ_SIZE, remaining))
+            except OSError:
+                block = b""
+            if not block:
+                break
+            f.write(block)
+            if digest is not None:
+                digest.update(block)
+            remaining -= len(block)
+        offset = f.tell()
+    keep_digest(upload, offset, digest)
+    if remaining:
+        raise ValidationError(
+            {"Content-Range": [f"Incomplete chunk, received {offset} bytes."]}
+        )
+    return offset
+
+
+def check_image_header(path: str):
+    """Check the format and dimensions from the image header only
+
+    Pillow reads the size and format when opening a file, the pixel data
+    is only decoded on demand.
+
+    Args:
+        path (str): Path of the uploaded file
+
+    Raises:
+        ValidationError: Not a supported image or too large
+    """
+    try:
+        with Image.open(path) as image:
+            image_format, (width, height) = image.format, image.size
+    except (OSError, Image.DecompressionBombError):
+        image_format = None
+    if image_format not in IMAGE_FORMATS:
+        raise ValidationError(
+            {"image": ["Upload a valid image. The file is not an image."]}
+        )
+    max_dimension = settings.IMAGE_UPLOAD_MAX_DIMENSION
+    if max(width, height) > max_dimension:
+        raise ValidationError(
+            {
+                "image": [
+                    f"Ensure the image is at most {max_dimension} pixels "
+                    "wide and high."
+                ]
+            }
+        )
+
+
+def finalize(upload):
+    """Move a complete upload to the image of its recipe
+
+    The temporary file is renamed to its blob, so the recipe never points
+    to a partial image. It is only read again to hash it when its chunks
+    weren't all hashed by this process. Callers must lock the upload row.
+
+    Args:
+        upload (ImageUpload): [description]
+
+    Raises:
+        ValidationError: The upload is incomplete or not a valid image
+
+    Returns:
+        Recipe: Recipe with its new image queued for processing
+    """
+    received = received_bytes(upload)
+    if received != upload.size:
+        raise ValidationError(
+            {"size": [f"Received {received} of {upload.size} bytes."]}
+        )
+    path = temp_path(upload)
+    check_image_header(path)
+
+    digest = take_digest(upload, received)
+
+    recipe = upload.recipe
+    recipe.image.name = recipe.image.storage.save_local(
+        path, upload.filename, digest.hexdigest() if digest else None
+    )
+    recipe.image_state = Recipe.IMAGE_PENDING
+    recipe.image_variants = {}
+    recipe.save()
+    upload.delete()
+    return recipe
@@ -1,14 +1,45 @@
-from core.models import Ingredient, Recipe, Tag
-from recipe import serializers
+import os
+
+from core.models import ImageUpload, Ingredient, Recipe, Tag
+from core.routers import ReplicaReadMixin
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from django.http import Http404, StreamingHttpResponse
+from recipe import media, serializers, uploads
+from recipe.cache import CachedListMixin
+from recipe.conditional import ConditionalGetMixin
+from recipe.export import EXPORT_FORMATS
+from recipe.filters import RecipeFilterBackend
+from recipe.pagination import (
+    RecipeAttrCursorPagination,
+    RecipeCursorPagination,
+)
+from recipe.rows import (
+    IngredientRowSerializer,
+    RecipeDetailRowSerializer,
+    RecipeListRowSerializer,
+    RowReadMixin,
+    TagRowSerializer,
+)
 from rest_framework import mixins, viewsets, status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from user.authentication import CachedTokenAuthentication
 
 
 class BaseRecipeAttrViewSet(
-    viewsets.GenericViewSet, mixins.ListModelMixin, mixins.CreateModelMixin
+    ReplicaReadMixin,
+    ConditionalGetMixin,
+    CachedListMixin,
+    RowReadMixin,
+    viewsets.GenericViewSet,
+    mixins.ListModelMixin,
+    mixins.CreateModelMixin,
 ):
     """Base viewset for user owned recipe attributes
 
@@ -18,8 +49,12 @@ class BaseRecipeAttrViewSet(
         mixins ([type]): [description]
     """
 
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecipeAttrCursorPagination
+    # Per action, see core.middleware.QueryCountMiddleware. Budgets include
+    # the token lookup when it isn't cached
+    query_budgets = {"list": 2, "create": 2}
 
     def get_queryset(self):
         """Return objects for the current authenticated user only"""
@@ -28,12 +63,10 @@ class BaseRecipeAttrViewSet(
         )
         queryset = self.queryset
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
-        return (
-            queryset.filter(user=self.request.user)
-            .order_by("-name")
-            .distinct()
-        )
+            # Only the join can repeat rows, a plain list keeps the index
+            # order without a DISTINCT sort on top
+            queryset = queryset.filter(recipe__isnull=False).distinct()
+        return queryset.filter(user=self.request.user).order_by("-name", "id")
 
     def perform_create(self, serializer):
         """Create a new object
@@ -47,14 +80,22 @@ class BaseRecipeAttrViewSet(
 class TagViewSet(BaseRecipeAttrViewSet):
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
+    row_serializer_classes = {"list": TagRowSerializer}
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = serializers.IngredientSerializer
+    row_serializer_classes = {"list": IngredientRowSerializer}
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    ReplicaReadMixin,
+    ConditionalGetMixin,
+    CachedListMixin,
+    RowReadMixin,
+    viewsets.ModelViewSet,
+):
     """Manage recipes in the database
 
     Args:
@@ -63,48 +104,150 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     serializer_class = serializers.RecipeSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
-
-    def _params_to_ints(self, qs):
-        """Convert a list of string iD to a list on integers
-
-        Args:
-            qs ([type]): [description]
-        """
-        return [int(x) for x in qs.split(",")]
+    pagination_class = RecipeCursorPagination
+    filter_backends = (RecipeFilterBackend,)
+    row_serializer_classes = {
+        "list": RecipeListRowSerializer,
+        "retrieve": RecipeDetailRowSerializer,
+    }
+    # Writes also touch the relations, search vectors and image blobs
+    query_budgets = {
+        "list": 3,
+        "retrieve": 5,
+        "export": 2,
+        "create": 16,
+        "update": 16,
+        "partial_update": 18,
+        "destroy": 8,
+        "bulk": 16,
+        "upload_image": 10,
+        "start_upload": 3,
+        "upload_chunk": 6,
+        "finalize_upload": 16,
+    }
 
     def get_queryset(self):
         """Retrieve the recipes for the authenticated user"""
-        tags = self.request.query_params.get("tags")
-        ingredients = self.request.query_params.get("ingredients")
         queryset = self.queryset
-
-        if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
-        if ingredients:
-            ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
-
-        return queryset.filter(user=self.request.user)
+        if self.action == "list":
+            queryset = queryset.with_relation_ids()
+
+        return queryset.filter(user=self.request.user).order_by("-id")
+
+    def get_object_etag(self, request):
+        """Return the ETag of the recipe from its modification time"""
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            updated_at = (
+                self.get_queryset()
+                .filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+                .values_list("updated_at", flat=True)
+                .first()
+            )
+        except (TypeError, ValueError):
+            updated_at = None
+        if updated_at is None:
+            return None
+        return self.make_etag(
+            request,
+            self.kwargs[lookup_url_kwarg],
+            updated_at.isoformat(),
+            request.query_params.get("fields", ""),
+        )
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
-        if self.action == "retrieve":
+        if self.action == "list":
+            return serializers.RecipeListSerializer
+        elif self.action == "retrieve":
             return serializers.RecipeDetailSerializer
+        elif self.action == "bulk":
+            return serializers.RecipeBulkSerializer
         # Can't made it upload-image no fucking idea how to
-        elif self.action == "upload_image":
+        elif self.action in ("upload_image", "finalize_upload"):
             return serializers.RecipeImageSerializer
+        elif self.action in ("start_upload", "upload_chunk"):
+            return serializers.ImageUploadSerializer
         return self.serializer_class
 
     def perform_create(self, serializer):
-        """Create a new recipe
+        """Create a new recipe with its tags and ingredients in one commit
 
         Args:
             serializer ([type]): [description]
         """
-        serializer.save(user=self.request.user)
+        with transaction.atomic():
+            serializer.save(user=self.request.user)
+
+    def perform_update(self, serializer):
+        """Update a recipe with its tags and ingredients in one commit
+
+        Args:
+            serializer ([type]): [description]
+        """
+        with transaction.atomic():
+            serializer.save()
+
+    @action(methods=["POST"], detail=False, url_path="bulk", url_name="bulk")
+    def bulk(self, request):
+        """Create or replace a list of recipes in a single transaction
+
+        Args:
+            request ([type]): [description]
+        """
+        serializer = self.get_serializer(data=request.data, many=True)
+        with transaction.atomic():
+            if not serializer.is_valid():
+                return Response(
+                    serializer.errors, status=status.HTTP_400_BAD_REQUEST
+                )
+            recipes = serializer.save(user=request.user)
+
+        annotated = (
+            Recipe.objects.filter(pk__in=[recipe.pk for recipe in recipes])
+            .with_relation_ids()
+            .in_bulk()
+        )
+        data = serializers.RecipeListSerializer(
+            [annotated[recipe.pk] for recipe in recipes], many=True
+        ).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    @action(
+        methods=["GET"], detail=False, url_path="export", url_name="export"
+    )
+    def export(self, request):
+        """Stream all recipes of the user as NDJSON or CSV
+
+        Takes the same filters as the list, the format is chosen with the
+        `export_format` query parameter and defaults to NDJSON.
+
+        Args:
+            request ([type]): [description]
+        """
+        export_format = request.query_params.get("export_format", "ndjson")
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError(
+                {
+                    "export_format": [
+                        "Choose one of: {}.".format(
+                            ", ".join(sorted(EXPORT_FORMATS))
+                        )
+                    ]
+                }
+            )
+        generate, content_type = EXPORT_FORMATS[export_format]
+        queryset = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(
+            generate(queryset, settings.RECIPE_EXPORT_CHUNK_SIZE, request),
+            content_type=content_type,
+        )
+        response[
+            "Content-Disposition"
+        ] = f'attachment; filename="recipes.{export_format}"'
+        return response
 
     @action(
         methods=["POST"],
@@ -127,6 +270,120 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def get_upload(self, upload_id, lock=False):
+        """Return a chunked upload of the requested recipe
+
+        Args:
+            upload_id ([type]): [description]
+            lock (bool, optional): Lock the row until the end of the
+                transaction. Defaults to False.
+        """
+        queryset = ImageUpload.objects.filter(recipe=self.get_object())
+        if lock:
+            queryset = queryset.select_for_update()
+        return get_object_or_404(queryset, pk=upload_id)
+
+    @action(
+        methods=["POST"],
+        detail=True,
+        url_path="uploads",
+        url_name="uploads",
+    )
+    def start_upload(self, request, pk=None):
+        """Start a chunked upload of the recipe image
+
+        Args:
+            request ([type]): [description]
+            pk ([type], optional): [description]. Defaults to None.
+        """
+        recipe = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        if serializer.is_valid():
+            serializer.save(recipe=recipe)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(
+        methods=["GET", "PUT"],
+        detail=True,
+        url_path=r"uploads/(?P<upload_id>[0-9a-f-]+)",
+        url_name="upload",
+    )
+    def upload_chunk(self, request, pk=None, upload_id=None):
+        """Report the progress of an upload or append a byte range to it
+
+        A PUT carries the raw bytes of the range given by `Content-Range`.
+        After a failure, GET tells from which byte to resume.
+
+        Args:
+            request ([type]): [description]
+            pk ([type], optional): [description]. Defaults to None.
+            upload_id ([type], optional): [description]. Defaults to None.
+        """
+        if request.method == "GET":
+            upload = self.get_upload(upload_id)
+        else:
+            with transaction.atomic():
+                upload = self.get_upload(upload_id, lock=True)
+                uploads.append_chunk(
+                    upload,
+                    request.stream,
+                    request.META.get("HTTP_CONTENT_RANGE"),
+                )
+        return Response(self.get_serializer(upload).data)
+
+    @action(
+        methods=["POST"],
+        detail=True,
+        url_path=r"uploads/(?P<upload_id>[0-9a-f-]+)/finalize",
+        url_name="upload-finalize",
+    )
+    def finalize_upload(self, request, pk=None, upload_id=None):
+        """Validate a complete upload and make it the recipe image
+
+        Args:
+            request ([type]): [description]
+            pk ([type], optional): [description]. Defaults to None.
+            upload_id ([type], optional): [description]. Defaults to None.
+        """
+        with transaction.atomic():
+            recipe = uploads.finalize(self.get_upload(upload_id, lock=True))
+        return Response(self.get_serializer(recipe).data)
+
+
+class MediaView(APIView):
+    """Serve the media files of the user's recipes
+
+    Args:
+        APIView ([type]): [description]
+    """
+
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    query_budget = 2
+
+    def perform_content_negotiation(self, request, force=False):
+        # The response is the file itself, any Accept header is fine
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, name):
+        """Send a media file if it belongs to one of the user's recipes
+
+        Args:
+            request ([type]): [description]
+            name ([type]): Storage name of the file
+        """
+        storage = Recipe._meta.get_field("image").storage
+        try:
+            path = storage.path(name)
+        except SuspiciousFileOperation:
+            raise Http404
+        if not os.path.isfile(path) or not media.user_owns_media(
+            request.user, name
+        ):
+            raise Http404
+        return media.serve_file(request, name, path)
+
 
 # Refactor bcs they are very similar
 # class TagViewSet(
@@ -0,0 +1,222 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from core.profiling import timed_phase
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+
+class TokenCache:
+    """Thread-safe, bounded LRU of authenticated tokens with a TTL
+
+    Args:
+        max_entries (int): Number of tokens kept before the least recently
+            used one is evicted
+        ttl (float): Seconds an entry stays valid
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """Return the entry of the token, None when missing or expired"""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires, entry = item
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry):
+        """Store the entry of the token, evicting the oldest ones if full"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        """Drop the entry of the token"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_user(self, user_id: int):
+        """Drop the entries of every token of the user"""
+        with self._lock:
+            for key, (expires, entry) in list(self._entries.items()):
+                if entry.token.user_id == user_id:
+                    del self._entries[key]
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TokenCacheEntry:
+    """Authenticated token and the user generation it was loaded with"""
+
+    __slots__ = ("token", "generation")
+
+    def __init__(self, token, generation):
+        self.token = token
+        self.generation = generation
+
+
+_local_cache = None
+_local_cache_lock = threading.Lock()
+
+
+def get_local_token_cache() -> TokenCache:
+    """Return the token cache of this process"""
+    global _local_cache
+    if _local_cache is None:
+        with _local_cache_lock:
+            if _local_cache is None:
+                _local_cache = TokenCache(
+                    settings.TOKEN_AUTH_CACHE_MAX_ENTRIES,
+                    settings.TOKEN_AUTH_CACHE_TTL,
+                )
+    return _local_cache
+
+
+def get_shared_token_cache():
+    """Return the cache shared by all workers, None when not configured"""
+    alias = settings.TOKEN_AUTH_SHARED_CACHE_ALIAS
+    return caches[alias] if alias else None
+
+
+def _token_key(key: str) -> str:
+    return f"auth:token:{key}"
+
+
+def _generation_key(user_id: int) -> str:
+    return f"auth:user-generation:{user_id}"
+
+
+def get_user_generation(shared, user_id: int):
+    """Return the generation of the user's cached tokens in the shared tier
+
+    Args:
+        shared (BaseCache): Shared cache, None when not configured
+        user_id (int): Id of the token owner
+
+    Returns:
+        int: Current generation, None without a shared tier
+    """
+    if shared is None:
+        return None
+    key = _generation_key(user_id)
+    generation = shared.get(key)
+    if generation is None:
+        # Seeded from the clock so an evicted generation can't be reused
+        generation = int(time.time() * 1000)
+        if not shared.add(key, generation, timeout=None):
+            generation = shared.get(key, generation)
+    return generation
+
+
+def invalidate_token(key: str):
+    """Forget a token in every cache tier
+
+    Args:
+        key (str): Key of the token
+    """
+    get_local_token_cache().delete(key)
+    shared = get_shared_token_cache()
+    if shared is not None:
+        shared.delete(_token_key(key))
+
+
+def invalidate_user_tokens(user_id: int):
+    """Forget every cached token of the user, in all worker processes
+
+    Other processes notice the bumped generation on their next lookup.
+
+    Args:
+        user_id (int): Id of the changed user
+    """
+    get_local_token_cache().delete_user(user_id)
+    shared = get_shared_token_cache()
+    if shared is not None:
+        try:
+            shared.incr(_generation_key(user_id))
+        except ValueError:
+            get_user_generation(shared, user_id)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication remembering token to user lookups
+
+    Lookups are kept in a bounded in-process LRU and, when
+    `TOKEN_AUTH_SHARED_CACHE_ALIAS` is set, in a shared cache as well. Entries
+    are dropped as soon as the token is deleted or its user is changed, see
+    `user.signals`.
+
+    Args:
+        TokenAuthentication (TokenAuthentication):
+        https://www.django-rest-framework.org/api-guide/authentication/#tokenauthentication
+    """
+
+    def authenticate(self, request):
+        with timed_phase(request, "auth"):
+            return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        local = get_local_token_cache()
+        shared = get_shared_token_cache()
+
+        entry = local.get(key)
+        if entry is not None and shared is not None:
+            generation = get_user_generation(shared, entry.token.user_id)
+            if entry.generation != generation:
+                local.delete(key)
+                entry = None
+
+        if entry is None and shared is not None:
+            entry = shared.get(_token_key(key))
+            if entry is not None:
+                generation = get_user_generation(shared, entry.token.user_id)
+                if entry.generation == generation:
+                    local.set(key, entry)
+                else:
+                    entry = None
+
+        if entry is None:
+            model = self.get_model()
+            try:
+                token = model.objects.select_related("user").get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_("Invalid token."))
+            entry = TokenCacheEntry(
+                token, get_user_generation(shared, token.user_id)
+            )
+            local.set(key, entry)
+            if shared is not None:
+                shared.set(
+                    _token_key(key), entry, settings.TOKEN_AUTH_CACHE_TTL
+                )
+
+        # Requests may modify their user, never hand out the cached objects
+        token = copy.deepcopy(entry.token)
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _("User inactive or deleted.")
+            )
+
+        return (token.user, token)
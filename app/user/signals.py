@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from user.authentication import invalidate_token, invalidate_user_tokens
+
+
+@receiver(post_delete, sender=Token, dispatch_uid="user_token_deleted")
+def forget_deleted_token(sender, instance, **kwargs):
+    """Stop authenticating with a deleted token, in every worker
+
+    Other workers only check their entries against the user's generation,
+    so it's bumped as well. Both are done again once the deletion commits,
+    a request may have cached the token from the last committed state in
+    between.
+    """
+    key, user_id = instance.key, instance.user_id
+    forget_token(key, user_id)
+    transaction.on_commit(lambda: forget_token(key, user_id))
+
+
+def forget_token(key: str, user_id: int):
+    invalidate_token(key)
+    invalidate_user_tokens(user_id)
+
+
+@receiver(
+    post_save, sender=get_user_model(), dispatch_uid="user_changed_tokens"
+)
+@receiver(
+    post_delete, sender=get_user_model(), dispatch_uid="user_deleted_tokens"
+)
+def forget_user_tokens(sender, instance, **kwargs):
+    """Reload the user of cached tokens after any change to it
+
+    Done again once the change commits, see `forget_deleted_token`.
+    """
+    user_id = instance.pk
+    invalidate_user_tokens(user_id)
+    transaction.on_commit(lambda: invalidate_user_tokens(user_id))
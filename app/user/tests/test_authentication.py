@@ -0,0 +1,186 @@
+from unittest.mock import patch
+
+from core.checks import check_worker_processes
+from core.tests.utils import enforce_query_budgets, run_on_commit_callbacks
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import exceptions, status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from user.authentication import (
+    CachedTokenAuthentication,
+    TokenCache,
+    get_local_token_cache,
+)
+
+ME_URL = reverse("user:me")
+
+
+@enforce_query_budgets
+class TokenCacheTests(TestCase):
+    """Test the in-process token LRU"""
+
+    def test_least_recently_used_evicted(self):
+        """Test the least recently used token is evicted when full"""
+        token_cache = TokenCache(max_entries=2, ttl=60)
+        token_cache.set("a", 1)
+        token_cache.set("b", 2)
+        token_cache.get("a")
+
+        token_cache.set("c", 3)
+
+        self.assertEqual(len(token_cache), 2)
+        self.assertIsNone(token_cache.get("b"))
+        self.assertEqual(token_cache.get("a"), 1)
+
+    @patch("time.monotonic")
+    def test_entries_expire(self, monotonic):
+        """Test entries are dropped after their TTL"""
+        token_cache = TokenCache(max_entries=2, ttl=60)
+        monotonic.return_value = 100
+        token_cache.set("a", 1)
+
+        monotonic.return_value = 161
+
+        self.assertIsNone(token_cache.get("a"))
+        self.assertEqual(len(token_cache), 0)
+
+
+@enforce_query_budgets
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating with cached tokens"""
+
+    def setUp(self):
+        get_local_token_cache().clear()
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            "token@gmail.com", "password123"
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.auth = CachedTokenAuthentication()
+
+    def test_cached_lookup_skips_database(self):
+        """Test a known token is authenticated without queries"""
+        self.auth.authenticate_credentials(self.token.key)
+
+        with self.assertNumQueries(0):
+            user, token = self.auth.authenticate_credentials(self.token.key)
+
+        self.assertEqual(user, self.user)
+        self.assertEqual(token.key, self.token.key)
+
+    def test_cached_user_not_shared(self):
+        """Test every request gets its own copy of the cached user"""
+        first, _ = self.auth.authenticate_credentials(self.token.key)
+        first.name = "Changed"
+
+        second, _ = self.auth.authenticate_credentials(self.token.key)
+
+        self.assertIsNot(first, second)
+        self.assertEqual(second.name, "")
+
+    def test_deleted_token_rejected(self):
+        """Test a deleted token stops authenticating immediately"""
+        key = self.token.key
+        self.auth.authenticate_credentials(key)
+
+        self.token.delete()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(key)
+
+    def test_deleted_token_recached_before_commit(self):
+        """Test a token cached again before the deletion commits is dropped"""
+        key = self.token.key
+        self.auth.authenticate_credentials(key)
+        entry = get_local_token_cache().get(key)
+
+        self.token.delete()
+        # A concurrent request still saw the committed token
+        get_local_token_cache().set(key, entry)
+        run_on_commit_callbacks()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(key)
+
+    def test_default_settings_refuse_workers(self):
+        """Test several workers need a shared tier to revoke tokens"""
+        self.assertIsNone(settings.TOKEN_AUTH_SHARED_CACHE_ALIAS)
+
+        problems = check_worker_processes(2)
+
+        self.assertTrue(
+            any("token authentication" in problem for problem in problems)
+        )
+
+    @override_settings(TOKEN_AUTH_CACHE_TTL=0)
+    def test_workers_without_token_cache(self):
+        """Test several workers may run without the token cache"""
+        problems = check_worker_processes(2)
+
+        self.assertFalse(
+            any("token authentication" in problem for problem in problems)
+        )
+
+    def test_deactivated_user_rejected(self):
+        """Test a deactivated user stops authenticating immediately"""
+        self.auth.authenticate_credentials(self.token.key)
+
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    @override_settings(TOKEN_AUTH_SHARED_CACHE_ALIAS="default")
+    def test_shared_tier_used_by_other_processes(self):
+        """Test a token cached by another worker skips the database"""
+        self.auth.authenticate_credentials(self.token.key)
+        get_local_token_cache().clear()
+
+        with self.assertNumQueries(0):
+            user, _ = self.auth.authenticate_credentials(self.token.key)
+
+        self.assertEqual(user, self.user)
+
+    @override_settings(TOKEN_AUTH_SHARED_CACHE_ALIAS="default")
+    def test_shared_tier_invalidates_other_processes(self):
+        """Test a user change in another worker drops local entries"""
+        self.auth.authenticate_credentials(self.token.key)
+
+        # Change made by another worker, only the shared tier notices
+        with patch("user.authentication.get_local_token_cache") as local:
+            local.return_value = TokenCache(max_entries=1, ttl=60)
+            self.user.is_active = False
+            self.user.save()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    @override_settings(TOKEN_AUTH_SHARED_CACHE_ALIAS="default")
+    def test_shared_tier_deleted_token_other_processes(self):
+        """Test a token deleted in another worker stops authenticating"""
+        key = self.token.key
+        self.auth.authenticate_credentials(key)
+
+        # Deleted by another worker, only the shared tier notices
+        with patch("user.authentication.get_local_token_cache") as local:
+            local.return_value = TokenCache(max_entries=1, ttl=60)
+            self.token.delete()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(key)
+
+    def test_authenticate_request(self):
+        """Test the API accepts the cached token"""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+        client.get(ME_URL)
+        res = client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["email"], self.user.email)
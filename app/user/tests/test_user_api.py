@@ -1,3 +1,4 @@
+from core.tests.utils import enforce_query_budgets
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 from django.urls import reverse
@@ -13,6 +14,7 @@ def create_user(**params):
     return get_user_model().objects.create_user(**params)
 
 
+@enforce_query_budgets
 class PublicUserApiTests(TestCase):
     """Test the users API (public => endpoints without authentication)
 
@@ -100,6 +102,7 @@ class PublicUserApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+@enforce_query_budgets
 class PrivateUserAPITests(TestCase):
     """Test API requests that require authentication
 
@@ -1,6 +1,7 @@
-from rest_framework import authentication, generics, permissions
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
+from user.authentication import CachedTokenAuthentication
 from user.serializers import AuthTokenSerializer, UserSerializer
 
 
@@ -12,6 +13,7 @@ class CreateUserView(generics.CreateAPIView):
     """
 
     serializer_class = UserSerializer
+    query_budget = 3
 
 
 class CreateTokenView(ObtainAuthToken):
@@ -23,6 +25,7 @@ class CreateTokenView(ObtainAuthToken):
 
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    query_budget = 6
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
@@ -33,8 +36,9 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
     """
 
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
+    query_budget = 3
 
     def get_object(self):
         """Retrieve and return autheticated user